@@ -0,0 +1,266 @@
+"""Lifecycle of the intermediates of a result folder.
+
+Every stage records the artifacts it produced in the folder's `.artifacts` manifest. Once the
+stages that read an artifact kind have all succeeded, the kind's policy action runs: `delete`
+it, `compress` it (re-encoded smaller, under the same name) or `keep` it. The defaults keep
+what a re-run needs: the sorted media for a new slideshow, slideshow_with_audio.mp4 for new
+titles, the subtitles and the final videos. Nothing is touched after a failed stage.
+
+    python artifacts.py --i INPUT/RESULT                 # bytes per kind and reclaimed so far
+    python artifacts.py --i INPUT/RESULT --apply --adopt # apply the policy, also to older folders
+"""
+import argparse
+import fnmatch
+import json
+import os
+import subprocess
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import scratch
+import tracing
+
+MANIFEST = '.artifacts'
+ACTIONS = ('keep', 'delete', 'compress')
+
+# Kind -> (file patterns, stages that read it, default action)
+KINDS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...], str]] = {
+    'source': (('[0-9][0-9][0-9].mp4', '[0-9][0-9][0-9].jpg', '[0-9][0-9][0-9].jpeg', '[0-9][0-9][0-9].png', 'voiceover.mp3'), ('slideshow',), 'keep'),
+    'parallax': (('*_df.mp4',), ('slideshow',), 'delete'),
+    'voiceover': (('adjusted_voiceover.mp3',), ('audio', 'transcribe'), 'delete'),
+    'subtitles': (('subs/voiceover.srt',), ('subscribe',), 'keep'),
+    'slideshow': (('slideshow.mp4',), ('mux',), 'delete'),
+    'audio': (('adjusted_soundtrack.mp3', 'adjusted_transitions.mp3', 'adjusted_long_voiceover.mp3', 'compressed_soundtrack.mp3',
+               'voiceover_end_long.mp3', 'compressed_end_soundtrack.mp3', 'mixed_audio.mp3'), ('mux',), 'delete'),
+    'mixed': (('slideshow_with_audio.mp4',), ('subscribe',), 'keep'),
+    'final': ((), (), 'keep'),
+    # Final video without subtitles, when its `_styled` twin exists
+    'unstyled': ((), (), 'keep'),
+}
+# Stage -> kinds it writes, the final videos are passed to record() by the subscribe stage
+STAGE_KINDS = {
+    'sort': ('source',),
+    'depth': ('parallax',),
+    'voiceover': ('voiceover',),
+    'transcribe': ('subtitles',),
+    'slideshow': ('slideshow',),
+    # Without a voiceover stage the audio mix delays the voiceover itself
+    'audio': ('voiceover', 'audio'),
+    'mux': ('mixed',),
+    'subscribe': ('final',),
+}
+# Last stage of a folder: kinds whose readers never ran are not needed any more
+LAST_STAGE = 'subscribe'
+
+# Guards the manifests, never held while an action runs
+_lock = threading.Lock()
+# Artifacts whose action is running, so a concurrent apply() on the folder skips them
+_busy = set()
+
+
+def policy(spec: str = '') -> Dict[str, str]:
+    """Action per kind: the defaults, changed by `spec`, e.g. "mixed=compress,parallax=keep"; "keep" keeps everything"""
+    actions = {kind: action for kind, (_, _, action) in KINDS.items()}
+    if spec.strip() == 'keep':
+        return {kind: 'keep' for kind in actions}
+    for item in filter(None, spec.split(',')):
+        kind, _, action = item.partition('=')
+        if kind not in KINDS or action not in ACTIONS:
+            raise ValueError(f"Unknown artifact policy {item!r}, kinds: {', '.join(KINDS)}, actions: {', '.join(ACTIONS)}")
+        actions[kind] = action
+    return actions
+
+
+def load(folder: str) -> Dict:
+    try:
+        with open(os.path.join(folder, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'stages': {}, 'artifacts': {}, 'reclaimed': 0}
+
+
+def _save(folder: str, manifest: Dict) -> None:
+    with open(os.path.join(folder, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def _matches(folder: str, kind: str) -> List[str]:
+    """Files of a kind in the folder and its scratch folder"""
+    patterns, _, _ = KINDS[kind]
+    found = []
+    for base in dict.fromkeys(filter(None, (folder, scratch.located(folder)))):
+        for pattern in patterns:
+            directory, name = os.path.split(os.path.join(base, pattern))
+            if os.path.isdir(directory):
+                found += [os.path.abspath(os.path.join(directory, file)) for file in sorted(os.listdir(directory)) if fnmatch.fnmatch(file, name)]
+    return found
+
+
+def finished(folder: str) -> bool:
+    """The folder's last stage succeeded, its intermediates may be gone since"""
+    return load(folder)['stages'].get(LAST_STAGE, {}).get('status') == 'ok'
+
+
+def record(folder: str, stage: str, actions: Optional[Dict[str, str]] = None, outputs: Optional[List[str]] = None, ok: bool = True) -> int:
+    """Record a finished stage and the artifacts it wrote, then apply the policy, returns the bytes reclaimed"""
+    with _lock:
+        manifest = load(folder)
+        manifest['stages'][stage] = {'status': 'ok' if ok else 'failed', 'finished': datetime.now().isoformat(timespec='seconds')}
+        if ok:
+            files = [(kind, path) for kind in STAGE_KINDS.get(stage, ()) if kind != 'final' for path in _matches(folder, kind)]
+            for path in outputs or ():
+                styled = path.replace('.mp4', '_styled.mp4')
+                if os.path.isfile(styled):
+                    files += [('unstyled', os.path.abspath(path)), ('final', os.path.abspath(styled))]
+                else:
+                    files.append(('final', os.path.abspath(path)))
+            for kind, path in files:
+                if path in manifest['artifacts'] or not os.path.isfile(path):
+                    continue
+                manifest['artifacts'][path] = {'kind': kind, 'stage': stage, 'bytes': os.path.getsize(path), 'state': 'present'}
+        _save(folder, manifest)
+    return apply(folder, actions or policy()) if ok else 0
+
+
+def apply(folder: str, actions: Dict[str, str]) -> int:
+    """Run the policy actions that are due in one folder, returns the bytes reclaimed"""
+    with _lock:
+        manifest = load(folder)
+        due = _due(manifest, actions)
+        _busy.update(path for path, _ in due)
+        _save(folder, manifest)
+
+    # Compressing is a full re-encode, other jobs' stages must be able to record meanwhile
+    results = {}
+    try:
+        for path, action in due:
+            results[path] = _run(path, action)
+    finally:
+        with _lock:
+            _busy.difference_update(path for path, _ in due)
+            manifest = load(folder)
+            reclaimed = 0
+            for path, (state, freed) in results.items():
+                manifest['artifacts'][path]['state'] = state
+                reclaimed += freed
+            manifest['reclaimed'] = manifest.get('reclaimed', 0) + reclaimed
+            _save(folder, manifest)
+    if reclaimed:
+        print(f"----- Reclaimed {reclaimed / 1e6:.1f} MB of intermediates in {folder}")
+    return reclaimed
+
+
+def _done(manifest: Dict, kind: str) -> bool:
+    """Every stage reading the kind succeeded, or the folder finished without needing it"""
+    stages = manifest['stages']
+    _, readers, _ = KINDS[kind]
+    if any(stages.get(reader, {}).get('status') == 'failed' for reader in readers):
+        return False
+    if stages.get(LAST_STAGE, {}).get('status') == 'ok':
+        return True
+    return bool(readers) and all(stages.get(reader, {}).get('status') == 'ok' for reader in readers)
+
+
+def _due(manifest: Dict, actions: Dict[str, str]) -> List[Tuple[str, str]]:
+    """(path, action) of the artifacts whose action can run now, marks the vanished ones gone"""
+    due = []
+    for path, artifact in manifest['artifacts'].items():
+        if artifact['state'] != 'present' or path in _busy:
+            continue
+        if not os.path.isfile(path):
+            # Deleted with its scratch folder, or by hand
+            artifact['state'] = 'gone'
+            continue
+        action = actions.get(artifact['kind'], 'keep')
+        if action != 'keep' and _done(manifest, artifact['kind']):
+            due.append((path, action))
+    return due
+
+
+def _run(path: str, action: str) -> Tuple[str, int]:
+    """Delete or compress one artifact, returns its new state and the bytes freed"""
+    size = os.path.getsize(path)
+    if action == 'delete':
+        os.remove(path)
+        return 'deleted', size
+    if compress(path):
+        return 'compressed', size - os.path.getsize(path)
+    return 'kept', 0
+
+
+def compress(path: str) -> bool:
+    """Re-encode a video or audio file smaller under the same name, False when it did not shrink"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.mp4':
+        codec = ['-c:v', 'libx264', '-crf', '30', '-preset', 'veryfast', '-c:a', 'copy']
+    elif extension == '.mp3':
+        codec = ['-c:a', 'libmp3lame', '-b:a', '64k']
+    else:
+        return False
+    temp = f"{os.path.splitext(path)[0]}.compressed{extension}"
+    try:
+        tracing.run(['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', '-i', path, *codec, temp], check=True, report_progress=True)
+    except subprocess.CalledProcessError as error:
+        print(f"***** Could not compress {path}: {error}")
+        if os.path.exists(temp):
+            os.remove(temp)
+        return False
+    if os.path.getsize(temp) >= os.path.getsize(path):
+        os.remove(temp)
+        return False
+    os.replace(temp, path)
+    return True
+
+
+def adopt(folder: str) -> bool:
+    """Manifest for a folder finished before manifests existed: every stage ok, the remaining videos are finals"""
+    if os.path.exists(os.path.join(folder, MANIFEST)):
+        return False
+    known = {path for kind in KINDS for path in _matches(folder, kind)}
+    finals = [os.path.abspath(os.path.join(folder, name)) for name in os.listdir(folder)
+              if name.endswith('.mp4') and not name.endswith('_styled.mp4') and os.path.abspath(os.path.join(folder, name)) not in known]
+    if not finals:
+        return False
+    for stage in STAGE_KINDS:
+        if stage != LAST_STAGE:
+            record(folder, stage, {kind: 'keep' for kind in KINDS})
+    record(folder, LAST_STAGE, {kind: 'keep' for kind in KINDS}, outputs=finals)
+    return True
+
+
+def report(root: str) -> None:
+    """Bytes per kind and state over every result folder under `root`"""
+    totals: Dict[Tuple[str, str], int] = {}
+    reclaimed = 0
+    for name in sorted(os.listdir(root)):
+        manifest = load(os.path.join(root, name))
+        reclaimed += manifest.get('reclaimed', 0)
+        for artifact in manifest['artifacts'].values():
+            key = (artifact['kind'], artifact['state'])
+            totals[key] = totals.get(key, 0) + artifact['bytes']
+
+    print(f"{'kind':<11}{'state':<12}{'MB':>10}")
+    for (kind, state), size in sorted(totals.items()):
+        print(f"{kind:<11}{state:<12}{size / 1e6:>10.1f}")
+    print(f"##### Reclaimed: {reclaimed / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report and apply the intermediate artifact policy of result folders")
+    parser.add_argument('--i', type=str, default='INPUT/RESULT', dest='root', help='Folder holding the result folders')
+    parser.add_argument('--policy', type=str, default=os.getenv('ARTIFACT_POLICY', ''), dest='policy', help='Actions per kind, e.g. "mixed=compress,source=delete" ("keep" for none)')
+    parser.add_argument('--apply', action='store_true', dest='apply', help='Apply the policy to every folder')
+    parser.add_argument('--adopt', action='store_true', dest='adopt', help='Create manifests for finished folders without one')
+    args = parser.parse_args()
+
+    actions = policy(args.policy)
+    for name in sorted(os.listdir(args.root)):
+        folder = os.path.join(args.root, name)
+        if not os.path.isdir(folder):
+            continue
+        if args.adopt and adopt(folder):
+            print(f"+++++ Adopted {folder}")
+        if args.apply and os.path.exists(os.path.join(folder, MANIFEST)):
+            apply(folder, actions)
+    report(args.root)
@@ -1,40 +1,88 @@
 import subprocess
 import os
 import argparse
+import sys
 import time
+from dataclasses import dataclass
+from typing import Optional
 
-# Start timing the entire process
-start_time = time.time()
-
-
-# Create an ArgumentParser to handle command-line arguments
-parser = argparse.ArgumentParser(description="Create slideshow.")
-parser.add_argument('--i', dest='path', required=True, help='Path to the directory containing audio and video')
-parser.add_argument('--od', type=int, default=14, dest='outro_duration', help='Outro duration (in seconds)')
-parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
-parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Generate .srt subtitles? 0/1')
-parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
-
+import scratch
+import tracing
 
+soundtrack_path = 'TEMPLATE/soundtrack.mp3'
+voiceover_end_path = 'TEMPLATE/voiceover_end.mp3'
+transition_sound_path = 'TEMPLATE/transition_long.mp3'
 
-# Parse the command-line arguments
-args = parser.parse_args()
-directory = args.path
 
-def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_path, voiceover_path, voiceover_end_path, output_video_path, generate_srt=False):
-    # Step 1: Cut the soundtrack and reduce its volume by 50%
+@dataclass
+class AudioParams:
+    path: str
+    outro_duration: int = 14
+    vo_delay: int = 5
+    generate_srt: bool = False
+    subtitle_max_width: int = 21
+    # Empty for srt_generator's defaults ($WHISPER_MODEL, $WHISPER_COMPUTE_TYPE)
+    whisper_model: str = ''
+    whisper_compute_type: str = ''
+    duration: Optional[float] = None
+    step: str = 'all'
+
+def get_video_duration(video_path):
     # Get the duration of the slideshow video
     ffprobe_command = [
-        'ffprobe', '-i', slideshow_video_path, '-show_entries', 'format=duration', '-v', 'quiet', '-of', 'csv=p=0'
+        'ffprobe', '-i', video_path, '-show_entries', 'format=duration', '-v', 'quiet', '-of', 'csv=p=0'
     ]
     try:
-        duration_str = subprocess.check_output(ffprobe_command, stderr=subprocess.STDOUT, text=True)
-        duration = float(duration_str)
+        duration_str = tracing.check_output(ffprobe_command, stderr=subprocess.STDOUT, text=True)
+        return float(duration_str)
     except subprocess.CalledProcessError as error:
         print("***** Error getting video duration:", error)
+        return None
+
+def delay_voiceover(params: AudioParams):
+    """adjusted_voiceover.mp3 only needs the voiceover, subtitles are generated from it when requested"""
+    directory = params.path
+    voiceover_path = os.path.join(directory, 'voiceover.mp3')
+
+    voiceover_adjusted_path = scratch.path(directory, 'adjusted_voiceover.mp3')
+    voiceover_blank_command = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-f', 'lavfi', '-t', str(params.vo_delay), '-i', 'anullsrc=r=44100:cl=stereo',
+        '-i', voiceover_path,
+        '-filter_complex', '[0][1]concat=n=2:v=0:a=1[v]',
+        '-map', '[v]',
+        '-ac', '2',  # Set the number of audio channels to 2 (stereo)
+        voiceover_adjusted_path
+    ]
+
+    try:
+        tracing.run(voiceover_blank_command, check=True)
+        print(f"--3-- Added {params.vo_delay} seconds start delay to voiceoiver.")
+        
+        # Generate SRT subtitles if requested
+        if params.generate_srt:
+            print("--3.1-- Generating SRT subtitles...")
+            # Imported here: only runs that want subtitles pay for WhisperX setup
+            from srt_generator import generate_srt
+
+            # Errors are reported inside, audio processing continues even if SRT generation fails
+            generate_srt(directory, True, params.subtitle_max_width, model_name=params.whisper_model, compute_type=params.whisper_compute_type)
+            print("--3.2-- SRT subtitles step done.")
+
+    except subprocess.CalledProcessError as error:
+        print("***** Error adding blank audio to the voiceover:", error)
         return
 
-    soundtrack_adjusted_path = os.path.join(directory, 'adjusted_soundtrack.mp3')
+    return voiceover_adjusted_path
+
+
+def mix_audio(params: AudioParams, duration, voiceover_adjusted_path=None):
+    # voiceover_adjusted_path: already delayed voiceover (delay_voiceover), made here when missing
+    directory = params.path
+
+    # Step 1: Cut the soundtrack and reduce its volume by 50%
+    # The duration comes from the slideshow timeline, so the mix can run while the video renders
+    soundtrack_adjusted_path = scratch.path(directory, 'adjusted_soundtrack.mp3')
     soundtrack_cut_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-i', soundtrack_path,
@@ -47,7 +95,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(soundtrack_cut_command, check=True)
+        tracing.run(soundtrack_cut_command, check=True)
         print(f"--1-- Cutted soundtrack to {duration} seconds.")
 
     except subprocess.CalledProcessError as error:
@@ -57,12 +105,12 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
 
     
 
-    transition_adjusted_path = os.path.join(directory, 'adjusted_transitions.mp3')
+    transition_adjusted_path = scratch.path(directory, 'adjusted_transitions.mp3')
     transition_cut_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-i', transition_sound_path,
         '-ss', '0',  # Start from the beginning of the soundtrack
-        '-t', str(duration - args.outro_duration),  # Cut the soundtrack to match video duration minus end screen
+        '-t', str(duration - params.outro_duration),  # Cut the soundtrack to match video duration minus end screen
         '-af', 'volume=1.6',
         '-q:a', '0',  # Set audio quality (0-9, 0 is the best)
         '-ac', '2',  # Set the number of audio channels to 2 (stereo)
@@ -70,8 +118,8 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(transition_cut_command, check=True)
-        print(f"--2-- Cutted transitions to video duration - {args.outro_duration} seconds: ", str(duration - args.outro_duration))
+        tracing.run(transition_cut_command, check=True)
+        print(f"--2-- Cutted transitions to video duration - {params.outro_duration} seconds: ", str(duration - params.outro_duration))
 
     except subprocess.CalledProcessError as error:
         print("***** Error cutting and adjusting transition:", error)
@@ -79,39 +127,9 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
 
 
     # Step 2: Add 5 seconds of blank audio to the beginning of the voiceover
-    voiceover_adjusted_path = os.path.join(directory, 'adjusted_voiceover.mp3')
-    voiceover_blank_command = [
-        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
-        '-f', 'lavfi', '-t', str(args.vo_delay), '-i', 'anullsrc=r=44100:cl=stereo',
-        '-i', voiceover_path,
-        '-filter_complex', '[0][1]concat=n=2:v=0:a=1[v]',
-        '-map', '[v]',
-        '-ac', '2',  # Set the number of audio channels to 2 (stereo)
-        voiceover_adjusted_path
-    ]
-
-    try:
-        subprocess.run(voiceover_blank_command, check=True)
-        print(f"--3-- Added {args.vo_delay} seconds start delay to voiceoiver.")
-        
-        # Generate SRT subtitles if requested
-        if generate_srt:
-            print("--3.1-- Generating SRT subtitles...")
-            srt_command = [
-                'python3', 'srt_generator.py',
-                '--i', directory,
-                '--srt', '1',
-                '--smaxw', str(args.subtitle_max_width)
-            ]
-            try:
-                subprocess.run(srt_command, check=True)
-                print("--3.2-- SRT subtitles generated successfully.")
-            except subprocess.CalledProcessError as srt_error:
-                print(f"***** Error generating SRT subtitles: {srt_error}")
-                # Continue with audio processing even if SRT generation fails
-
-    except subprocess.CalledProcessError as error:
-        print("***** Error adding blank audio to the voiceover:", error)
+    if voiceover_adjusted_path is None:
+        voiceover_adjusted_path = delay_voiceover(params)
+    if voiceover_adjusted_path is None:
         return
 
     # Step 3: Add silence to the voiceover to match the duration of the soundtrack and video
@@ -121,7 +139,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        vo_duration_str = subprocess.check_output(vo_ffprobe_command, stderr=subprocess.STDOUT, text=True)
+        vo_duration_str = tracing.check_output(vo_ffprobe_command, stderr=subprocess.STDOUT, text=True)
         vo_duration = float(vo_duration_str)
         print(f"--4-- Duration of adjusted_voiceover: {vo_duration} seconds")
     except subprocess.CalledProcessError as error:
@@ -129,7 +147,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
 
 
     silence_duration = duration - vo_duration  # Subtract voiceover length from video duration
-    voiceover_long_adjusted_path = os.path.join(directory, 'adjusted_long_voiceover.mp3')
+    voiceover_long_adjusted_path = scratch.path(directory, 'adjusted_long_voiceover.mp3')
     voiceover_silence_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-f', 'lavfi', '-t', str(silence_duration), '-i', 'anullsrc=r=44100:cl=stereo',
@@ -141,7 +159,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(voiceover_silence_command, check=True)
+        tracing.run(voiceover_silence_command, check=True)
         print(f"--5-- Added {round(silence_duration, 2)} seconds of silence to voiceoiver.")
 
     except subprocess.CalledProcessError as error:
@@ -149,7 +167,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
         return
 
     # Step 4: Apply sidechain compression to the soundtrack using the adjusted voiceover as the key input
-    compressed_soundtrack_path = os.path.join(directory, 'compressed_soundtrack.mp3')
+    compressed_soundtrack_path = scratch.path(directory, 'compressed_soundtrack.mp3')
     sidechain_compression_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-i', soundtrack_adjusted_path,
@@ -163,7 +181,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(sidechain_compression_command, check=True)
+        tracing.run(sidechain_compression_command, check=True)
         print(f"--6-- Mixed soundtrack with voiceoiver using compressor.")
 
     except subprocess.CalledProcessError as error:
@@ -171,7 +189,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
         return
 
     silence_end_duration = duration - 15  # Subtract voiceover end length from video duration
-    voiceover_end_long_path = os.path.join(directory, 'voiceover_end_long.mp3')
+    voiceover_end_long_path = scratch.path(directory, 'voiceover_end_long.mp3')
     voiceover_silence_end_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-f', 'lavfi', '-t', str(silence_end_duration), '-i', 'anullsrc=r=44100:cl=stereo',
@@ -183,7 +201,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(voiceover_silence_end_command, check=True)
+        tracing.run(voiceover_silence_end_command, check=True)
 
         print(f"--7-- Added {round(silence_end_duration, 2)} seconds of silence to end voiceoiver.")
 
@@ -192,7 +210,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
         return
 
     # Step 4.1: Apply sidechain compression to the soundtrack using the adjusted voiceover_end as the key input
-    compressed_end_soundtrack_path = os.path.join(directory, 'compressed_end_soundtrack.mp3')
+    compressed_end_soundtrack_path = scratch.path(directory, 'compressed_end_soundtrack.mp3')
     sidechain_compression_end_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-i', compressed_soundtrack_path,
@@ -206,7 +224,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(sidechain_compression_end_command, check=True)
+        tracing.run(sidechain_compression_end_command, check=True)
         print(f"--8-- Mixed soundtrack with END voiceoiver using compressor.")
 
     except subprocess.CalledProcessError as error:
@@ -217,7 +235,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
 
     # Step 5: Mix the adjusted soundtrack and voiceover together
     # comment this code if you don't want to use voiceover
-    mixed_audio_path = os.path.join(directory, 'mixed_audio.mp3')
+    mixed_audio_path = scratch.path(directory, 'mixed_audio.mp3')
     audio_mix_command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
         '-i', compressed_end_soundtrack_path,
@@ -230,7 +248,7 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(audio_mix_command, check=True)
+        tracing.run(audio_mix_command, check=True)
         print(f"--9-- Mixed transitions.")
 
     except subprocess.CalledProcessError as error:
@@ -238,6 +256,10 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
         return
 
     
+    return mixed_audio_path
+
+
+def mux_audio(slideshow_video_path, mixed_audio_path, output_video_path):
     # Step 5: Replace the original video's audio with the mixed audio
     command = [
         'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
@@ -254,21 +276,62 @@ def add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_p
     ]
 
     try:
-        subprocess.run(command, check=True)
+        tracing.run(command, check=True)
         print(f"+++++ Audio added to the video: {output_video_path}")
+        return True
     except subprocess.CalledProcessError as error:
         print("***** Error executing FFmpeg command:", error)
-
-
-# Example usage to add audio to the slideshow video
-
-slideshow_video_path = os.path.join(directory, 'slideshow.mp4')
-output_video_path = os.path.join(directory, 'slideshow_with_audio.mp4')
-voiceover_path = os.path.join(directory, 'voiceover.mp3')
-soundtrack_path = 'TEMPLATE/soundtrack.mp3'
-voiceover_end_path = 'TEMPLATE/voiceover_end.mp3'
-transition_sound_path = 'TEMPLATE/transition_long.mp3'
-
-
-add_audio_to_video(slideshow_video_path, soundtrack_path, transition_sound_path, voiceover_path, voiceover_end_path, output_video_path, args.generate_srt == '1')
-print(f"Add Audio: {time.time() - start_time:.2f} seconds.")
+        return False
+
+
+def process_audio(params: AudioParams) -> bool:
+    """Run the selected steps (mix, mux or both) for one folder, returns success"""
+    start_time = time.time()
+    directory = params.path
+    slideshow_video_path = scratch.path(directory, 'slideshow.mp4')
+    output_video_path = scratch.path(directory, 'slideshow_with_audio.mp4')
+    mixed_audio_path = scratch.path(directory, 'mixed_audio.mp3')
+
+    success = True
+
+    if params.step in ('all', 'mix'):
+        # Without an explicit timeline duration fall back to probing the rendered slideshow
+        duration = params.duration if params.duration is not None else get_video_duration(slideshow_video_path)
+        if duration is None:
+            success = False
+        else:
+            success = mix_audio(params, duration) is not None
+        print(f"Mix Audio: {time.time() - start_time:.2f} seconds.")
+
+    if success and params.step in ('all', 'mux'):
+        success = mux_audio(slideshow_video_path, mixed_audio_path, output_video_path)
+        print(f"Add Audio: {time.time() - start_time:.2f} seconds.")
+
+    return success
+
+
+if __name__ == "__main__":
+    # Create an ArgumentParser to handle command-line arguments
+    parser = argparse.ArgumentParser(description="Create slideshow.")
+    parser.add_argument('--i', dest='path', required=True, help='Path to the directory containing audio and video')
+    parser.add_argument('--od', type=int, default=14, dest='outro_duration', help='Outro duration (in seconds)')
+    parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
+    parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Generate .srt subtitles? 0/1')
+    parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
+    parser.add_argument('--du', type=float, default=None, dest='duration', help='Slideshow duration (in seconds); skips probing slideshow.mp4')
+    parser.add_argument('--step', type=str, default='all', choices=['all', 'mix', 'mux'], dest='step', help='Run only the audio mix, only the mux into slideshow.mp4, or both')
+
+    # Parse the command-line arguments
+    args = parser.parse_args()
+
+    success = process_audio(AudioParams(
+        path=args.path,
+        outro_duration=args.outro_duration,
+        vo_delay=args.vo_delay,
+        generate_srt=args.generate_srt == '1',
+        subtitle_max_width=args.subtitle_max_width,
+        duration=args.duration,
+        step=args.step,
+    ))
+    if not success:
+        sys.exit(1)
@@ -0,0 +1,71 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy
+from dotmap import DotMap
+from PIL import Image
+
+# Benchmarks run as `python benchmarks/<name>.py`, make the pipeline modules importable
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from parallax import NumpyParallax  # noqa: E402
+
+# Same ranges as DepthManager.choose_motion, fixed so runs are comparable
+MOTION = DotMap(
+    isometric=0.45,
+    height=0.12,
+    zoom=0.7,
+    motions=[
+        DotMap(name="Circle", intensity=0.7, reverse=False),
+        DotMap(name="Dolly", intensity=0.6, reverse=True),
+    ],
+)
+
+
+def synthetic_inputs(folder: Path, height: int):
+    """Colorful gradient still and a radial depth map (near in the middle) at 9:16"""
+    width = 2 * round(height * 9 / 16 / 2)
+    ys, xs = numpy.mgrid[0:height, 0:width].astype(numpy.float32)
+    rgb = numpy.stack([
+        255 * xs / width,
+        255 * ys / height,
+        127 + 127 * numpy.sin(xs / 40) * numpy.cos(ys / 40),
+    ], axis=-1)
+    image = folder / "still.png"
+    Image.fromarray(rgb.astype(numpy.uint8)).save(image)
+
+    radius = numpy.hypot((xs - width / 2) / width, (ys - height / 2) / height)
+    depth = folder / "depth.png"
+    Image.fromarray((numpy.clip(1 - 1.5 * radius, 0, 1) * 65535).astype(numpy.uint16)).save(depth)
+    return image, depth
+
+
+def render_numpy(image: Path, depth: Path, output: Path, height: int, time: float, fps: int) -> int:
+    """Render MOTION with the NumPy engine, returns the frame count"""
+    NumpyParallax().render(image, depth, output, MOTION, height=height, time=time, fps=fps)
+    return int(time * fps)
+
+
+def render_depthflow(image: Path, depth: Path, output: Path, height: int, time: float, fps: int) -> int:
+    """Render MOTION with a headless DepthFlow scene, returns the frame count"""
+    from DepthFlow import DepthScene
+    from DepthFlow.Motion import Components, Presets, Target
+
+    scene = DepthScene(backend="headless")
+    scene.input(image=image, depth=depth)
+    scene.add_animation(Components.Set(target=Target.Isometric, value=MOTION.isometric))
+    scene.add_animation(Components.Set(target=Target.Height, value=MOTION.height))
+    scene.add_animation(Presets.Zoom(intensity=MOTION.zoom, loop=True))
+    scene.add_animation(Presets.Circle(intensity=0.7, loop=True, reverse=False))
+    scene.add_animation(Presets.Dolly(intensity=0.6, loop=True, reverse=True))
+    scene.main(output=output, height=height, time=time, fps=fps, loop=1)
+    scene.window.destroy()
+    return int(time * fps)
+
+
+ENGINES = {
+    "numpy": render_numpy,
+    "depthflow": render_depthflow,
+}
@@ -0,0 +1,39 @@
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from common import ENGINES, synthetic_inputs
+
+parser = argparse.ArgumentParser(description="Parallax render speed: NumPy (CPU) vs DepthFlow")
+parser.add_argument('--i', type=str, default=None, dest='image', help='Input still (default: synthetic gradient)')
+parser.add_argument('--dm', type=str, default=None, dest='depth', help='Depth map of the still (default: synthetic radial)')
+parser.add_argument('--h', type=int, default=1920, dest='height', help='Render height')
+parser.add_argument('--t', type=float, default=5, dest='time', help='Seconds rendered per engine')
+parser.add_argument('--fps', type=int, default=25, dest='fps', help='Frame rate')
+parser.add_argument('--engines', type=str, default='numpy,depthflow', dest='engines', help='Comma separated engines to run')
+args = parser.parse_args()
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        if args.image and args.depth:
+            image, depth = Path(args.image), Path(args.depth)
+        else:
+            image, depth = synthetic_inputs(folder, args.height)
+
+        results = []
+        for engine in args.engines.split(','):
+            print(f"##### Rendering {args.time}s at {args.height}p with {engine}")
+            start = time.perf_counter()
+            try:
+                frames = ENGINES[engine](image, depth, folder / f"{engine}.mp4", args.height, args.time, args.fps)
+            except ImportError as error:
+                print(f"***** Skipping {engine}: {error}")
+                continue
+            elapsed = time.perf_counter() - start
+            results.append((engine, frames, elapsed))
+
+    print(f"\n{'engine':<12}{'frames':>8}{'seconds':>10}{'fps':>8}{'x realtime':>12}")
+    for engine, frames, elapsed in results:
+        print(f"{engine:<12}{frames:>8}{elapsed:>10.2f}{frames / elapsed:>8.1f}{frames / elapsed / args.fps:>12.2f}")
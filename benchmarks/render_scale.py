@@ -0,0 +1,75 @@
+import argparse
+import re
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from common import ENGINES, synthetic_inputs
+
+parser = argparse.ArgumentParser(description="Parallax render time vs SSIM for depth.py --rs render scales")
+parser.add_argument('--i', type=str, default=None, dest='image', help='Input still (default: synthetic gradient)')
+parser.add_argument('--dm', type=str, default=None, dest='depth', help='Depth map of the still (default: synthetic radial)')
+parser.add_argument('--h', type=int, default=1920, dest='height', help='Output height (scale 1.0)')
+parser.add_argument('--t', type=float, default=5, dest='time', help='Seconds rendered per scale')
+parser.add_argument('--fps', type=int, default=25, dest='fps', help='Frame rate')
+parser.add_argument('--scales', type=str, default='1.0,0.75,0.66,0.5', dest='scales', help='Comma separated render scales')
+parser.add_argument('--engine', type=str, default='numpy', choices=sorted(ENGINES), dest='engine', help='Parallax engine')
+args = parser.parse_args()
+
+
+def scaled_height(height, scale):
+    """Same rounding as depth.py: even heights for yuv420p"""
+    return 2 * round(height * scale / 2)
+
+
+def ssim(video, reference, width, height):
+    """Mean SSIM of `video` upscaled the way slideshow.py does it, against the full-size render"""
+    result = subprocess.run([
+        'ffmpeg', '-hide_banner', '-nostats',
+        '-i', str(video), '-i', str(reference),
+        '-lavfi', f'[0:v]scale={width}:{height}:flags=lanczos,setsar=1:1[up];[up][1:v]ssim',
+        '-f', 'null', '-'
+    ], check=True, capture_output=True, text=True)
+    match = re.search(r'All:([0-9.]+)', result.stderr)
+    return float(match.group(1)) if match else float('nan')
+
+
+def probe_size(video):
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=width,height', '-of', 'csv=p=0:s=x', str(video)
+    ], check=True, capture_output=True, text=True)
+    width, height = result.stdout.strip().split('x')
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    render = ENGINES[args.engine]
+    scales = sorted({float(scale) for scale in args.scales.split(',')} | {1.0}, reverse=True)
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        if args.image and args.depth:
+            image, depth = Path(args.image), Path(args.depth)
+        else:
+            image, depth = synthetic_inputs(folder, args.height)
+
+        results = []
+        for scale in scales:
+            height = scaled_height(args.height, scale)
+            output = folder / f"scale_{scale}.mp4"
+            print(f"##### Rendering {args.time}s at {height}p (scale {scale}) with {args.engine}")
+            start = time.perf_counter()
+            render(image, depth, output, height, args.time, args.fps)
+            results.append((scale, height, output, time.perf_counter() - start))
+
+        # Scale 1.0 is the reference every other scale is compared against
+        reference = results[0][2]
+        width, height = probe_size(reference)
+        base_time = results[0][3]
+
+        print(f"\n{'scale':>6}{'height':>8}{'seconds':>10}{'speedup':>9}{'SSIM':>8}")
+        for scale, render_height, output, elapsed in results:
+            score = 1.0 if output == reference else ssim(output, reference, width, height)
+            print(f"{scale:>6.2f}{render_height:>8}{elapsed:>10.2f}{base_time / elapsed:>8.2f}x{score:>8.4f}")
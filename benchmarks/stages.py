@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import replace
+from datetime import datetime
+
+from common import ROOT
+
+import tracing
+from audio import mix_audio, process_audio
+from cleaner import CleanerParams, clean
+from cutter import CutterParams, cut
+from pipeline import PipelineParams, required, slideshow_params
+from slideshow import audio_params, render_slideshow, slideshow_timeline, subscribe_params
+from sorter import SorterParams, sort_files
+from subscribe import add_overlay
+import scratch
+
+# Input media per fixture size, all generated with lavfi so every machine benchmarks the same bytes
+SIZES = {
+    'small': dict(width=540, height=960, clips=2, clip_seconds=13, stills=4, voiceover=20),
+    'medium': dict(width=1080, height=1920, clips=4, clip_seconds=25, stills=8, voiceover=60),
+    'large': dict(width=1080, height=1920, clips=8, clip_seconds=49, stills=16, voiceover=120),
+}
+SEGMENT_DURATION = 6
+OUTRO_DURATION = 14
+# Allowed relative increase per metric before a stage counts as a regression
+THRESHOLDS = {'wall_s': 0.15, 'cpu_s': 0.15, 'peak_rss_mb': 0.20, 'output_bytes': 0.10}
+
+parser = argparse.ArgumentParser(description="Per-stage wall time, CPU time, peak memory and output size on synthetic media")
+parser.add_argument('--sizes', type=str, default='small,medium', dest='sizes', help=f"Comma separated fixture sizes ({', '.join(SIZES)})")
+parser.add_argument('--repeat', type=int, default=1, dest='repeat', help='Runs per size, the median is reported')
+parser.add_argument('--work', type=str, default=os.path.join(ROOT, 'benchmarks', 'work'), dest='work', help='Folder for fixtures and runs')
+parser.add_argument('--o', type=str, default='', dest='output', help='Write the results as JSON (default: benchmarks/results/<datetime>.json)')
+parser.add_argument('--baseline', type=str, default='', dest='baseline', help='Compare against this results JSON, exit 1 on regressions')
+parser.add_argument('--threshold', type=str, default='', dest='thresholds', help='Override thresholds, e.g. wall_s=0.1,output_bytes=0.05')
+parser.add_argument('--min-delta', type=float, default=0.25, dest='min_delta', help='Ignore time changes smaller than this many seconds')
+args = parser.parse_args()
+
+
+def ffmpeg(*options):
+    # Single-threaded x264 keeps the fixtures byte-identical between runs
+    subprocess.run(['ffmpeg', '-y', '-hide_banner', '-loglevel', 'error', *options], check=True)
+
+
+def make_template(folder):
+    """Outro, soundtrack, transitions and a green-screen subscribe overlay, what the stages read from TEMPLATE/"""
+    os.makedirs(folder, exist_ok=True)
+    if os.path.exists(os.path.join(folder, 'outro_vertical.mp4')):
+        return
+    x264 = ['-c:v', 'libx264', '-preset', 'ultrafast', '-threads', '1', '-pix_fmt', 'yuv420p']
+    ffmpeg('-f', 'lavfi', '-i', f'testsrc2=size=1080x1920:rate=25:duration={OUTRO_DURATION}', *x264, os.path.join(folder, 'outro_vertical.mp4'))
+    ffmpeg('-f', 'lavfi', '-i', 'color=c=0x65db41:size=1080x1920:rate=25:duration=8',
+           '-vf', "drawbox=x=340:y=1500:w=400:h=120:color=red:t=fill:enable='between(t,1,6)'", *x264,
+           os.path.join(folder, 'name_subscribe_like.mp4'))
+    ffmpeg('-f', 'lavfi', '-i', 'sine=frequency=220:beep_factor=2:duration=900', '-ac', '2', os.path.join(folder, 'soundtrack.mp3'))
+    ffmpeg('-f', 'lavfi', '-i', 'sine=frequency=880:beep_factor=4:duration=900', '-ac', '2', os.path.join(folder, 'transition_long.mp3'))
+    ffmpeg('-f', 'lavfi', '-i', 'sine=frequency=660:duration=15', '-ac', '2', os.path.join(folder, 'voiceover_end.mp3'))
+
+
+def make_fixtures(folder, size):
+    """testsrc2 clips, testsrc2 stills (one frame per second) and a sine voiceover"""
+    if os.path.exists(os.path.join(folder, 'voiceover.mp3')):
+        return
+    os.makedirs(folder, exist_ok=True)
+    spec = SIZES[size]
+    frame = f"{spec['width']}x{spec['height']}"
+    for i in range(spec['clips']):
+        ffmpeg('-f', 'lavfi', '-i', f"testsrc2=size={frame}:rate=30:duration={spec['clip_seconds']}",
+               '-vf', f'hue=h={i * 40}', '-c:v', 'libx264', '-preset', 'ultrafast', '-threads', '1', '-pix_fmt', 'yuv420p',
+               os.path.join(folder, f'clip_{i:02d}.mp4'))
+    ffmpeg('-f', 'lavfi', '-i', f"testsrc2=size={frame}:rate=1:duration={spec['stills']}",
+           '-frames:v', str(spec['stills']), '-q:v', '3', os.path.join(folder, 'still_%02d.jpg'))
+    ffmpeg('-f', 'lavfi', '-i', f"sine=frequency=330:beep_factor=3:duration={spec['voiceover']}", '-ac', '2',
+           os.path.join(folder, 'voiceover.mp3'))
+
+
+def folder_files(folder):
+    files = {}
+    for path, _, names in os.walk(folder):
+        for name in names:
+            stat = os.stat(os.path.join(path, name))
+            files[os.path.join(path, name)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+
+def measure(stage, folder):
+    """Run one stage: wall and CPU time (this process and its children), peak child RSS, bytes written to `folder`"""
+    before = folder_files(folder)
+    usage = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    tracing.start()
+    start = time.perf_counter()
+    stage()
+    wall = time.perf_counter() - start
+    events = tracing.stop()
+    after = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    cpu = sum((end.ru_utime + end.ru_stime) - (begin.ru_utime + begin.ru_stime) for begin, end in zip(usage, after))
+    children = [event['args']['max_rss_mb'] for event in events if event.get('cat') == 'child']
+    written = sum(size for path, (size, mtime) in folder_files(folder).items() if before.get(path) != (size, mtime))
+    return {
+        'wall_s': round(wall, 3),
+        'cpu_s': round(cpu, 3),
+        # The slowest child dominates memory, the Python process is reported separately
+        'peak_rss_mb': max(children, default=0.0),
+        'self_rss_mb': round(after[0].ru_maxrss / 1024, 1),
+        'children': len(children),
+        'output_bytes': written,
+    }
+
+
+def run_once(size, work):
+    """Copy the fixtures into a fresh INPUT and run every stage on them in order"""
+    input_folder = os.path.join(work, 'INPUT')
+    shutil.rmtree(input_folder, ignore_errors=True)
+    shutil.copytree(os.path.join(work, 'fixtures', size), input_folder)
+
+    params = PipelineParams(input_folder=input_folder, segment_duration=SEGMENT_DURATION, trace_folder='')
+    folder_params = slideshow_params(params, OUTRO_DURATION, input_folder)
+    state = {}
+
+    def slideshow():
+        state['timeline'] = slideshow_timeline(state['folder'], folder_params)
+        if state['timeline'] is None:
+            raise RuntimeError(f"No slideshow timeline for {state['folder']}")
+        render_slideshow(state['folder'], folder_params, *state['timeline'])
+
+    def intermediate(name):
+        return [scratch.find(state['folder'], name) or os.path.join(state['folder'], name)]
+
+    # (name, stage, files it must leave behind): stages report failures by returning None/False,
+    # a failed stage would otherwise be measured as a fast one that writes nothing
+    stages = [
+        ('cut', lambda: state.update(zip(('result', 'datetime'), required(cut(CutterParams(
+            input_folder=input_folder, segment_duration=SEGMENT_DURATION, video_orientation='vertical')), "cut failed"))),
+         lambda: [state['result']]),
+        ('clean', lambda: clean(CleanerParams(input_folder=state['result'], minimum_duration=SEGMENT_DURATION)),
+         lambda: [state['result']]),
+        ('sort', lambda: state.update(folder=required(sort_files(SorterParams(state['result'], state['datetime'])), "sort failed")),
+         lambda: [state['folder']]),
+        ('slideshow', slideshow, lambda: intermediate('slideshow.mp4')),
+        ('audio', lambda: required(mix_audio(audio_params(state['folder'], folder_params), state['timeline'][1]), "audio mix failed"),
+         lambda: intermediate('mixed_audio.mp3')),
+        ('mux', lambda: required(process_audio(replace(audio_params(state['folder'], folder_params), step='mux')), "audio mux failed"),
+         lambda: intermediate('slideshow_with_audio.mp4')),
+        ('subscribe', lambda: state.update(outputs=add_overlay(subscribe_params(state['folder'], folder_params))),
+         lambda: state['outputs']),
+    ]
+    results = {}
+    for name, stage, outputs in stages:
+        print(f"##### {size}: {name}")
+        results[name] = measure(stage, input_folder)
+        missing = [path for path in outputs() if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"{size}/{name} wrote no {', '.join(missing)}")
+    return results
+
+
+def median_results(runs):
+    stages = {}
+    for name in runs[0]:
+        stages[name] = {metric: statistics.median(run[name][metric] for run in runs) for metric in runs[0][name]}
+    stages['total'] = {metric: round(sum(stage[metric] for stage in stages.values()), 3)
+                       for metric in ('wall_s', 'cpu_s', 'output_bytes')}
+    stages['total']['peak_rss_mb'] = max(stage['peak_rss_mb'] for name, stage in stages.items() if name != 'total')
+    return stages
+
+
+def machine():
+    try:
+        version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        version, commit = '', ''
+    return {'cpus': os.cpu_count(), 'platform': platform.platform(), 'python': platform.python_version(), 'ffmpeg': version, 'commit': commit}
+
+
+def compare(results, baseline, thresholds, min_delta):
+    """Stage metrics above the baseline by more than their threshold"""
+    regressions = []
+    for size, stages in results['sizes'].items():
+        for name, metrics in stages.items():
+            reference = baseline.get('sizes', {}).get(size, {}).get(name)
+            if not reference:
+                continue
+            for metric, threshold in thresholds.items():
+                old, new = reference.get(metric), metrics.get(metric)
+                if not old or new is None:
+                    continue
+                if metric.endswith('_s') and new - old < min_delta:
+                    continue
+                if new > old * (1 + threshold):
+                    regressions.append((size, name, metric, old, new))
+    return regressions
+
+
+def print_table(results):
+    print(f"\n{'size':<8}{'stage':<11}{'wall s':>9}{'cpu s':>9}{'peak MB':>9}{'output MB':>11}")
+    for size, stages in results['sizes'].items():
+        for name, metrics in stages.items():
+            print(f"{size:<8}{name:<11}{metrics['wall_s']:>9.2f}{metrics['cpu_s']:>9.2f}"
+                  f"{metrics['peak_rss_mb']:>9.1f}{metrics['output_bytes'] / 1e6:>11.2f}")
+
+
+if __name__ == "__main__":
+    thresholds = dict(THRESHOLDS)
+    for item in filter(None, args.thresholds.split(',')):
+        metric, value = item.split('=')
+        thresholds[metric] = float(value)
+
+    work = os.path.abspath(args.work)
+    # Stages read TEMPLATE/ and fonts/ relative to the working directory
+    make_template(os.path.join(work, 'TEMPLATE'))
+    if not os.path.exists(os.path.join(work, 'fonts')):
+        os.symlink(os.path.join(ROOT, 'fonts'), os.path.join(work, 'fonts'))
+    os.chdir(work)
+
+    results = {'date': datetime.now().isoformat(timespec='seconds'), 'machine': machine(), 'sizes': {}}
+    for size in args.sizes.split(','):
+        make_fixtures(os.path.join(work, 'fixtures', size), size)
+        try:
+            runs = [run_once(size, work) for _ in range(args.repeat)]
+        except (RuntimeError, subprocess.CalledProcessError) as error:
+            # Nothing is written or compared: a failed stage is not a measurement
+            print(f"***** Benchmark failed: {error}")
+            sys.exit(2)
+        results['sizes'][size] = median_results(runs)
+
+    print_table(results)
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results', f"{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n+++++ Results saved: {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, thresholds, args.min_delta)
+        for size, name, metric, old, new in regressions:
+            print(f"***** Regression {size}/{name} {metric}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+        if regressions:
+            sys.exit(1)
+        print(f"+++++ No regressions against {args.baseline}")
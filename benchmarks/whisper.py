@@ -0,0 +1,104 @@
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+# Run as `python benchmarks/whisper.py`: make the pipeline modules importable (common.py would pull in numpy and parallax)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import srt_generator  # noqa: E402
+
+parser = argparse.ArgumentParser(description="WhisperX real-time factor and word error rate per model size and compute type")
+parser.add_argument('--i', type=str, default=os.path.join(ROOT, 'benchmarks', 'fixtures', 'voiceover'), dest='fixtures',
+                    help='Folder of voiceovers (.mp3/.wav), each with a reference transcript of the same name (.txt)')
+parser.add_argument('--models', type=str, default='tiny,base,small', dest='models', help='Comma separated Whisper model sizes')
+parser.add_argument('--ct', type=str, default=','.join(srt_generator.COMPUTE_TYPES), dest='compute_types', help='Comma separated compute types')
+parser.add_argument('--threads', type=int, default=srt_generator.THREADS, dest='threads', help='CPU threads')
+parser.add_argument('--lang', type=str, default='en', dest='language', help='Language of the fixtures')
+args = parser.parse_args()
+
+
+def fixtures(folder):
+    """(audio, reference text) pairs, audio files without a reference are skipped"""
+    pairs = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        reference = os.path.join(folder, stem + '.txt')
+        if ext.lower() in ('.mp3', '.wav') and os.path.exists(reference):
+            with open(reference, encoding='utf-8') as f:
+                pairs.append((os.path.join(folder, name), f.read()))
+    return pairs
+
+
+def audio_duration(path):
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path
+    ], check=True, capture_output=True, text=True)
+    return float(result.stdout.strip())
+
+
+def normalize(text):
+    """Lowercase words without punctuation, the usual WER normalization"""
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """(substitutions + deletions + insertions) / reference words, by word-level edit distance"""
+    ref, hyp = normalize(reference), normalize(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word),
+            ))
+        previous = current
+    return previous[-1] / max(1, len(ref))
+
+
+def transcript(aligned_result):
+    return ' '.join(word['word'].strip() for seg in aligned_result['segments'] for word in seg.get('words', []))
+
+
+if __name__ == "__main__":
+    pairs = fixtures(args.fixtures)
+    if not pairs:
+        parser.error(f"no voiceover fixtures with .txt references in {args.fixtures}")
+    srt_generator.set_threads(args.threads)
+    durations = [audio_duration(audio) for audio, _ in pairs]
+    total_audio = sum(durations)
+    print(f"##### {len(pairs)} fixtures, {total_audio:.1f}s of audio, {args.threads} threads")
+
+    results = []
+    for model_name in args.models.split(','):
+        for compute_type in args.compute_types.split(','):
+            print(f"##### {model_name} / {compute_type}")
+            start = time.perf_counter()
+            try:
+                srt_generator.load_models(args.language, model_name, 'cpu', compute_type)
+            except Exception as e:
+                print(f"***** Skipping {model_name} / {compute_type}: {e}")
+                continue
+            load_time = time.perf_counter() - start
+
+            elapsed, errors = 0.0, []
+            for (audio, reference), duration in zip(pairs, durations):
+                start = time.perf_counter()
+                aligned_result = srt_generator.transcribe_in_process(audio, args.language, model_name, 'cpu', compute_type)
+                seconds = time.perf_counter() - start
+                elapsed += seconds
+                errors.append(word_error_rate(reference, transcript(aligned_result)))
+                print(f"----- {os.path.basename(audio)}: {seconds:.2f}s, RTF {seconds / duration:.3f}, WER {errors[-1]:.3f}")
+            results.append((model_name, compute_type, load_time, elapsed / total_audio, sum(errors) / len(errors)))
+
+            # Free the ASR model before loading the next combination, the alignment model is shared
+            srt_generator._asr_models.clear()
+
+    print(f"\n{'model':<10}{'compute':<14}{'load s':>8}{'RTF':>8}{'WER':>8}")
+    for model_name, compute_type, load_time, rtf, wer in results:
+        print(f"{model_name:<10}{compute_type:<14}{load_time:>8.1f}{rtf:>8.3f}{wer:>8.3f}")
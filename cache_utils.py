@@ -0,0 +1,47 @@
+import hashlib
+import json
+import os
+import uuid
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """Return the sha256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_hash(**params):
+    """Return a short stable key for a set of parameters (order independent)."""
+    payload = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+
+def cache_path(cache_folder, kind, key, ext):
+    """Build the path of a cached artifact, creating its folder if needed."""
+    folder = os.path.join(cache_folder, kind)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, key + ext)
+
+
+def partial_path(path):
+    """Temp name next to a cached artifact, unique per writer so concurrent renders of one key never share it."""
+    base, ext = os.path.splitext(path)
+    return f"{base}.{os.getpid()}-{uuid.uuid4().hex[:8]}.part{ext}"
+
+
+def publish(partial, path):
+    """Move a finished temp file into the cache; when another writer published the key first, keep theirs."""
+    if os.path.exists(path):
+        os.remove(partial)
+        return path
+    try:
+        os.replace(partial, path)
+    except OSError:
+        # Lost the race where the entry cannot be replaced (open on Windows)
+        if not os.path.exists(path):
+            raise
+        os.remove(partial)
+    return path
@@ -2,6 +2,17 @@ import subprocess
 import argparse
 import os
 import shutil
+from dataclasses import dataclass
+from typing import List, Optional
+
+import tracing
+
+
+@dataclass
+class CleanerParams:
+    input_folder: str
+    minimum_duration: Optional[int] = None
+    is_dry_run: bool = False
 
 def find_video_files(directory):
     """Find all video files under the given directory"""
@@ -14,7 +25,7 @@ def find_video_files(directory):
 def get_video_duration(filename):
     """Get the duration of the video in seconds"""
     try:
-        p = subprocess.Popen(["ffprobe",
+        p = tracing.Popen(["ffprobe",
                              "-loglevel",
                              "error",
                              "-select_streams",
@@ -45,44 +56,49 @@ def get_video_duration(filename):
         return None
 
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument('--i', required=True, type=str,
-                        dest='input_folder',
-                        help='the input folder containing video files')
-    parser.add_argument('--d', action='store_const',
-                        const=True,
-                        dest='is_dry_run',
-                        default=False,
-                        help='only show actions that would be performed')
-    parser.add_argument('--m', type=int, default=None,
-                        dest='minimum_duration',
-                        help='delete videos shorter than N seconds')
-
-    args = parser.parse_args()
-
+def clean(params: CleanerParams) -> List[str]:
+    """Delete videos shorter than the minimum duration, returns the deleted (or would-be deleted) files"""
     files_to_delete = set()
-    for filename in find_video_files(args.input_folder):
+    for filename in find_video_files(params.input_folder):
         duration = get_video_duration(filename)
-        if duration is not None and duration < args.minimum_duration:
+        if duration is not None and duration < params.minimum_duration:
             files_to_delete.add(filename)
-        elif args.is_dry_run and duration is not None and duration <= args.minimum_duration:
+        elif params.is_dry_run and duration is not None and duration <= params.minimum_duration:
             print(f"----- {filename} would be deleted ({duration:.3f}s)")
 
     if len(files_to_delete) > 0:
-        if args.is_dry_run:
+        if params.is_dry_run:
             print("+++++ Would delete the following files:")
         else:
-            print(f"+++++ Deleted the following files shorter than {args.minimum_duration}s")
+            print(f"+++++ Deleted the following files shorter than {params.minimum_duration}s")
         for filename in sorted(files_to_delete):
             duration = get_video_duration(filename)
-            if args.is_dry_run:
+            if params.is_dry_run:
                 print(f"----- {filename} ({duration:.3f}s)")
             else:
                 os.unlink(filename)
                 if not os.access(os.path.dirname(filename), os.R_OK | os.W_OK):
                     shutil.rmtree(os.path.dirname(filename))
                 print(f"----- {filename} ({duration:.3f}s)")
+    return sorted(files_to_delete)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--i', required=True, type=str,
+                        dest='input_folder',
+                        help='the input folder containing video files')
+    parser.add_argument('--d', action='store_const',
+                        const=True,
+                        dest='is_dry_run',
+                        default=False,
+                        help='only show actions that would be performed')
+    parser.add_argument('--m', type=int, default=None,
+                        dest='minimum_duration',
+                        help='delete videos shorter than N seconds')
+
+    args = parser.parse_args()
+    clean(CleanerParams(args.input_folder, args.minimum_duration, args.is_dry_run))
 
 if __name__ == "__main__":
     main()
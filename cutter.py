@@ -3,68 +3,37 @@ import shutil
 import subprocess
 import argparse
 import json
+from dataclasses import dataclass
+from typing import Tuple
 from PIL import Image, ImageFilter, ImageDraw
 from datetime import datetime
 
+import scratch
+import tracing
 
-parser = argparse.ArgumentParser()
 
-parser.add_argument('--sd', type=int, default=6, dest='segment_duration', help='Duration of each segment (in seconds)')
-parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
+@dataclass
+class CutterParams:
+    input_folder: str = 'INPUT'
+    template_folder: str = 'TEMPLATE'
+    segment_duration: int = 6
+    video_orientation: str = 'vertical'
 
 
-parser.add_argument('--i', type=str, default='INPUT', dest='input_folder', help='Input folder')
-parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
-
-parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
-parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Font size')
-parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file name')
-parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
-parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before overlay appears (in seconds)')
-parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
-parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
-parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
-parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
-
-parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
-
-
-parser.add_argument('--w', type=str, default='Today is a\\n Plus Day', dest='watermark', help='Watermark text')
-parser.add_argument('--wt', type=str, default='random', dest='watermark_type', help='Watermark type: ccw, random')
-parser.add_argument('--ws', type=int, default=50, dest='watermark_speed', help='Watermark speed')
-parser.add_argument('--wf', type=str, default='Nexa Bold.otf', dest='watermark_font', help='Watermark font file name')
-
-parser.add_argument('--z', type=str, default='0', dest='depthflow', help='Use DepthFlow for images? 0/1')
-parser.add_argument('--o', type=str, default='vertical', dest='video_orientation', help='Video orientation (vertical|horizontal)')
-
-parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
-parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
-parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
-
-
-parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Add subtitle? 0/1')
-parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
-
-parser.add_argument('--b', type=str, default='0', dest='blur', help='Add blur? 0/1')
-
-args = parser.parse_args()
-
-video_orientation = args.video_orientation
-
 # Function to split a video into segments of X seconds
-def split_video(input_file, output_prefix, segment_duration=args.segment_duration):
+def split_video(input_file, output_prefix, segment_duration):
     try:
         # cmd = f"ffmpeg -i {input_file} -c:v libx265 -crf 22 -map 0 -segment_time {segment_duration} -g {segment_duration} -sc_threshold 0 -force_key_frames expr:gte\(t,n_forced*{segment_duration}\) -f segment -reset_timestamps 1 {output_prefix}%d.mp4"
         # print(f"----- Processing {input_file}")
 
-        cmd = (
-            f"ffmpeg -hide_banner -loglevel error -i {input_file} -c:v libx264 -crf 22 -g 30 -r 30 -an "  # Remove audio with -an flag
-            f"-map 0 -segment_time {segment_duration} -g {segment_duration} "
-            f"-sc_threshold 0 -force_key_frames expr:gte\(t,n_forced*{segment_duration}\) "
-            f"-f segment -reset_timestamps 1 {output_prefix}%d.mp4"
-        )
+        cmd = [
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', input_file, '-c:v', 'libx264', '-crf', '22', '-g', '30', '-r', '30', '-an',  # Remove audio with -an flag
+            '-map', '0', '-segment_time', str(segment_duration), '-g', str(segment_duration),
+            '-sc_threshold', '0', '-force_key_frames', f'expr:gte(t,n_forced*{segment_duration})',
+            '-f', 'segment', '-reset_timestamps', '1', f'{output_prefix}%d.mp4'
+        ]
 
-        p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        p = tracing.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, report_progress=True)
         while True:
             line = p.stdout.readline()
             if not line:
@@ -77,39 +46,15 @@ def split_video(input_file, output_prefix, segment_duration=args.segment_duratio
     except Exception as e:
         print(f"Failed to process {input_file}: {e}")
 
-# Input folder containing videos
-input_folder = args.input_folder
-
-# Template folder
-template_folder = args.template_folder + '/'
-
-# Output folder for processed videos
-result_folder = os.path.join(input_folder, 'RESULT')
-
-# Create the output folder if it doesn't exist
-if not os.path.exists(result_folder):
-    os.makedirs(result_folder)
-
-# Create a "SOURCE" subfolder to store original video files after cutting
-source_folder = os.path.join(input_folder, 'SOURCE')
-if not os.path.exists(source_folder):
-    os.makedirs(source_folder)
-
-# Get the current date and time
-current_datetime = datetime.now()
-datetime_str = current_datetime.strftime("%Y-%m-%d_%H-%M-%S")
-
-# Create the subfolder for the date-time if it doesn't exist
-source_date_folder = os.path.join(source_folder, datetime_str)
-os.makedirs(source_date_folder, exist_ok=True)
-
-
 
 # Function to process videos based on orientation
 def process_videos(input_path, output_path, target_height, video_orientation):
+    # Returns the processed video, a temporary file (on the scratch disk when there is one) the caller
+    # splits and removes; None when the video needs no processing
     # Get video dimensions
-    cmd = f"ffprobe -v error -show_entries stream=width,height -of json {input_path}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
+    result = tracing.run([
+        'ffprobe', '-v', 'error', '-show_entries', 'stream=width,height', '-of', 'json', input_path
+    ], capture_output=True, text=True, check=True)
     json_data = json.loads(result.stdout)
     width = json_data['streams'][0]['width']
     height = json_data['streams'][0]['height']
@@ -117,8 +62,8 @@ def process_videos(input_path, output_path, target_height, video_orientation):
     # Determine if video is vertical (height > width)
     is_vertical_video = height > width
     
-    # Create a temporary file for processing
-    temp_output = os.path.join(os.path.dirname(output_path), "temp_" + os.path.basename(output_path))
+    # Create a temporary file for processing (on the scratch disk when there is one)
+    temp_output = scratch.temp(output_path, os.path.getsize(input_path))
     
     # Process based on video orientation and target orientation
     if is_vertical_video and video_orientation == 'horizontal':
@@ -142,71 +87,19 @@ def process_videos(input_path, output_path, target_height, video_orientation):
         )
         
         # Execute FFmpeg command
-        cmd = (
-            f"ffmpeg -hide_banner -loglevel error -i {input_path} "
-            f"-filter_complex \"{filter_complex}\" "
-            f"-map \"[outv]\" -c:v libx264 -crf 22 -preset medium "
-            f"-r 30 -an {temp_output}"
-        )
+        tracing.run([
+            'ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', input_path,
+            '-filter_complex', filter_complex,
+            '-map', '[outv]', '-c:v', 'libx264', '-crf', '22', '-preset', 'medium',
+            '-r', '30', '-an', temp_output
+        ], check=True, report_progress=True)
         
-        subprocess.run(cmd, shell=True, check=True)
-        
-        # Replace original with processed file
-        shutil.move(temp_output, output_path)
-        return True
+        # Split from where it was written, only the segments go to the media folder
+        return temp_output
     else:
         # For other cases, just copy the file to output
         # shutil.copy(input_path, output_path)
-        return False
-
-# List all video files in the input folder
-video_files = [f for f in os.listdir(input_folder) if f.endswith('.mp4')]
-
-# List all image files in the input folder
-image_files = [f for f in os.listdir(input_folder) if f.endswith('.jpg') or f.endswith('.jpeg')]
-
-# List all audio files in the input folder
-audio_files = [f for f in os.listdir(input_folder) if f.endswith('.mp3')]
-
-print('##### Video processing')
-
-# Process each video file
-for video_file in video_files:
-    input_path = os.path.join(input_folder, video_file)
-    
-    # ffprobe video to check dimensions
-    cmd = f"ffprobe -v error -show_entries stream=width,height -of json {input_path}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
-    json_data = json.loads(result.stdout)
-    width = json_data['streams'][0]['width']
-    height = json_data['streams'][0]['height']
-    
-    # Copy original video to the "SOURCE" subfolder
-    shutil.copy(input_path, os.path.join(source_date_folder, video_file))
-    
-    # Process the video based on orientation
-    target_height = 1080  # For horizontal output
-    processed_path = os.path.join(result_folder, video_file)
-    
-    # Process the video (resize, blur background if needed)
-    processed = process_videos(input_path, processed_path, target_height, video_orientation)
-    
-    # If video was processed, use it for splitting
-    if processed:
-        # Split the processed video
-        output_prefix = os.path.splitext(os.path.basename(video_file))[0] + '_'
-        split_video(processed_path, os.path.join(result_folder, output_prefix))
-        # Remove the intermediate processed file
-        os.remove(processed_path)
-    else:
-        # Split the original video
-        output_prefix = os.path.splitext(os.path.basename(video_file))[0] + '_'
-        split_video(input_path, os.path.join(result_folder, output_prefix))
-    
-    # Remove the original video from input folder
-    os.remove(input_path)
-
-print(f'##### Videos processed and moved to {result_folder}')
+        return None
 
 # def resize_image(media_path, target_height):
 #     # Function to resize the image
@@ -247,9 +140,6 @@ print(f'##### Videos processed and moved to {result_folder}')
 
 
 
-# Set target height
-target_height = 1920 if video_orientation == 'vertical' else 1080
-
 def process_image(media_path, target_height, video_orientation):
     # Open the original image
     original_image = Image.open(media_path)
@@ -417,148 +307,248 @@ def process_images(input_folder, result_folder, source_date_folder, video_orient
     
     print(f'##### Images moved to {result_folder}')
 
-# Process images
-process_images(input_folder, result_folder, source_date_folder, video_orientation)
-
-
-
-
-# # Move each image file to RESULT
-# for image_file in image_files:
-#     input_path = os.path.join(input_folder, image_file)
-    
-#     # Copy original image to the "SOURCE" subfolder
-#     shutil.copy(input_path, os.path.join(source_date_folder, image_file))
-
-    
-#     resize_image(input_path, target_height)
-#     crop_image(input_path, target_width, target_height)
-
-
-#     # Move images to "RESULT" subfolder
-#     shutil.move(input_path, os.path.join(result_folder, image_file))
-
-# print(f'##### Images moved to {result_folder}')
-
-# Move each audio file to INPUT/RESULT
-for audio_file in audio_files:
-    input_path = os.path.join(input_folder, audio_file)
-
-    # Copy original image to the "SOURCE" subfolder
-    shutil.copy(input_path, os.path.join(source_date_folder, audio_file))
-    
-    # Move the original video to the "RESULT" subfolder
-    shutil.move(input_path, os.path.join(result_folder, audio_file))
-
-print(f'##### Voiceover moved to {result_folder}')
-
-print(f'##### Delete videos shorter than {args.segment_duration}s')
 
-# After video splitting is completed, run the cleaner.py script with arguments
-cleaner_script = 'cleaner.py'  # Replace with the actual filename of your cleaner script
-cleaner_args = ['--i', result_folder, '--m', str(args.segment_duration)]  # Arguments to pass to cleaner.py
 
-# Construct the full command to run cleaner.py with arguments
-cleaner_command = ['python3', cleaner_script] + cleaner_args
-
-# Run the cleaner.py script with arguments
-subprocess.run(cleaner_command)
-
-print(f'##### Rename and move to {result_folder}/{datetime_str}')
-
-# After video cleaning is completed, run the sorter.py script with arguments
-sorter_script = 'sorter.py'  # Replace with the actual filename of your sorter script
-sorter_args = ['--o', result_folder, '--d', datetime_str]  # Arguments to pass to sorter.py
-
-# Construct the full command to run cleaner.py with arguments
-sorter_command = ['python3', sorter_script]  + sorter_args
-# sorter_command = ['python3', sorter_script]
-
-# Run the cleaner.py script with arguments
-subprocess.run(sorter_command)
-
-print(f'##### Create slideshow {str(args.segment_duration - 1)}s per slide with 1s transitions')
-
-# Calculate length of outro video to subtract from time limit later in DepthFlow and Slideshow
-# Get outro video duration using ffprobe
-
-if video_orientation == 'vertical':
-    outro_video_path = template_folder + 'outro_vertical.mp4'
-
-else:
-    outro_video_path = template_folder + 'outro_horizontal.mp4'
-try:
-    cmd = f"ffprobe -v error -show_entries format=duration -of json {outro_video_path}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
-    json_data = json.loads(result.stdout)
-    outro_duration = round(float(json_data['format']['duration']))
-    print(f"Outro video duration: {outro_duration} seconds")
-except Exception as e:
-    print(f"Error getting outro video duration: {e}")
-    outro_duration = 15  # Fallback to default duration if ffprobe fails
+def probe_outro_length(template_folder, video_orientation):
+    """Exact length of the outro video in seconds, the slideshow ends with all of it"""
+    if video_orientation == 'vertical':
+        outro_video_path = os.path.join(template_folder, 'outro_vertical.mp4')
+    else:
+        outro_video_path = os.path.join(template_folder, 'outro_horizontal.mp4')
+    try:
+        result = tracing.run([
+            'ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', outro_video_path
+        ], capture_output=True, text=True, check=True)
+        json_data = json.loads(result.stdout)
+        outro_length = float(json_data['format']['duration'])
+        print(f"Outro video duration: {outro_length} seconds")
+    except Exception as e:
+        print(f"Error getting outro video duration: {e}")
+        outro_length = 15.0  # Fallback to default duration if ffprobe fails
+    return outro_length
 
 
-# Check if DepthFlow equal 1:
+def probe_outro_duration(template_folder, video_orientation):
+    """Length of the outro video in whole seconds, subtracted from the time limit in DepthFlow and Slideshow"""
+    return round(probe_outro_length(template_folder, video_orientation))
 
-if args.depthflow == '1':
 
-    print("DepthFlow is True")
-    depth_script = 'depth.py'  # Replace with the actual filename of your depth script
+def cut(params: CutterParams) -> Tuple[str, str]:
+    """Split the input videos, fit the images and move everything to RESULT, returns (result folder, datetime)"""
+    input_folder = params.input_folder
+    video_orientation = params.video_orientation
 
-    slideshow_duration = int(args.time_limit - outro_duration)
+    # Output folder for processed videos
+    result_folder = os.path.join(input_folder, 'RESULT')
 
-    depth_args = ['--o', result_folder, '--d', datetime_str, '--sd', str(args.segment_duration), '--tl', str(slideshow_duration)]
-    
-    print(f"##### CREATING DEPTHFLOW: {depth_args}")
+    # Create the output folder if it doesn't exist
+    if not os.path.exists(result_folder):
+        os.makedirs(result_folder)
 
-    # Construct the full command to run depth.py with arguments
-    depth_command = ['python3', depth_script]  + depth_args
+    # Create a "SOURCE" subfolder to store original video files after cutting
+    source_folder = os.path.join(input_folder, 'SOURCE')
+    if not os.path.exists(source_folder):
+        os.makedirs(source_folder)
 
-    # Run the depth.py script with arguments
-    subprocess.run(depth_command)
+    # Get the current date and time
+    current_datetime = datetime.now()
+    datetime_str = current_datetime.strftime("%Y-%m-%d_%H-%M-%S")
 
-# Do the slideshow
-slideshow_script = 'slideshow.py'  # Replace with the actual filename of your sorter script
-slideshow_args = [
-    '--sd', str(args.segment_duration - 1), 
-    '--tl', str(args.time_limit), 
-    '--od', str(outro_duration),
+    # Create the subfolder for the date-time if it doesn't exist
+    source_date_folder = os.path.join(source_folder, datetime_str)
+    os.makedirs(source_date_folder, exist_ok=True)
 
-    '--tpl', args.template_folder,
+    # List all video files in the input folder
+    video_files = [f for f in os.listdir(input_folder) if f.endswith('.mp4')]
 
-    '--t', args.title, 
-    '--tfs', str(args.title_fontsize), 
-    '--tf', args.title_fontfile,
-    '--tfc', args.title_fontcolor,
-    '--osd', str(args.start_delay),
-    '--tad', str(args.title_appearance_delay),
-    '--tvt', str(args.title_visible_time),
-    '--txo', str(args.title_x_offset),
-    '--tyo', str(args.title_y_offset),
-    '--vd', str(args.vo_delay),
+    # List all audio files in the input folder
+    audio_files = [f for f in os.listdir(input_folder) if f.endswith('.mp3')]
 
-    '--w', args.watermark, 
-    '--wf', args.watermark_font,
-    '--wt', args.watermark_type, 
-    '--ws', str(args.watermark_speed), 
+    print('##### Video processing')
 
-    '--z', str(args.depthflow), 
-    '--o', str(args.video_orientation),
+    # Process each video file
+    for video_file in video_files:
+        input_path = os.path.join(input_folder, video_file)
 
-    '--chr', args.chromakey_color, 
-    '--cs', str(args.chromakey_similarity), 
-    '--cb', str(args.chromakey_blend),
+        # Copy original video to the "SOURCE" subfolder
+        shutil.copy(input_path, os.path.join(source_date_folder, video_file))
 
-    '--srt', args.generate_srt,
-    '--smaxw', str(args.subtitle_max_width),
-]
+        # Process the video based on orientation
+        target_height = 1080  # For horizontal output
+        processed_path = os.path.join(result_folder, video_file)
 
-# Construct the full command to run slideshow.py with arguments
-slideshow_command = ['python3', slideshow_script]  + slideshow_args
+        # Process the video (resize, blur background if needed)
+        processed = process_videos(input_path, processed_path, target_height, video_orientation)
 
-# Run the slideshow.py script with arguments
-print(f"###### CREATING SLIDESHOW: {slideshow_command}")
+        output_prefix = os.path.splitext(os.path.basename(video_file))[0] + '_'
+        # If video was processed, use it for splitting
+        if processed:
+            # Split the processed video
+            split_video(processed, os.path.join(result_folder, output_prefix), params.segment_duration)
+            # Remove the intermediate processed file
+            os.remove(processed)
+        else:
+            # Split the original video
+            split_video(input_path, os.path.join(result_folder, output_prefix), params.segment_duration)
+
+        # Remove the original video from input folder
+        os.remove(input_path)
+
+    print(f'##### Videos processed and moved to {result_folder}')
+
+    # Process images
+    process_images(input_folder, result_folder, source_date_folder, video_orientation)
+
+    # Move each audio file to INPUT/RESULT
+    for audio_file in audio_files:
+        input_path = os.path.join(input_folder, audio_file)
+
+        # Copy original image to the "SOURCE" subfolder
+        shutil.copy(input_path, os.path.join(source_date_folder, audio_file))
+
+        # Move the original video to the "RESULT" subfolder
+        shutil.move(input_path, os.path.join(result_folder, audio_file))
+
+    print(f'##### Voiceover moved to {result_folder}')
+    return result_folder, datetime_str
+
+
+def build_parser():
+    """Pipeline flags, shared with the watch-folder daemon (watcher.py)"""
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--sd', type=int, default=6, dest='segment_duration', help='Duration of each segment (in seconds)')
+    parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
+
+
+    parser.add_argument('--i', type=str, default='INPUT', dest='input_folder', help='Input folder')
+    parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
+
+    parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
+    parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Font size')
+    parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file name')
+    parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
+    parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before overlay appears (in seconds)')
+    parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
+    parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
+    parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
+    parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
+
+    parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
+
+
+    parser.add_argument('--w', type=str, default='Today is a\\n Plus Day', dest='watermark', help='Watermark text')
+    parser.add_argument('--wt', type=str, default='random', dest='watermark_type', help='Watermark type: ccw, random')
+    parser.add_argument('--ws', type=int, default=50, dest='watermark_speed', help='Watermark speed')
+    parser.add_argument('--wf', type=str, default='Nexa Bold.otf', dest='watermark_font', help='Watermark font file name')
+
+    parser.add_argument('--z', type=str, default='0', dest='depthflow', help='Use DepthFlow for images? 0/1')
+    parser.add_argument('--dw', type=int, default=int(os.getenv('WORKERS', 1)), dest='depth_workers', help='Concurrent DepthFlow render workers')
+    parser.add_argument('--de', type=str, default='depthflow', choices=['depthflow', 'numpy'], dest='depth_engine', help='Parallax engine: DepthFlow (OpenGL) or NumPy (CPU only)')
+    parser.add_argument('--drs', type=float, default=1.0, dest='depth_render_scale', help='Render parallax clips at this fraction of the output size (e.g. 0.5)')
+    parser.add_argument('--o', type=str, default='vertical', dest='video_orientation', help='Video orientation (vertical|horizontal)')
+
+    parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
+    parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
+    parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
+
+
+    parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Add subtitle? 0/1')
+    parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
+    parser.add_argument('--model', type=str, default='', dest='whisper_model', help='Whisper model size for subtitles (default: $WHISPER_MODEL, base)')
+    parser.add_argument('--ct', type=str, default='', dest='whisper_compute_type', help='Whisper CPU compute type: int8, int8_float32, float32 (default: $WHISPER_COMPUTE_TYPE, float32)')
+    parser.add_argument('--smart', type=str, default='0', dest='smart_render', help='Smart-render the subscribe overlay window only? 0/1')
+    parser.add_argument('--variants', type=str, default='', dest='variants_file', help='JSON list of title variants rendered from one base video')
+
+    parser.add_argument('--b', type=str, default='0', dest='blur', help='Add blur? 0/1')
+
+    parser.add_argument('--trace', type=str, default='TRACE', dest='trace_folder', help='Folder for the Chrome trace (JSON) of each run, empty to disable')
+    parser.add_argument('--artifacts', type=str, default=os.getenv('ARTIFACT_POLICY', ''), dest='artifact_policy', help='Intermediates to delete or compress once used, e.g. "mixed=compress,source=delete" ("keep" for none, see artifacts.py)')
+    parser.add_argument('--scratch', type=str, default=os.getenv('SCRATCH_DIR', ''), dest='scratch_folder', help='Fast local folder (tmpfs, NVMe) for intermediates (default: $SCRATCH_DIR, otherwise next to the media)')
+    parser.add_argument('--cpu', type=float, default=None, dest='cpu_budget', help='CPUs the batch may keep busy (default: all available)')
+    parser.add_argument('--mem', type=int, default=None, dest='memory_budget', help='Memory the batch may use in MB (default: 80%% of available)')
+    parser.add_argument('--pin', type=str, default=os.getenv('PIN_THREADS', '0'), dest='pin_threads', help='Pin each batch stage to the cores of its thread budget? 0/1')
+    parser.add_argument('--history', type=str, default=os.getenv('RUN_HISTORY', 'TRACE/history.db'), dest='history_file', help='SQLite database every run is recorded in, empty to disable')
+    return parser
+
+
+def pipeline_params(args):
+    # The whole chain runs in this process, see pipeline.py
+    from pipeline import PipelineParams
+
+    return PipelineParams(
+        segment_duration=args.segment_duration,
+        time_limit=args.time_limit,
+        input_folder=args.input_folder,
+        template_folder=args.template_folder,
+        title=args.title,
+        title_fontsize=args.title_fontsize,
+        title_fontfile=args.title_fontfile,
+        title_fontcolor=args.title_fontcolor,
+        start_delay=args.start_delay,
+        title_appearance_delay=args.title_appearance_delay,
+        title_visible_time=args.title_visible_time,
+        title_y_offset=args.title_y_offset,
+        title_x_offset=args.title_x_offset,
+        vo_delay=args.vo_delay,
+        watermark=args.watermark,
+        watermark_type=args.watermark_type,
+        watermark_speed=args.watermark_speed,
+        watermark_font=args.watermark_font,
+        depthflow=args.depthflow == '1',
+        depth_workers=args.depth_workers,
+        depth_engine=args.depth_engine,
+        depth_render_scale=args.depth_render_scale,
+        video_orientation=args.video_orientation,
+        chromakey_color=args.chromakey_color,
+        chromakey_similarity=args.chromakey_similarity,
+        chromakey_blend=args.chromakey_blend,
+        generate_srt=args.generate_srt == '1',
+        subtitle_max_width=args.subtitle_max_width,
+        whisper_model=args.whisper_model,
+        whisper_compute_type=args.whisper_compute_type,
+        smart_render=args.smart_render == '1',
+        variants_file=args.variants_file,
+        blur=args.blur == '1',
+        trace_folder=args.trace_folder,
+        scratch_folder=args.scratch_folder,
+        artifact_policy=args.artifact_policy,
+        history_file=args.history_file,
+    )
+
+
+def main():
+    parser = build_parser()
+    parser.add_argument('--jobs', type=str, default='', dest='jobs', help='Comma separated subfolders of the input folder scheduled as one batch ("all" for every subfolder)')
+    parser.add_argument('--plan', action='store_true', dest='plan', help='Only predict wall time and disk use of the input from the run history')
+    args = parser.parse_args()
+
+    from pipeline import check_params, plan, run, run_batch
+
+    params = pipeline_params(args)
+    try:
+        check_params(params)
+    except ValueError as error:
+        parser.error(str(error))
+    if not args.jobs:
+        if args.plan:
+            plan(params)
+        else:
+            run(params)
+        return
+
+    if args.jobs == 'all':
+        jobs = sorted(
+            name for name in os.listdir(args.input_folder)
+            if os.path.isdir(os.path.join(args.input_folder, name)) and name not in ('RESULT', 'SOURCE')
+        )
+    else:
+        jobs = args.jobs.split(',')
+    if args.plan:
+        plan(params, jobs)
+        return
+    run_batch(params, jobs, args.cpu_budget, args.memory_budget, pin=args.pin_threads == '1')
 
-subprocess.run(slideshow_command)
 
-print("###### SLIDESHOW READY ######")
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import itertools
 import math
 import os
@@ -6,56 +8,69 @@ import random  # Importing random for randomness in animations
 import argparse
 
 from abc import abstractmethod
+from concurrent.futures import Future
+from dataclasses import dataclass
 from pathlib import Path
-from threading import Thread
-from typing import List, Self, Type
+from queue import Queue
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Dict, List, Optional, Self, Type
 
 from attr import Factory, define
 from click import clear
-from DepthFlow import DepthScene
-from DepthFlow.Motion import Animation, Components, Preset, Presets, Target
-from DepthFlow.State import DepthState
 from dotmap import DotMap
 
-from Broken.Externals.Depthmap import DepthAnythingV2, DepthEstimator
-from Broken.Externals.Upscaler import BrokenUpscaler, NoUpscaler
+import governor
+import scratch
+from depthmaps import BatchDepthEstimator, cached_depthmap, estimator_name, load_or_estimate
+from model_service import request
+from parallax import NumpyParallax
 
 os.environ["PYTORCH_ENABLE_MPS_FALLBACK"] = "1"
 
-parser = argparse.ArgumentParser(description="Create DepthFlow")
-# Create an ArgumentParser to handle command-line arguments
-parser.add_argument('--o', dest='path', required=True, help='Path to the directory containing files to be sorted.')
-parser.add_argument('--d', dest='datetimeStr', required=True, help='Datetime folder name.')
-parser.add_argument('--sd', type=int, default=5, dest='segment_duration', help='Frame duration.')
-parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
-
-args = parser.parse_args()
-output_folder = args.path
-datetime_str = args.datetimeStr
-
-datetime_folder = os.path.join(output_folder, datetime_str)
-os.makedirs(datetime_folder, exist_ok=True)
-
-image_paths = [f for f in os.listdir(datetime_folder) if f.endswith('.jpg') or f.endswith('.jpeg')]
-video_paths = [f for f in os.listdir(datetime_folder) if f.endswith('.mp4')]
-merged_paths = sorted(image_paths + video_paths, key=lambda x: x.lower())
-
-# limit number of values in "merged_paths"
-limit = int(args.time_limit / (args.segment_duration - 1))
-print(f"***** Number of values in merged_paths: {len(merged_paths)}")
-merged_paths = merged_paths[:limit]
-
-# delete images that are not in "merged_paths" from disk
-for image_path in image_paths:
-    if image_path not in merged_paths:
-        os.remove(os.path.join(datetime_folder, image_path))
-        print(f"Deleted image: {image_path}")
-
-# delete videos that are not in "merged_paths" from disk
-for video_path in video_paths:
-    if video_path not in merged_paths:
-        os.remove(os.path.join(datetime_folder, video_path))
-        print(f"Deleted video: {video_path}")
+# DepthFlow and Broken (OpenGL, torch) are imported where the DepthFlow engine uses them,
+# so `--de numpy` runs without the GL stack installed
+if TYPE_CHECKING:
+    from Broken.Externals.Depthmap import DepthEstimator
+    from Broken.Externals.Upscaler import BrokenUpscaler
+    from DepthFlow import DepthScene
+
+@dataclass
+class DepthParams:
+    path: str
+    datetime_str: str
+    segment_duration: int = 5
+    time_limit: int = 595
+    cache_folder: str = 'CACHE'
+    workers: int = int(os.getenv("WORKERS", 1))
+    render_scale: float = 1.0
+    engine: str = 'depthflow'
+    depth_model: str = 'small'
+    estimate_batch: int = 4
+    estimate_threads: Optional[int] = os.cpu_count()
+
+
+def trim_media(datetime_folder: str, segment_duration: int, time_limit: int) -> None:
+    """Delete the stills and clips that do not fit in the slideshow, so nothing is rendered for them"""
+    image_paths = [f for f in os.listdir(datetime_folder) if f.endswith('.jpg') or f.endswith('.jpeg')]
+    video_paths = [f for f in os.listdir(datetime_folder) if f.endswith('.mp4')]
+    merged_paths = sorted(image_paths + video_paths, key=lambda x: x.lower())
+
+    # limit number of values in "merged_paths"
+    limit = int(time_limit / (segment_duration - 1))
+    print(f"***** Number of values in merged_paths: {len(merged_paths)}")
+    merged_paths = merged_paths[:limit]
+
+    # delete images that are not in "merged_paths" from disk
+    for image_path in image_paths:
+        if image_path not in merged_paths:
+            os.remove(os.path.join(datetime_folder, image_path))
+            print(f"Deleted image: {image_path}")
+
+    # delete videos that are not in "merged_paths" from disk
+    for video_path in video_paths:
+        if video_path not in merged_paths:
+            os.remove(os.path.join(datetime_folder, video_path))
+            print(f"Deleted video: {video_path}")
 
 def combinations(**options):
     """Returns a dictionary of key='this' of itertools.product"""
@@ -64,40 +79,104 @@ def combinations(**options):
 
 
 # Note: You can also use your own subclassing like Custom.py!
-class YourScene(DepthScene):
-    def update(self):
-        self.state.offset_x = 0.3 * math.sin(self.cycle)
-        self.state.isometric = 1
-        self.state.zoom = 0.7 + 0.2 * math.sin(self.cycle * 2)
+def your_scene() -> Type[DepthScene]:
+    from DepthFlow import DepthScene
+
+    class YourScene(DepthScene):
+        def update(self):
+            self.state.offset_x = 0.3 * math.sin(self.cycle)
+            self.state.isometric = 1
+            self.state.zoom = 0.7 + 0.2 * math.sin(self.cycle * 2)
+
+    return YourScene
 
 # ------------------------------------------------------------------------------------------------ #
 
 @define
 class DepthManager:
-    estimator: DepthEstimator = Factory(DepthAnythingV2)
-    """A **shared** estimator for all threads"""
+    estimator: Optional[DepthEstimator] = None
+    """A **shared** estimator for all threads, Broken's DepthAnythingV2 created on first use when None"""
 
-    upscaler: BrokenUpscaler = Factory(NoUpscaler)
-    """The upscaler to use for all threads"""
-
-    threads: List[Thread] = Factory(list)
-    """List of running threads"""
+    upscaler: Optional[BrokenUpscaler] = None
+    """The upscaler to use for all threads, NoUpscaler when None"""
 
     concurrency: int = int(os.getenv("WORKERS", 1))
     """Maximum concurrent render workers (high memory usage)"""
 
+    queue: Optional[Queue] = None
+    """Bounded job queue, parallax() blocks instead of growing an unbounded backlog"""
+
+    workers: List[Thread] = Factory(list)
+    """Render threads, each owning one long-lived scene (OpenGL context, compiled shaders)"""
+
+    lock: Lock = Factory(Lock)
+    """Guards the shared bookkeeping below, workers and callers may run on any thread"""
+
+    jobs: Dict[Future, Path] = Factory(dict)
+    """Submitted image per future"""
+
     outputs: List[Path] = Factory(list)
     """List of all rendered videos on this session"""
 
+    errors: Dict[Path, BaseException] = Factory(dict)
+    """Images whose render failed, with the error"""
+
+    timings: Dict[Path, float] = Factory(dict)
+    """Wall time in seconds per image"""
+
+    cache_folder: str = "CACHE"
+    """Depth maps are stored here keyed by image content, estimator model and resolution"""
+
+    estimator_key: Optional[str] = None
+    """Model name used in the cache key, set to the estimation stage's model to reuse its maps"""
+
+    estimate_model: str = "small"
+    """Model size of the estimation stage, estimates the maps it did not leave in the cache"""
+
+    batch_estimator: Optional[BatchDepthEstimator] = None
+    """The estimation stage's model, only loaded on a cache miss at render time"""
+
+    estimate_lock: Lock = Factory(Lock)
+    """One render-time estimate at a time, the model is shared by the workers"""
+
+    estimator_loaded: bool = False
+    """Torch and the estimator are only loaded on the first depth cache miss"""
+
+    segment_duration: int = 5
+    """Length of each rendered clip in seconds"""
+
+    render_height: int = 1920
+    """Parallax height, the slideshow scale step brings it back to the output size"""
+
+    log_folder: Optional[str] = None
+    """Where the applied animation parameters are logged (_depth_log.txt)"""
+
     def __attrs_post_init__(self):
-        self.estimator.load_torch()
-        self.estimator.load_model()
-        self.upscaler.load_model()
+        if self.upscaler is not None:
+            self.upscaler.load_model()
+
+    def shared_estimator(self) -> DepthEstimator:
+        with self.lock:
+            if self.estimator is None:
+                from Broken.Externals.Depthmap import DepthAnythingV2
+                self.estimator = DepthAnythingV2()
+            return self.estimator
+
+    def load_estimator(self) -> None:
+        self.shared_estimator()
+        with self.lock:
+            if not self.estimator_loaded:
+                self.estimator.load_torch()
+                self.estimator.load_model()
+                self.estimator_loaded = True
 
     # # Allow for using with statements
 
     def __enter__(self) -> Self:
-        self.outputs = list()
+        with self.lock:
+            self.outputs = list()
+            self.errors = dict()
+            self.timings = dict()
         return self
 
     def __exit__(self, *ignore) -> None:
@@ -105,17 +184,25 @@ class DepthManager:
 
     # # User methods
 
-    def parallax(self, scene: Type[DepthScene], image: Path) -> None:
-
-        # Limit the maximum concurrent threads, nice pattern 😉
-        while len(self.threads) >= self.concurrency:
-            self.threads = list(filter(lambda x: x.is_alive(), self.threads))
-            time.sleep(0.05)
-
-        # Create and add a new running worker, daemon so it dies with the main thread
-        thread = Thread(target=self._worker, args=(scene, image), daemon=True)
-        self.threads.append(thread)
-        thread.start()
+    def parallax(self, scene: Type[DepthScene], image: Path) -> Future:
+        """Queue an image for rendering, blocks while the queue is full"""
+        with self.lock:
+            if self.queue is None:
+                self.queue = Queue(maxsize=2 * self.concurrency)
+                # The workers share the caller's thread budget (a scheduled depth_render task)
+                budget = governor.split(self.concurrency)
+                self.workers = [
+                    Thread(target=self._scene_worker, args=(self.queue, budget), name=f"depth-{index}", daemon=True)
+                    for index in range(self.concurrency)
+                ]
+                for worker in self.workers:
+                    worker.start()
+
+            queue = self.queue
+            future = Future()
+            self.jobs[future] = image
+        queue.put((scene, image, future))
+        return future
 
     # @abstractmethod
     # def filename(self, data: DotMap) -> Path:
@@ -129,66 +216,152 @@ class DepthManager:
     @abstractmethod
     def filename(self, data: DotMap) -> Path:
         """Find the output path (Default: same path as image, 'Render' folder)"""
-        return (data.image.parent ) / (data.image.stem + "_df.mp4")
-
-    @abstractmethod
-    def animate(self, data: DotMap) -> None:
-        """Add preset system's animations to each export"""
-        data.scene.add_animation(DepthState(
-            vignette_enable=True,
-            dof_enable=True,
-        ))
+        # Intermediate: the slideshow finds it in the folder's scratch folder
+        return Path(scratch.path(str(data.image.parent), data.image.stem + "_df.mp4"))
 
-        # List of possible animations
+    def choose_motion(self, data: DotMap) -> DotMap:
+        """Randomly pick the motion of one export, shared by the DepthFlow and NumPy engines"""
+        # List of possible animations: (name, intensity range)
         animations = [
-            ("Circle", Presets.Circle(intensity=round(random.uniform(0.6, 0.8), 2), loop=True, reverse=random.choice([True, False]))),
-            ("Orbital", Presets.Orbital(intensity=round(random.uniform(0.6, 0.8), 2) , loop=True, reverse=random.choice([True, False]))),
-            ("Dolly", Presets.Dolly(intensity=round(random.uniform(0.5, 0.7), 2), loop=True, reverse=random.choice([True, False]))),
-            ("Horizontal", Presets.Horizontal(intensity=round(random.uniform(0.5, 0.7), 2), loop=True, reverse=random.choice([True, False]))),
+            ("Circle", (0.6, 0.8)),
+            ("Orbital", (0.6, 0.8)),
+            ("Dolly", (0.5, 0.7)),
+            ("Horizontal", (0.5, 0.7)),
         ]
 
-        isometric_value = round(random.uniform(0.4, 0.5), 2)
-        height_value = round(random.uniform(0.1, 0.15), 2)
-        zoom_value = round(random.uniform(0.65, 0.75), 2)
-
-        data.scene.add_animation(Components.Set(target=Target.Isometric, value=isometric_value))
-        print(f"Isometric: {isometric_value}")
-
-        data.scene.add_animation(Components.Set(target=Target.Height, value=height_value))
-        print(f"Height: {height_value}")
-
-        data.scene.add_animation(Presets.Zoom(intensity=zoom_value, loop=True))
-        print(f"Zoom: {zoom_value}")
+        motion = DotMap(
+            isometric=round(random.uniform(0.4, 0.5), 2),
+            height=round(random.uniform(0.1, 0.15), 2),
+            zoom=round(random.uniform(0.65, 0.75), 2),
+            motions=[],
+        )
+        print(f"Isometric: {motion.isometric}")
+        print(f"Height: {motion.height}")
+        print(f"Zoom: {motion.zoom}")
 
         applied = set()
         for _ in range(random.randint(1, 2)):  # Randomly choose 2 to 3 animations
-            name, animation = random.choice([x for x in animations if x[0] not in applied])
+            name, (low, high) = random.choice([x for x in animations if x[0] not in applied])
             applied.add(name)
-            data.scene.add_animation(animation)
-            print(f"Applied Animation: {name}: {animation}")
+            animation = DotMap(name=name, intensity=round(random.uniform(low, high), 2), reverse=random.choice([True, False]))
+            motion.motions.append(animation)
+            print(f"Applied Animation: {name}: {animation.toDict()}")
             # log text file with filenames and applied animation parameters in datetime_folder  
-            with open(f"{datetime_folder}/_depth_log.txt", "a") as f:
-                f.write(f"{data.image.stem}\n{name}\n{animation}\n Isometric: {isometric_value}\n Height: {height_value}\n Zoom: {zoom_value}\n\n")
+            if self.log_folder is None:
+                continue
+            with open(f"{self.log_folder}/_depth_log.txt", "a") as f:
+                f.write(f"{data.image.stem}\n{name}\n{animation.toDict()}\n Isometric: {motion.isometric}\n Height: {motion.height}\n Zoom: {motion.zoom}\n\n")
 
+        return motion
+
+    @abstractmethod
+    def animate(self, data: DotMap) -> None:
+        """Add preset system's animations to each export"""
+        from DepthFlow.Motion import Components, Presets, Target
+        from DepthFlow.State import DepthState
+
+        data.scene.add_animation(DepthState(
+            vignette_enable=True,
+            dof_enable=True,
+        ))
+
+        motion = self.choose_motion(data)
+        data.scene.add_animation(Components.Set(target=Target.Isometric, value=motion.isometric))
+        data.scene.add_animation(Components.Set(target=Target.Height, value=motion.height))
+        data.scene.add_animation(Presets.Zoom(intensity=motion.zoom, loop=True))
+
+        presets = {
+            "Circle": Presets.Circle,
+            "Orbital": Presets.Orbital,
+            "Dolly": Presets.Dolly,
+            "Horizontal": Presets.Horizontal,
+        }
+        for animation in motion.motions:
+            data.scene.add_animation(presets[animation.name](intensity=animation.intensity, loop=True, reverse=animation.reverse))
 
     @abstractmethod
     def variants(self, image: Path) -> DotMap:
         return DotMap(
             render=combinations(
                 height=(1920),
-                time=(args.segment_duration),
+                time=(self.segment_duration),
                 fps=(25),
             )
         )
 
-    # # Internal methods
+    def depthmap(self, image: Path) -> Path:
+        """Cached depth map of the image, so re-renders skip inference completely"""
+        if self.estimator_key is not None:
+            # After the estimation stage a miss is estimated by the stage's model, never stored under its key by another one
+            path = cached_depthmap(image, self.estimator_key, self.cache_folder)
+            if path.exists():
+                return path
+            with self.estimate_lock:
+                if self.batch_estimator is None:
+                    self.batch_estimator = BatchDepthEstimator(model=self.estimate_model, threads=governor.threads())
+                return self.batch_estimator.run([image], self.cache_folder)[image]
+        if not cached_depthmap(image, estimator_name(self.shared_estimator()), self.cache_folder).exists():
+            self.load_estimator()
+        return load_or_estimate(image, self.estimator, self.cache_folder)
+
+    def scene(self, scene: Type[DepthScene]) -> DepthScene:
+        """Create a worker's long-lived scene, the GL context and shaders are built once here"""
+        from Broken.Externals.Upscaler import NoUpscaler
 
-    def _worker(self, scene: Type[DepthScene], image: Path):
         # Note: Share an estimator between threads to avoid memory leaks
         scene = scene(backend="headless")
-        scene.estimator = self.estimator
-        scene.set_upscaler(self.upscaler)
-        scene.input(image=image)
+        scene.estimator = self.shared_estimator()
+        scene.set_upscaler(self.upscaler or NoUpscaler())
+        return scene
+
+    def release(self, scene: DepthScene) -> None:
+        # Imporant: Free up OpenGL resources
+        scene.window.destroy()
+
+    # # Internal methods
+
+    def _scene_worker(self, queue: Queue, threads: Optional[int] = None):
+        """Take images from the queue until join(), reusing one scene and only swapping its inputs"""
+        scene, scene_type = None, None
+        while (job := queue.get()) is not None:
+            requested, image, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if scene_type is not requested:
+                    if scene_type is not None:
+                        self.release(scene)
+                    scene, scene_type = self.scene(requested), requested
+                with governor.use(threads):
+                    self._timed_worker(scene, image)
+            except Exception as error:
+                # A failed render may leave the context in a bad state, start the next job on a fresh scene
+                if scene_type is not None:
+                    self.release(scene)
+                scene, scene_type = None, None
+                future.set_exception(error)
+            else:
+                future.set_result(image)
+
+        if scene_type is not None:
+            self.release(scene)
+
+    def _timed_worker(self, scene: DepthScene, image: Path):
+        start = time.perf_counter()
+        try:
+            self._worker(scene, image)
+        except BaseException as error:
+            with self.lock:
+                self.errors[image] = error
+            print(f"***** DepthFlow failed for {image.name}: {error!r}")
+            raise
+        finally:
+            with self.lock:
+                self.timings[image] = time.perf_counter() - start
+
+    def _worker(self, scene: DepthScene, image: Path):
+        # Note: The scene outlives this image, only the textures are swapped
+        scene.input(image=image, depth=self.depthmap(image))
 
         # Note: We reutilize the Scene to avoid re-creation!
         # Render multiple lengths, or framerates, anything
@@ -205,42 +378,153 @@ class DepthManager:
 
             video = scene.main(output=output, **data.render)
             if video:  # Check if video was created successfully
-                self.outputs.append(video[0])
-
-        # Imporant: Free up OpenGL resources
-        scene.window.destroy()
-
-    def join(self):
-        for thread in self.threads:
-            thread.join()
+                with self.lock:
+                    self.outputs.append(video[0])
+
+    def join(self) -> None:
+        """Wait for every queued image, then print a per-image report"""
+        with self.lock:
+            queue, self.queue = self.queue, None
+            workers, self.workers = self.workers, list()
+        if queue is not None:
+            for _ in workers:
+                queue.put(None)
+            for worker in workers:
+                worker.join()
+        self.report()
+
+    def report(self) -> None:
+        with self.lock:
+            images = list(self.jobs.values())
+            self.jobs = dict()
+        for image in images:
+            status = f"FAILED ({self.errors[image]!r})" if image in self.errors else "ok"
+            print(f"----- {image.name}: {self.timings.get(image, 0):.2f}s {status}")
+        print(f"+++++ DepthFlow: {len(images) - len(self.errors)} rendered, {len(self.errors)} failed")
 
 class YourManager(DepthManager):
     def variants(self, image: Path) -> DotMap:
         return DotMap(
             variation=[0],
             render=combinations(
-                height=[1920],
-                time=[args.segment_duration],
+                height=[self.render_height],
+                time=[self.segment_duration],
                 loop=[1],
                 fps=[25],
             )
         )
 
-if (__name__ == "__main__"):
+class NumpyManager(YourManager):
+    """Same queue, cache and motions as DepthManager, rendered on the CPU with NumPy instead of OpenGL"""
+
+    def scene(self, scene: Type[DepthScene]) -> NumpyParallax:
+        return NumpyParallax()
+
+    def release(self, scene: NumpyParallax) -> None:
+        pass
+
+    def _worker(self, renderer: NumpyParallax, image: Path):
+        depth = self.depthmap(image)
+
+        for data in combinations(**self.variants(image)):
+            data.update(image=image)
+            output = self.filename(data)
+            output.parent.mkdir(parents=True, exist_ok=True)
+
+            video = renderer.render(image, depth, output, self.choose_motion(data), **data.render)
+            with self.lock:
+                self.outputs.append(video)
+
+def folder_stills(params: DepthParams) -> List[Path]:
     # images = Path(os.getenv("IMAGES", "/Users/a/Desktop/Share/YT/Scripts/VideoCutter/INPUT/DEPTH"))
-    images = Path(os.getenv("IMAGES", datetime_folder))
+    images = Path(os.getenv("IMAGES", os.path.join(params.path, params.datetime_str)))
+    return sorted(image for image in images.glob("*") if image.suffix in ['.jpg', '.jpeg', '.png'])  # Only process image files
+
+
+def estimate_depth(params: DepthParams) -> str:
+    """Stage 1: trim the folder and estimate every depth map in batches, returns the estimator cache key"""
+    datetime_folder = os.path.join(params.path, params.datetime_str)
+    os.makedirs(datetime_folder, exist_ok=True)
+    trim_media(datetime_folder, params.segment_duration, params.time_limit)
+    stills = folder_stills(params)
+
+    start = time.perf_counter()
+    # The model service keeps the model warm between folders, otherwise it is loaded here
+    estimator = BatchDepthEstimator(model=params.depth_model, batch_size=params.estimate_batch, threads=governor.threads() or params.estimate_threads)
+    maps = request('depth', images=[str(still.resolve()) for still in stills], cache_folder=os.path.abspath(params.cache_folder), model=params.depth_model, batch_size=params.estimate_batch)
+    if maps is None:
+        estimator.run(stills, params.cache_folder)
+    else:
+        print(f"+++++ {len(maps)} depth maps from the model service")
+    print(f"Depth estimation: {time.perf_counter() - start:.2f} seconds.")
+    return estimator.name
+
+
+def render_parallax(params: DepthParams, estimator_key: str) -> List[Path]:
+    """Stage 2: render parallax clips from the stored maps, returns the rendered clips"""
+    datetime_folder = os.path.join(params.path, params.datetime_str)
 
     # Multiple unique videos per file
     # Note: Use Upscayl() for some upscaler!
     # with DepthManager(upscaler=NoUpscaler()) as manager:
     # with YourManager(upscaler=Upscayl()) as manager:
 
+    start = time.perf_counter()
+    if params.engine == 'numpy':
+        manager_type, scene_type = NumpyManager, NumpyParallax
+    else:
+        from DepthFlow import DepthScene
+        manager_type, scene_type = YourManager, DepthScene
+    with manager_type(
+        cache_folder=params.cache_folder,
+        concurrency=params.workers,
+        estimator_key=estimator_key,
+        estimate_model=params.depth_model,
+        segment_duration=params.segment_duration,
+        # Parallax height, the slideshow scale step brings it back to the output size
+        render_height=2 * round(1920 * params.render_scale / 2),
+        log_folder=datetime_folder,
+    ) as manager:
+        for image in folder_stills(params):
+            manager.parallax(scene_type, image)
+    print(f"Parallax rendering: {time.perf_counter() - start:.2f} seconds.")
+
+    for output in manager.outputs:
+        print(f"• {output}")
+    return manager.outputs
+
+
+def render_depth(params: DepthParams) -> List[Path]:
+    """Depth estimation then parallax rendering for one datetime folder, returns the rendered clips"""
+    return render_parallax(params, estimate_depth(params))
 
-    with YourManager(upscaler=NoUpscaler()) as manager:
-        for image in images.glob("*"):
-            if image.suffix in ['.jpg', '.jpeg', '.png']:  # Only process image files
-                manager.parallax(DepthScene, image)
-
-        for output in manager.outputs:
-            print(f"• {output}")
-
+if (__name__ == "__main__"):
+    parser = argparse.ArgumentParser(description="Create DepthFlow")
+    # Create an ArgumentParser to handle command-line arguments
+    parser.add_argument('--o', dest='path', required=True, help='Path to the directory containing files to be sorted.')
+    parser.add_argument('--d', dest='datetimeStr', required=True, help='Datetime folder name.')
+    parser.add_argument('--sd', type=int, default=5, dest='segment_duration', help='Frame duration.')
+    parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
+    parser.add_argument('--cache', type=str, default='CACHE', dest='cache_folder', help='Cache folder for depth maps')
+    parser.add_argument('--w', type=int, default=int(os.getenv("WORKERS", 1)), dest='workers', help='Concurrent DepthFlow render workers (high memory usage)')
+    parser.add_argument('--rs', type=float, default=1.0, dest='render_scale', help='Render parallax at this fraction of 1920p, slideshow.py upscales it (e.g. 0.5, 0.66)')
+    parser.add_argument('--de', type=str, default='depthflow', choices=['depthflow', 'numpy'], dest='engine', help='Parallax engine: DepthFlow (OpenGL) or NumPy (CPU only)')
+    parser.add_argument('--dm', type=str, default='small', dest='depth_model', help='DepthAnythingV2 model size (small|base|large)')
+    parser.add_argument('--eb', type=int, default=4, dest='estimate_batch', help='Stills per depth estimation batch')
+    parser.add_argument('--et', type=int, default=os.cpu_count(), dest='estimate_threads', help='Torch threads for the depth estimation stage')
+
+    args = parser.parse_args()
+
+    render_depth(DepthParams(
+        path=args.path,
+        datetime_str=args.datetimeStr,
+        segment_duration=args.segment_duration,
+        time_limit=args.time_limit,
+        cache_folder=args.cache_folder,
+        workers=args.workers,
+        render_scale=args.render_scale,
+        engine=args.engine,
+        depth_model=args.depth_model,
+        estimate_batch=args.estimate_batch,
+        estimate_threads=args.estimate_threads,
+    ))
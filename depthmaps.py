@@ -0,0 +1,126 @@
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy
+from PIL import Image
+
+from cache_utils import cache_path, file_hash, params_hash, partial_path, publish
+
+
+def estimator_name(estimator) -> str:
+    """Estimator class plus model size, e.g. DepthAnythingV2-small"""
+    model = getattr(estimator, "model", "")
+    return f"{type(estimator).__name__}-{getattr(model, 'value', model)}"
+
+
+def depth_key(image: Path, estimator_key: str) -> str:
+    """Cache key: image content, estimator model and input resolution"""
+    with Image.open(image) as im:
+        width, height = im.size
+    return params_hash(
+        image=file_hash(image),
+        estimator=estimator_key,
+        resolution=f"{width}x{height}",
+    )
+
+
+def cached_depthmap(image: Path, estimator_key: str, cache_folder: str) -> Path:
+    """Path where the depth map of an image is (or would be) cached"""
+    return Path(cache_path(cache_folder, "depth", depth_key(image, estimator_key), ".png"))
+
+
+def save_depthmap(depth, path: Path) -> Path:
+    """Store a depth map normalized to a 16-bit grayscale PNG, published atomically"""
+    depth = numpy.asarray(depth, dtype=numpy.float32).squeeze()
+    low, high = float(depth.min()), float(depth.max())
+    depth = (depth - low) / ((high - low) or 1.0)
+
+    # Jobs sharing a still may estimate it at the same time, each writes its own temp file
+    partial = partial_path(str(path))
+    Image.fromarray((depth * 65535).astype(numpy.uint16)).save(partial)
+    publish(partial, str(path))
+    return path
+
+
+def load_or_estimate(image: Path, estimator, cache_folder: str, estimator_key: Optional[str] = None) -> Path:
+    """Depth map for an image from the on-disk cache, estimated and stored on a miss"""
+    path = cached_depthmap(image, estimator_key or estimator_name(estimator), cache_folder)
+    if path.exists():
+        print(f"+++++ Cached depth map: {image.name} -> {path}")
+        return path
+
+    print(f"##### Estimating depth: {image.name}")
+    return save_depthmap(estimator.estimate(image), path)
+
+
+class BatchDepthEstimator:
+    """DepthAnythingV2 loaded once and run over batches of stills (the estimation stage)"""
+
+    def __init__(self, model: str = "small", batch_size: int = 4, threads: Optional[int] = None, device: Optional[str] = None):
+        self.model_size = model
+        self.batch_size = max(1, batch_size)
+        self.threads = threads
+        self.device = device
+        self.processor = None
+        self.model = None
+
+    @property
+    def name(self) -> str:
+        return f"DepthAnythingV2-{self.model_size}"
+
+    def load(self) -> None:
+        if self.model is not None:
+            return
+        import torch
+        from transformers import AutoImageProcessor, AutoModelForDepthEstimation
+
+        # torch's pool is process-wide, concurrent model stages share the size the last of them set
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else ("mps" if torch.backends.mps.is_available() else "cpu")
+
+        repo = f"depth-anything/Depth-Anything-V2-{self.model_size.capitalize()}-hf"
+        print(f"##### Loading {repo} on {self.device}")
+        self.processor = AutoImageProcessor.from_pretrained(repo)
+        self.model = AutoModelForDepthEstimation.from_pretrained(repo).to(self.device).eval()
+
+    def estimate(self, images: List[Path]) -> List[numpy.ndarray]:
+        """Depth of same-sized images in one batched forward pass, at each image's resolution"""
+        import torch
+
+        self.load()
+        frames = [Image.open(image).convert("RGB") for image in images]
+        inputs = self.processor(images=frames, return_tensors="pt").to(self.device)
+        with torch.inference_mode():
+            predicted = self.model(**inputs).predicted_depth
+
+        depths = []
+        for frame, depth in zip(frames, predicted):
+            depth = torch.nn.functional.interpolate(
+                depth[None, None], size=(frame.height, frame.width), mode="bicubic", align_corners=False,
+            )[0, 0]
+            depths.append(depth.float().cpu().numpy())
+        return depths
+
+    def run(self, images: List[Path], cache_folder: str) -> Dict[Path, Path]:
+        """Fill the depth cache for all images, only cache misses reach the model"""
+        maps = {}
+        pending: Dict[tuple, List[Path]] = {}
+        for image in images:
+            path = cached_depthmap(image, self.name, cache_folder)
+            maps[image] = path
+            if not path.exists():
+                with Image.open(image) as im:
+                    # Batches need equal tensor shapes, so group by input size
+                    pending.setdefault(im.size, []).append(image)
+
+        misses = sum(len(group) for group in pending.values())
+        print(f"##### Depth estimation: {len(images) - misses} cached, {misses} to estimate")
+        for group in pending.values():
+            for i in range(0, len(group), self.batch_size):
+                batch = group[i:i + self.batch_size]
+                for image, depth in zip(batch, self.estimate(batch)):
+                    save_depthmap(depth, maps[image])
+                    print(f"+++++ Depth map: {image.name} -> {maps[image]}")
+        return maps
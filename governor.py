@@ -0,0 +1,124 @@
+"""Machine-wide thread budget for stages that run at the same time.
+
+The scheduler takes `cpu` threads from one pool of cores for every task it starts (allot).
+Inside the task, tracing.Popen passes the budget to ffmpeg (-threads, -filter_threads) and
+to the OMP/MKL pools of child processes, and the model stages size their torch pools with
+threads(). With pinning on, the task's thread and the children it starts run on the cores it
+was given. Outside an allotment nothing is changed, single runs keep using every core.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+def _cores() -> List[int]:
+    """Cores this process may run on, the first `$THREADS` of them when set"""
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = list(range(os.cpu_count() or 1))
+    limit = int(os.getenv('THREADS', 0))
+    return cores[:limit] if limit else cores
+
+
+CORES = _cores()
+# Pin each task to its cores (sched_setaffinity, Linux only)
+PIN = os.getenv('PIN_THREADS', '0') == '1'
+
+_lock = threading.Lock()
+# Core -> tasks currently allotted to it, oversized tasks share the least used cores
+_load: Dict[int, int] = {core: 0 for core in CORES}
+_local = threading.local()
+
+
+def threads() -> Optional[int]:
+    """Thread budget of the calling thread, None outside an allotment"""
+    return getattr(_local, 'threads', None)
+
+
+def split(parts: int) -> Optional[int]:
+    """Budget of each of `parts` worker threads sharing the calling thread's budget"""
+    count = threads()
+    return None if count is None else max(1, count // max(1, parts))
+
+
+@contextmanager
+def use(count: Optional[int]):
+    """Run the block with `count` threads taken by the caller's allotment, e.g. in a worker thread it started"""
+    previous = threads()
+    _local.threads = count
+    try:
+        yield count
+    finally:
+        _local.threads = previous
+
+
+@contextmanager
+def allot(count: float, pin: bool = PIN):
+    """Take `count` threads from the pool for the calling thread and the children it starts"""
+    count = max(1, min(len(CORES), round(count)))
+    with _lock:
+        cores = sorted(CORES, key=lambda core: _load[core])[:count]
+        for core in cores:
+            _load[core] += 1
+
+    affinity = None
+    if pin and hasattr(os, 'sched_setaffinity'):
+        # pid 0 is the calling thread on Linux, threads and processes started from it inherit the mask
+        affinity = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, cores)
+    try:
+        with use(count):
+            yield count
+    finally:
+        if affinity is not None:
+            os.sched_setaffinity(0, affinity)
+        with _lock:
+            for core in cores:
+                _load[core] -= 1
+
+
+# ffmpeg options without a value, every other option takes the next argument
+FLAGS = {
+    '-y', '-n', '-hide_banner', '-nostats', '-stats', '-nostdin', '-shortest', '-an', '-vn', '-sn', '-dn',
+    '-re', '-copyts', '-xerror', '-version', '-benchmark',
+}
+
+
+def ffmpeg_args(args: List[str]) -> List[str]:
+    """Add the thread budget to an ffmpeg command, options already in it are kept"""
+    count = threads()
+    if count is None or len(args) < 2 or os.path.basename(args[0]) != 'ffmpeg':
+        return args
+    head = [args[0]]
+    for option in ('-filter_threads', '-filter_complex_threads'):
+        if option not in args:
+            head += [option, str(count)]
+    # Output options apply to the next output file only, so every output gets its own -threads
+    rest, options = [], []
+    index = 1
+    while index < len(args):
+        arg = args[index]
+        if arg.startswith('-') and arg != '-':
+            takes_value = arg not in FLAGS and index + 1 < len(args)
+            options += args[index:index + 1 + takes_value]
+            index += 1 + takes_value
+            if arg == '-i':
+                rest, options = rest + options, []
+            continue
+        if '-threads' not in options:
+            options += ['-threads', str(count)]
+        rest, options = rest + options + [arg], []
+        index += 1
+    return head + rest + options
+
+
+def child_env(env: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+    """Environment of a child process with its OMP/MKL pools sized to the budget"""
+    count = threads()
+    if count is None:
+        return env
+    env = dict(os.environ if env is None else env)
+    env['OMP_NUM_THREADS'] = env['MKL_NUM_THREADS'] = str(count)
+    return env
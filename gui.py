@@ -3,6 +3,7 @@ from tkinter import messagebox
 import subprocess
 import os
 import json
+import threading
 
 # Default values remain the same
 default_segment_duration = 6
@@ -35,6 +36,9 @@ default_chromakey_blend = 0
 default_depthflow = 0
 default_generate_srt = False  # Default value for .srt generation
 default_subtitle_maxwidth = 21 
+# Empty: the cutter.py defaults ($WHISPER_MODEL / $WHISPER_COMPUTE_TYPE, else base / float32)
+default_whisper_model = ''
+default_whisper_compute_type = ''
 
 # Define watermark types
 watermark_types = ['ccw', 'random']
@@ -77,7 +81,7 @@ var_generate_srt.set(default_generate_srt)  # Default to not generating .srt
 config_folder = os.path.join(os.path.dirname(__file__), 'config')
 config_files = [file for file in os.listdir(config_folder) if file.endswith(".json")]
 
-def start_process():
+def build_command():
     # Get values from the entry fields
     title = entry_title.get()
     watermark = text_watermark.get("1.0", tk.END).strip()
@@ -110,6 +114,8 @@ def start_process():
     # Get .srt generation parameter
     generate_srt = var_generate_srt.get()
     subtitle_max_width = entry_subtitle_max_width.get()
+    whisper_model = entry_whisper_model.get().strip()
+    whisper_compute_type = entry_whisper_compute_type.get().strip()
 
     if depthflow_tf:
         depthflow = '1'
@@ -167,13 +173,53 @@ def start_process():
         '--cb', str(chromakey_blend),
         
         '--srt', '1' if generate_srt else '0',
-        '--smaxw', str(subtitle_max_width)
+        '--smaxw', str(subtitle_max_width),
+        '--model', whisper_model,
+        '--ct', whisper_compute_type,
 
     ]
+    return command
+
 
+def start_process():
+    command = build_command()
     print(command)
-    subprocess.run(command)
-    
+    start_button.config(state=tk.DISABLED)
+    progress_text.set("Starting...")
+    threading.Thread(target=run_pipeline, args=(command,), daemon=True).start()
+
+
+def plan_process():
+    # Predicted wall time and disk use of the current INPUT contents, from the run history
+    command = build_command() + ['--plan']
+    progress_text.set("Estimating...")
+    threading.Thread(target=run_plan, args=(command,), daemon=True).start()
+
+
+def run_plan(command):
+    result = subprocess.run(command, capture_output=True, text=True)
+    print(result.stdout, end='')
+    estimates = [line[len('>>>>> '):].strip() for line in result.stdout.splitlines() if line.startswith('>>>>> ')]
+    lines = result.stdout.strip().splitlines()
+    status = estimates[-1] if estimates else (lines[-1] if lines else "No estimate")
+    root.after(0, progress_text.set, status)
+
+
+def run_pipeline(command):
+    # Echo the pipeline output to the terminal, the latest ffmpeg progress line goes to the status bar
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, bufsize=1,
+        env=dict(os.environ, PYTHONUNBUFFERED='1'),
+    )
+    for line in process.stdout:
+        print(line, end='')
+        if line.startswith('>>>>> '):
+            root.after(0, progress_text.set, line[len('>>>>> '):].strip())
+    process.wait()
+    status = "Done" if process.returncode == 0 else f"Failed (exit code {process.returncode})"
+    root.after(0, progress_text.set, status)
+    root.after(0, lambda: start_button.config(state=tk.NORMAL))
+
 
 def update_font_size(event):
     title = entry_title.get()
@@ -218,7 +264,9 @@ def create_default_config():
         'chromakey_similarity': default_chromakey_similarity,
         'chromakey_blend': default_chromakey_blend,
         'generate_srt': default_generate_srt,
-        'subtitle_maxwidth': default_subtitle_maxwidth
+        'subtitle_maxwidth': default_subtitle_maxwidth,
+        'whisper_model': default_whisper_model,
+        'whisper_compute_type': default_whisper_compute_type
     }
     default_filename = "default_config.json"
     config_file = os.path.join(config_folder, default_filename)
@@ -305,6 +353,12 @@ def load_config():
     # Load subtitle max width
     entry_subtitle_max_width.delete(0, tk.END)
     entry_subtitle_max_width.insert(0, config.get('subtitle_maxwidth', default_subtitle_maxwidth))
+
+    # Load Whisper model and compute type
+    entry_whisper_model.delete(0, tk.END)
+    entry_whisper_model.insert(0, config.get('whisper_model', default_whisper_model))
+    entry_whisper_compute_type.delete(0, tk.END)
+    entry_whisper_compute_type.insert(0, config.get('whisper_compute_type', default_whisper_compute_type))
     
     # Load title appearance parameters
     entry_title_appearance_delay.delete(0, tk.END)
@@ -372,7 +426,9 @@ def save_config():
             'chromakey_similarity': entry_chromakey_similarity.get(),
             'chromakey_blend': entry_chromakey_blend.get(),
             'generate_srt': var_generate_srt.get(),
-            'subtitle_maxwidth': entry_subtitle_max_width.get()
+            'subtitle_maxwidth': entry_subtitle_max_width.get(),
+            'whisper_model': entry_whisper_model.get(),
+            'whisper_compute_type': entry_whisper_compute_type.get()
         }, f)
     messagebox.showinfo("Success", "Config saved successfully!")
 
@@ -411,7 +467,9 @@ def save_new_config():
             'chromakey_similarity': entry_chromakey_similarity.get(),
             'chromakey_blend': entry_chromakey_blend.get(),
             'generate_srt': var_generate_srt.get(),
-            'subtitle_maxwidth': entry_subtitle_max_width.get()
+            'subtitle_maxwidth': entry_subtitle_max_width.get(),
+            'whisper_model': entry_whisper_model.get(),
+            'whisper_compute_type': entry_whisper_compute_type.get()
         }, f)
     messagebox.showinfo("Success", "New config saved successfully!")
     
@@ -622,6 +680,17 @@ entry_subtitle_max_width = tk.Entry(sound_frame, width=30)
 entry_subtitle_max_width.insert(0, default_subtitle_maxwidth)
 entry_subtitle_max_width.grid(row=2, column=1, padx=10, pady=5)
 
+# Whisper model size and compute type, empty for the defaults
+tk.Label(sound_frame, text="Whisper model:").grid(row=3, column=0, padx=10, pady=5, sticky="w")
+entry_whisper_model = tk.Entry(sound_frame, width=30)
+entry_whisper_model.insert(0, default_whisper_model)
+entry_whisper_model.grid(row=3, column=1, padx=10, pady=5)
+
+tk.Label(sound_frame, text="Compute type (int8, float32):").grid(row=4, column=0, padx=10, pady=5, sticky="w")
+entry_whisper_compute_type = tk.Entry(sound_frame, width=30)
+entry_whisper_compute_type.insert(0, default_whisper_compute_type)
+entry_whisper_compute_type.grid(row=4, column=1, padx=10, pady=5)
+
 # Chromakey Section
 chromakey_frame = tk.LabelFrame(right_column, text="Chromakey Settings", padx=10, pady=5)
 chromakey_frame.grid(row=3, column=0, padx=10, pady=5, sticky="ew")
@@ -709,8 +778,24 @@ quit_button = tk.Button(
 )
 quit_button.grid(row=0, column=0, pady=10, padx=20)
 
+plan_button = tk.Button(
+    buttons_frame,
+    text="ETA",
+    command=plan_process,
+    width=15,
+    height=2
+)
+plan_button.grid(row=0, column=2, pady=10, padx=20)
+
+# Latest ffmpeg progress of the running pipeline: frames, fps, speed, ETA
+progress_text = tk.StringVar(value="Idle")
+tk.Label(buttons_frame, textvariable=progress_text, anchor="w", width=80).grid(row=1, column=0, columnspan=3, padx=20, sticky="w")
+
 # Load initial config
 load_config()
 
+# ETA of the current INPUT contents before START is pressed
+plan_process()
+
 # Start main loop
 root.mainloop()
@@ -0,0 +1,227 @@
+"""Run history in SQLite, and a wall-time and disk predictor built on it.
+
+Every single run and every job of a scheduled batch is stored with what its input folder held
+(videos, their length and resolution, stills, voiceover), the settings that change the work,
+the wall and CPU time of each stage and the bytes the result folder took. plan() predicts a new
+input from the past runs most like it: each stage's median time per unit of what drives it
+(input video seconds for cut, stills for depth, output seconds for the encodes), scaled to the
+new input.
+"""
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+import tracing
+from cutter import probe_outro_length
+from slideshow import slideshow_duration
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT,
+    batch TEXT,
+    input_folder TEXT,
+    ok INTEGER,
+    wall_s REAL,
+    videos INTEGER,
+    video_s REAL,
+    images INTEGER,
+    files INTEGER,
+    voiceover_s REAL,
+    max_height INTEGER,
+    output_s REAL,
+    input_bytes INTEGER,
+    output_bytes INTEGER,
+    depthflow INTEGER,
+    generate_srt INTEGER,
+    orientation TEXT,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS stages (
+    run_id INTEGER REFERENCES runs(id),
+    stage TEXT,
+    wall_s REAL,
+    cpu_s REAL
+);
+CREATE TABLE IF NOT EXISTS batches (
+    name TEXT PRIMARY KEY,
+    jobs INTEGER,
+    wall_s REAL,
+    busy_s REAL
+);
+"""
+# Trace spans -> history stages. Single runs nest the slideshow steps under a 'slideshow' span per folder
+RUN_STAGES = {
+    'cut': 'cut', 'clean': 'clean', 'sort': 'sort', 'depth': 'depth',
+    'slideshow encode': 'slideshow', 'audio mix': 'audio', 'audio mux': 'mux', 'subscribe': 'subscribe',
+}
+# Batch tasks are named <job>/<stage>
+BATCH_STAGES = {
+    'cut': 'cut', 'clean': 'clean', 'sort': 'sort', 'depth_estimate': 'depth', 'depth_render': 'depth',
+    'voiceover': 'audio', 'transcribe': 'transcribe', 'timeline': 'slideshow', 'slideshow': 'slideshow',
+    'audio': 'audio', 'mux': 'mux', 'subscribe': 'subscribe',
+}
+# What each stage's time grows with
+DRIVERS = {
+    'cut': 'video_s', 'clean': 'files', 'sort': 'files', 'depth': 'images', 'transcribe': 'voiceover_s',
+    'slideshow': 'output_s', 'audio': 'output_s', 'mux': 'output_s', 'subscribe': 'output_s',
+}
+# Runs column -> setting, runs with the same settings (and a similar resolution) are preferred for a prediction
+SIMILAR = {'depthflow': 'depthflow', 'generate_srt': 'generate_srt', 'orientation': 'video_orientation'}
+
+
+def connect(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def _probe(path: str) -> Dict:
+    try:
+        result = tracing.run([
+            'ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=height:format=duration', '-of', 'json', path
+        ], capture_output=True, text=True, check=True)
+        data = json.loads(result.stdout)
+    except (subprocess.CalledProcessError, ValueError) as error:
+        print(f"***** Could not probe {path}: {error}")
+        return {}
+    streams = data.get('streams') or [{}]
+    return {'duration': float(data.get('format', {}).get('duration', 0)), 'height': streams[0].get('height', 0)}
+
+
+def survey(folder: str, segment_duration: int, time_limit: int, template_folder: str, orientation: str) -> Dict:
+    """What an input folder holds, and the length of the slideshow it will make"""
+    names = sorted(name for name in os.listdir(folder) if os.path.isfile(os.path.join(folder, name)))
+    videos = [_probe(os.path.join(folder, name)) for name in names if name.endswith('.mp4')]
+    images = [os.path.join(folder, name) for name in names if name.endswith(('.jpg', '.jpeg', '.png'))]
+    voiceovers = [_probe(os.path.join(folder, name)) for name in names if name.endswith('.mp3')]
+
+    heights = [video.get('height', 0) for video in videos]
+    for image in images:
+        with Image.open(image) as opened:
+            heights.append(opened.height)
+
+    # Same arithmetic as cutter/cleaner (whole segments only) and slideshow_timeline (slide limit, outro last)
+    segments = sum(int(video.get('duration', 0) // segment_duration) for video in videos)
+    slide_time = segment_duration - 1
+    slides = min(segments + len(images), int(time_limit / slide_time - 3)) + 1
+    outro_length = probe_outro_length(template_folder, orientation)
+    return {
+        'videos': len(videos),
+        'video_s': round(sum(video.get('duration', 0) for video in videos), 1),
+        'images': len(images),
+        'files': len(videos) + len(images),
+        'voiceover_s': round(sum(voiceover.get('duration', 0) for voiceover in voiceovers), 1),
+        'max_height': max(heights, default=0),
+        'output_s': round(slideshow_duration(slides, slide_time, outro_length), 2),
+        'input_bytes': sum(os.path.getsize(os.path.join(folder, name)) for name in names),
+    }
+
+
+def folder_bytes(folder: Optional[str]) -> int:
+    if not folder or not os.path.isdir(folder):
+        return 0
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(folder) for name in names)
+
+
+def stage_times(events: Optional[List[Dict]], job: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Wall and CPU seconds per history stage from the trace of a run, or of one job of a batch"""
+    stages: Dict[str, Dict[str, float]] = {}
+    for event in events or ():
+        if event.get('ph') != 'X' or event.get('cat') != 'stage':
+            continue
+        name = event['name']
+        if job is None:
+            stage = RUN_STAGES.get(name)
+        else:
+            prefix, _, task = name.rpartition('/')
+            stage = BATCH_STAGES.get(task) if prefix == job else None
+        if stage is None:
+            continue
+        times = stages.setdefault(stage, {'wall_s': 0.0, 'cpu_s': 0.0})
+        times['wall_s'] += event['args']['wall_s']
+        times['cpu_s'] += event['args']['cpu_s'] + event['args'].get('children_cpu_s', 0)
+    return stages
+
+
+def record(path: str, contents: Dict, settings: Dict, stages: Dict[str, Dict[str, float]], ok: bool, wall_s: float,
+           output_bytes: int, input_folder: str, batch: Optional[str] = None) -> None:
+    """Store one run, or one job of a batch"""
+    with connect(path) as connection:
+        cursor = connection.execute(
+            "INSERT INTO runs (started, batch, input_folder, ok, wall_s, videos, video_s, images, files, voiceover_s, max_height,"
+            " output_s, input_bytes, output_bytes, depthflow, generate_srt, orientation, settings)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (datetime.now().isoformat(timespec='seconds'), batch, input_folder, int(ok), round(wall_s, 2),
+             contents['videos'], contents['video_s'], contents['images'], contents['files'], contents['voiceover_s'],
+             contents['max_height'], contents['output_s'], contents['input_bytes'], output_bytes,
+             int(settings['depthflow']), int(settings['generate_srt']), settings['video_orientation'], json.dumps(settings, default=str)),
+        )
+        connection.executemany(
+            "INSERT INTO stages (run_id, stage, wall_s, cpu_s) VALUES (?, ?, ?, ?)",
+            [(cursor.lastrowid, stage, round(times['wall_s'], 2), round(times['cpu_s'], 2)) for stage, times in stages.items()],
+        )
+
+
+def record_batch(path: str, name: str, jobs: int, wall_s: float, busy_s: float) -> None:
+    with connect(path) as connection:
+        connection.execute("INSERT OR REPLACE INTO batches (name, jobs, wall_s, busy_s) VALUES (?, ?, ?, ?)",
+                           (name, jobs, round(wall_s, 2), round(busy_s, 2)))
+
+
+def similar_runs(connection: sqlite3.Connection, contents: Dict, settings: Dict) -> List[sqlite3.Row]:
+    """Successful runs with the same settings and a resolution within 25%, relaxed step by step when there are none"""
+    runs = connection.execute("SELECT * FROM runs WHERE ok = 1 ORDER BY id DESC LIMIT 500").fetchall()
+    same = [run for run in runs if all(run[column] == settings[setting] for column, setting in SIMILAR.items())]
+    height = contents['max_height']
+    close = [run for run in same if height and run['max_height'] and abs(run['max_height'] - height) <= 0.25 * height]
+    return close or same or runs
+
+
+def plan(path: str, contents: Dict, settings: Dict) -> Optional[Dict]:
+    """Predicted wall time (per stage and total) and disk use of an input, None without history"""
+    if not os.path.exists(path):
+        return None
+    with connect(path) as connection:
+        runs = similar_runs(connection, contents, settings)
+        if not runs:
+            return None
+        ids = [run['id'] for run in runs]
+        rows = connection.execute(
+            f"SELECT run_id, stage, wall_s FROM stages WHERE run_id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()
+    by_run = {run['id']: run for run in runs}
+
+    stages = {}
+    for stage, driver in DRIVERS.items():
+        rates = [row['wall_s'] / by_run[row['run_id']][driver] for row in rows
+                 if row['stage'] == stage and by_run[row['run_id']][driver]]
+        if rates and contents[driver]:
+            stages[stage] = statistics.median(rates) * contents[driver]
+    # Stages overlap (audio mix next to the encode), the past runs tell by how much
+    overlap = [run['wall_s'] / total for run in runs
+               if (total := sum(row['wall_s'] for row in rows if row['run_id'] == run['id']))]
+    disk = [run['output_bytes'] / run['output_s'] for run in runs if run['output_s']]
+    return {
+        'runs': len(runs),
+        'stages': stages,
+        'wall_s': sum(stages.values()) * (statistics.median(overlap) if overlap else 1.0),
+        'disk_bytes': int(statistics.median(disk) * contents['output_s']) if disk else None,
+    }
+
+
+def batch_overlap(path: str) -> float:
+    """How many jobs' worth of stage time a past batch ran at once (median), 1 without history"""
+    if not os.path.exists(path):
+        return 1.0
+    with connect(path) as connection:
+        batches = connection.execute("SELECT wall_s, busy_s FROM batches WHERE wall_s > 0").fetchall()
+    return statistics.median(batch['busy_s'] / batch['wall_s'] for batch in batches) if batches else 1.0
@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import time
+from pathlib import Path
+from threading import Lock
+
+# Clients connect here, the scripts fall back to loading models in-process when nothing listens
+SOCKET_PATH = os.getenv("MODEL_SOCKET", os.path.join(tempfile.gettempdir(), "videocutter-models.sock"))
+# Seconds to connect, and to wait for a result (a long transcription), before falling back to in-process loading
+CONNECT_TIMEOUT = float(os.getenv("MODEL_CONNECT_TIMEOUT", 5))
+REQUEST_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", 1800))
+
+
+def _json_default(value):
+    """numpy scalars in WhisperX results are not JSON serializable"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def request(op, socket_path=SOCKET_PATH, timeout=REQUEST_TIMEOUT, **params):
+    """Send one request to the running model service.
+
+    Returns the result, or None when no service is running, it failed or did not answer within `timeout`
+    seconds, so the caller loads the model itself.
+    """
+    if not os.path.exists(socket_path):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            # A wedged service must not block the stage forever
+            client.settimeout(CONNECT_TIMEOUT)
+            client.connect(socket_path)
+            client.settimeout(timeout)
+            client.sendall(json.dumps(dict(op=op, **params), default=_json_default).encode('utf-8') + b'\n')
+            with client.makefile('rb') as stream:
+                response = json.loads(stream.readline() or b'{}')
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except (OSError, ValueError) as e:
+        print(f"***** Model service unreachable: {e}")
+        return None
+
+    if not response.get('ok'):
+        print(f"***** Model service error: {response.get('error', 'no response')}")
+        return None
+    return response['result']
+
+
+class ModelService:
+    """Models loaded on first use and kept warm between requests, one lock per model family"""
+
+    def __init__(self, device=None, threads=None):
+        self.device = device
+        self.threads = threads
+        self.depth_estimators = {}
+        self.depth_lock = Lock()
+        self.whisper_lock = Lock()
+
+    def ping(self):
+        return dict(pid=os.getpid(), depth=sorted(self.depth_estimators))
+
+    def depth(self, images, cache_folder, model='small', batch_size=4):
+        """Fill the depth cache for the images, returns image -> depth map path"""
+        with self.depth_lock:
+            estimator = self.depth_estimator(model)
+            estimator.batch_size = max(1, batch_size)
+            maps = estimator.run([Path(image) for image in images], cache_folder)
+        return {str(image): str(path) for image, path in maps.items()}
+
+    def transcribe(self, audio_path, language='en', model_name='base', device='cpu', compute_type='float32'):
+        """WhisperX transcription plus forced alignment, models cached in srt_generator"""
+        import srt_generator
+
+        with self.whisper_lock:
+            return srt_generator.transcribe_in_process(audio_path, language, model_name, device, compute_type)
+
+    def depth_estimator(self, model):
+        from depthmaps import BatchDepthEstimator
+
+        if model not in self.depth_estimators:
+            self.depth_estimators[model] = BatchDepthEstimator(model=model, threads=self.threads, device=self.device)
+        return self.depth_estimators[model]
+
+    def preload(self, names):
+        """Load models before the first request instead of on it"""
+        if 'depth' in names:
+            self.depth_estimator('small').load()
+        if 'whisper' in names:
+            import srt_generator
+            srt_generator.load_models()
+
+    def handle(self, message):
+        op = message.pop('op', None)
+        if op not in ('ping', 'depth', 'transcribe'):
+            raise ValueError(f"Unknown operation: {op}")
+        return getattr(self, op)(**message)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        start = time.perf_counter()
+        try:
+            message = json.loads(line)
+            op = message.get('op')
+            response = dict(ok=True, result=self.server.service.handle(message))
+            print(f"+++++ {op}: {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            print(f"***** Request failed: {e!r}")
+            response = dict(ok=False, error=repr(e))
+        self.wfile.write(json.dumps(response, default=_json_default).encode('utf-8') + b'\n')
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(socket_path=SOCKET_PATH, device=None, threads=None, preload=()):
+    if request('ping', socket_path) is not None:
+        print(f"***** A model service is already running on {socket_path}")
+        return 1
+    if os.path.exists(socket_path):
+        os.remove(socket_path)  # Stale socket of a service that did not shut down cleanly
+
+    service = ModelService(device=device, threads=threads)
+    service.preload(preload)
+
+    server = _Server(socket_path, _Handler)
+    server.service = service
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"##### Model service listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        print("----- Model service stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep DepthAnythingV2 and WhisperX loaded between pipeline runs")
+    parser.add_argument('--socket', type=str, default=SOCKET_PATH, dest='socket_path', help='Unix socket path (env MODEL_SOCKET)')
+    parser.add_argument('--device', type=str, default=None, dest='device', help='Torch device for depth estimation (default: auto)')
+    parser.add_argument('--threads', type=int, default=None, dest='threads', help='Torch threads for depth estimation')
+    parser.add_argument('--preload', type=str, default='', dest='preload', help='Comma separated models to load at start: depth,whisper')
+    args = parser.parse_args()
+
+    sys.exit(serve(args.socket_path, args.device, args.threads, [name for name in args.preload.split(',') if name]))
@@ -0,0 +1,126 @@
+import math
+import subprocess
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import numpy
+from dotmap import DotMap
+from PIL import Image
+
+import tracing
+
+# Motions picked by DepthManager.choose_motion, mirrored from the DepthFlow presets
+MOTIONS = ("Circle", "Orbital", "Dolly", "Horizontal")
+
+
+def camera(t: float, animation: DotMap) -> Tuple[float, float, float, float, float]:
+    """Camera state at loop position t in [0, 1): (offset_x, offset_y, dolly, steady, zoom scale)"""
+    phase = 2 * math.pi * t
+    offset_x = offset_y = dolly = 0.0
+    steady = 0.3  # Depth plane that stays still
+
+    for motion in animation.motions:
+        angle = -phase if motion.reverse else phase
+        if motion.name == "Circle":
+            offset_x += motion.intensity * math.sin(angle)
+            offset_y += motion.intensity * math.cos(angle)
+        elif motion.name == "Horizontal":
+            offset_x += motion.intensity * math.sin(angle)
+        elif motion.name == "Orbital":
+            # Orbit around the subject: pivot on the middle of the depth range
+            offset_x += motion.intensity * math.sin(angle)
+            steady = 0.5
+        elif motion.name == "Dolly":
+            dolly += motion.intensity * (1 - math.cos(angle)) / 2
+
+    # Zoom preset: slow breathing in and out over the loop
+    scale = 1 + 0.1 * animation.zoom * (1 - math.cos(phase)) / 2
+    return offset_x, offset_y, dolly, steady, scale
+
+
+class NumpyParallax:
+    """CPU-only parallax: displaces the image by its depth map per frame, streams raw frames to ffmpeg"""
+
+    def __init__(self, overscan: float = 1.08, vignette: float = 0.35, crf: int = 20):
+        self.overscan = overscan  # Slight constant zoom so displaced edges never sample outside the image
+        self.vignette = vignette
+        self.crf = crf
+
+    @staticmethod
+    def load(image: Path, depth: Path, height: int) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """Image (H, W, 3) and depth (H, W, 0..1) as float32 at the render height, even sizes"""
+        with Image.open(image) as im:
+            rgb = im.convert("RGB")
+        width = 2 * round(height * rgb.width / rgb.height / 2)
+        rgb = rgb.resize((width, height), Image.LANCZOS)
+
+        with Image.open(depth) as dm:
+            raw = numpy.asarray(dm, dtype=numpy.float32)
+        raw = (raw - raw.min()) / ((raw.max() - raw.min()) or 1.0)
+        depthmap = Image.fromarray(raw).resize((width, height), Image.BILINEAR)
+        return numpy.asarray(rgb, dtype=numpy.float32), numpy.asarray(depthmap, dtype=numpy.float32)
+
+    def frames(self, image: numpy.ndarray, depth: numpy.ndarray, animation: DotMap, count: int) -> Iterator[bytes]:
+        height, width = depth.shape
+        flat = image.reshape(-1, 3)
+        ys, xs = numpy.mgrid[0:height, 0:width].astype(numpy.float32)
+        cx, cy = (width - 1) / 2, (height - 1) / 2
+
+        # Isometric flattens perspective, so it scales down the depth-dependent part of the shift
+        amount = animation.height * (1 - 0.5 * animation.isometric) * height
+
+        u, v = (xs - cx) / cx, (ys - cy) / cy
+        vignette = numpy.clip(1 - self.vignette * (u * u + v * v) / 2, 0, 1)[..., None]
+
+        for frame in range(count):
+            offset_x, offset_y, dolly, steady, scale = camera(frame / count, animation)
+            parallax = (depth - steady) * amount
+            zoom = self.overscan * scale * (1 + dolly * animation.height * depth)
+
+            sx = numpy.clip(cx + (xs - cx) / zoom - offset_x * parallax, 0, width - 1.001)
+            sy = numpy.clip(cy + (ys - cy) / zoom - offset_y * parallax, 0, height - 1.001)
+
+            # Bilinear sampling through flat indices
+            x0 = sx.astype(numpy.int32)
+            y0 = sy.astype(numpy.int32)
+            fx = (sx - x0)[..., None]
+            fy = (sy - y0)[..., None]
+            index = y0 * width + x0
+            top = flat[index] * (1 - fx) + flat[index + 1] * fx
+            bottom = flat[index + width] * (1 - fx) + flat[index + width + 1] * fx
+            out = (top * (1 - fy) + bottom * fy) * vignette
+
+            yield numpy.clip(out, 0, 255).astype(numpy.uint8).tobytes()
+
+    def render(self, image: Path, depth: Path, output: Path, animation: DotMap, height: int, time: float, fps: int, **ignore) -> Path:
+        """Render one loop of `time` seconds, same render arguments as DepthScene.main"""
+        unknown = [motion.name for motion in animation.motions if motion.name not in MOTIONS]
+        if unknown:
+            raise ValueError(f"Unknown motions {', '.join(unknown)}, the NumPy engine renders {', '.join(MOTIONS)}")
+        rgb, depthmap = self.load(image, depth, height)
+        frame_height, frame_width = depthmap.shape
+        count = int(time * fps)
+
+        encoder = tracing.Popen([
+            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{frame_width}x{frame_height}', '-r', str(fps),
+            '-i', '-',
+            '-c:v', 'libx264', '-crf', str(self.crf), '-pix_fmt', 'yuv420p',
+            str(output)
+        ], stdin=subprocess.PIPE)
+        try:
+            for frame in self.frames(rgb, depthmap, animation, count):
+                encoder.stdin.write(frame)
+        except BrokenPipeError:
+            # ffmpeg exited early, its exit status (and stderr) tell why
+            pass
+        finally:
+            try:
+                encoder.stdin.close()
+            except BrokenPipeError:
+                pass
+            returncode = encoder.wait()
+
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, encoder.args)
+        return output
@@ -0,0 +1,430 @@
+import os
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from audio import delay_voiceover, mix_audio, process_audio
+from cleaner import CleanerParams, clean
+from cutter import CutterParams, cut, probe_outro_duration
+from scheduler import Scheduler, Task
+from slideshow import SlideshowParams, audio_params, create_slideshows, render_slideshow, slideshow_timeline, subscribe_params
+from sorter import SorterParams, sort_files
+from subscribe import add_overlay
+import artifacts
+import governor
+import history
+import progress
+import scratch
+import tracing
+
+# (share of the CPU budget, peak MB) per stage, encodes leave room for a second folder
+STAGE_COSTS = {
+    'cut': (0.5, 512),
+    'clean': (0.1, 128),
+    'sort': (0.1, 64),
+    'depth_estimate': (0.5, 3072),
+    'depth_render': (0.5, 2048),
+    'voiceover': (0.1, 128),
+    'transcribe': (0.5, 2048),
+    'timeline': (0.1, 64),
+    'slideshow': (0.5, 1024),
+    'audio': (0.1, 256),
+    'mux': (0.1, 256),
+    'subscribe': (0.5, 1024),
+}
+
+
+@dataclass
+class PipelineParams:
+    segment_duration: int = 6
+    time_limit: int = 595
+    input_folder: str = 'INPUT'
+    template_folder: str = 'TEMPLATE'
+    title: str = 'Model Name'
+    title_fontsize: int = 90
+    title_fontfile: str = 'Montserrat-SemiBold.otf'
+    title_fontcolor: str = 'random'
+    start_delay: int = 21
+    title_appearance_delay: int = 1
+    title_visible_time: int = 5
+    title_y_offset: int = -35
+    title_x_offset: int = 110
+    vo_delay: int = 5
+    watermark: str = 'Today is a\\n Plus Day'
+    watermark_type: str = 'random'
+    watermark_speed: int = 50
+    watermark_font: str = 'Nexa Bold.otf'
+    depthflow: bool = False
+    depth_workers: int = 1
+    depth_engine: str = 'depthflow'
+    depth_render_scale: float = 1.0
+    video_orientation: str = 'vertical'
+    chromakey_color: str = '65db41'
+    chromakey_similarity: float = 0.18
+    chromakey_blend: float = 0
+    generate_srt: bool = False
+    subtitle_max_width: int = 21
+    # Whisper model size and CPU compute type, empty for $WHISPER_MODEL and $WHISPER_COMPUTE_TYPE
+    whisper_model: str = ''
+    whisper_compute_type: str = ''
+    smart_render: bool = False
+    variants_file: str = ''
+    blur: bool = False
+    trace_folder: str = 'TRACE'
+    # Fast local folder for the intermediates (tmpfs, NVMe), empty for $SCRATCH_DIR
+    scratch_folder: str = ''
+    # Actions for intermediates once used, see artifacts.policy
+    artifact_policy: str = ''
+    # SQLite run history that --plan predicts from, empty for none
+    history_file: str = 'TRACE/history.db'
+
+
+def slideshow_params(params: PipelineParams, outro_duration: int, root_folder: str) -> SlideshowParams:
+    return SlideshowParams(
+        slide_time=params.segment_duration - 1,
+        time_limit=params.time_limit,
+        outro_duration=outro_duration,
+        template_folder=params.template_folder,
+        title=params.title,
+        title_fontsize=params.title_fontsize,
+        title_fontfile=params.title_fontfile,
+        title_fontcolor=params.title_fontcolor,
+        start_delay=params.start_delay,
+        title_appearance_delay=params.title_appearance_delay,
+        title_visible_time=params.title_visible_time,
+        title_y_offset=params.title_y_offset,
+        title_x_offset=params.title_x_offset,
+        vo_delay=params.vo_delay,
+        watermark=params.watermark,
+        watermark_font=params.watermark_font,
+        watermark_type=params.watermark_type,
+        watermark_speed=params.watermark_speed,
+        depthflow=params.depthflow,
+        video_orientation=params.video_orientation,
+        chromakey_color=params.chromakey_color,
+        chromakey_similarity=params.chromakey_similarity,
+        chromakey_blend=params.chromakey_blend,
+        generate_srt=params.generate_srt,
+        subtitle_max_width=params.subtitle_max_width,
+        whisper_model=params.whisper_model,
+        whisper_compute_type=params.whisper_compute_type,
+        smart_render=params.smart_render,
+        variants_file=params.variants_file,
+        root_folder=root_folder,
+        artifact_policy=params.artifact_policy,
+    )
+
+
+def check_params(params: PipelineParams) -> None:
+    """Raise ValueError for settings that would otherwise only fail in a late stage"""
+    artifacts.policy(params.artifact_policy)
+    if params.generate_srt:
+        # Imported here: only runs that want subtitles pay for the srt_generator setup
+        from srt_generator import whisper_settings
+        whisper_settings(params.whisper_model, params.whisper_compute_type)
+
+
+def start_run_log(params: PipelineParams, name: str) -> None:
+    """Trace and ffmpeg progress log of one run, written to TRACE/<name>.json and .log.
+    The trace also runs without a trace folder when the stage timings go to the run history.
+    """
+    if params.trace_folder or params.history_file:
+        tracing.start()
+    if params.trace_folder:
+        progress.open_log(os.path.join(params.trace_folder, f"{name}.log"))
+
+
+def save_run_log(params: PipelineParams, name: str) -> Optional[List[Dict]]:
+    """Stop the trace, returns its events for the run history"""
+    events = tracing.stop()
+    if params.trace_folder:
+        progress.close_log()
+        tracing.save(os.path.join(params.trace_folder, f"{name}.json"), events)
+    return events
+
+
+def survey(params: PipelineParams, input_folder: str) -> Optional[Dict]:
+    """Contents of an input folder for the run history, None when it is not kept or the folder can't be read"""
+    if not params.history_file:
+        return None
+    try:
+        return history.survey(input_folder, params.segment_duration, params.time_limit,
+                              params.template_folder, params.video_orientation)
+    except OSError as error:
+        print(f"***** Could not survey {input_folder} for the run history: {error}")
+        return None
+
+
+def record_history(params: PipelineParams, contents: Optional[Dict], input_folder: str, stages: Dict, ok: bool,
+                   wall_s: float, output_folder: Optional[str], batch: Optional[str] = None) -> None:
+    if contents is None:
+        return
+    try:
+        history.record(params.history_file, contents, asdict(params), stages, ok, wall_s,
+                       history.folder_bytes(output_folder), input_folder, batch)
+    except (sqlite3.Error, OSError) as error:
+        print(f"***** Could not record the run in {params.history_file}: {error}")
+
+
+def plan(params: PipelineParams, jobs: Optional[List[str]] = None) -> Optional[float]:
+    """Print the predicted wall time and disk use of the input folder (or of a batch of its subfolders), returns the seconds"""
+    folders = [os.path.join(params.input_folder, job) for job in jobs] if jobs else [params.input_folder]
+    predictions = []
+    for folder in folders:
+        contents = survey(params, folder)
+        prediction = contents and history.plan(params.history_file, contents, asdict(params))
+        if not prediction:
+            print(f"***** No run history to predict {folder} from, run it once first")
+            return None
+        print(f"##### {folder}: {contents['videos']} videos ({contents['video_s']:.0f}s), {contents['images']} images, "
+              f"{contents['output_s']:.0f}s slideshow, from {prediction['runs']} similar runs")
+        for stage, seconds in prediction['stages'].items():
+            print(f"{stage:<12}{seconds:>9.1f}s")
+        predictions.append(prediction)
+
+    walls = [prediction['wall_s'] for prediction in predictions]
+    # A batch can't finish before its longest folder, nor faster than past batches overlapped their stages
+    wall_s = max(max(walls), sum(walls) / history.batch_overlap(params.history_file)) if jobs else walls[0]
+    disk = sum(prediction['disk_bytes'] or 0 for prediction in predictions)
+    runs = min(prediction['runs'] for prediction in predictions)
+    hours, rest = divmod(int(wall_s), 3600)
+    print(f">>>>> ETA {hours}:{rest // 60:02d}:{rest % 60:02d}, {disk / 1e6:.0f} MB disk (from {runs} similar runs)")
+    return wall_s
+
+
+def run(params: PipelineParams) -> Tuple[str, str]:
+    """cutter -> cleaner -> sorter -> depth -> slideshow (audio, subscribe) in this process, returns (result folder, datetime)"""
+    started = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    check_params(params)
+    actions = artifacts.policy(params.artifact_policy)
+    if params.scratch_folder:
+        scratch.configure(params.scratch_folder)
+    contents = survey(params, params.input_folder)
+    begin = time.perf_counter()
+    datetime_folder = None
+    ok = False
+    start_run_log(params, started)
+    try:
+        with tracing.span('cut', folder=params.input_folder):
+            result_folder, datetime_str = cut(CutterParams(
+                input_folder=params.input_folder,
+                template_folder=params.template_folder,
+                segment_duration=params.segment_duration,
+                video_orientation=params.video_orientation,
+            ))
+
+        print(f'##### Delete videos shorter than {params.segment_duration}s')
+        with tracing.span('clean'):
+            clean(CleanerParams(input_folder=result_folder, minimum_duration=params.segment_duration))
+
+        print(f'##### Rename and move to {result_folder}/{datetime_str}')
+        with tracing.span('sort'):
+            datetime_folder = sort_files(SorterParams(path=result_folder, datetime_str=datetime_str))
+        artifacts.record(datetime_folder, 'sort', actions)
+
+        print(f'##### Create slideshow {str(params.segment_duration - 1)}s per slide with 1s transitions')
+
+        # Calculate length of outro video to subtract from time limit later in DepthFlow and Slideshow
+        outro_duration = probe_outro_duration(params.template_folder, params.video_orientation)
+
+        if params.depthflow:
+            # Torch and DepthFlow are only imported when parallax clips are rendered
+            from depth import DepthParams, render_depth
+
+            depth_params = DepthParams(
+                path=result_folder,
+                datetime_str=datetime_str,
+                segment_duration=params.segment_duration,
+                time_limit=int(params.time_limit - outro_duration),
+                workers=params.depth_workers,
+                render_scale=params.depth_render_scale,
+                engine=params.depth_engine,
+            )
+            print(f"##### CREATING DEPTHFLOW: {depth_params}")
+            with tracing.span('depth', engine=params.depth_engine):
+                render_depth(depth_params)
+            artifacts.record(datetime_folder, 'depth', actions)
+
+        print("###### CREATING SLIDESHOW")
+        with tracing.span('slideshows'):
+            create_slideshows(slideshow_params(params, outro_duration, result_folder))
+
+        print("###### SLIDESHOW READY ######")
+        ok = True
+        return result_folder, datetime_str
+    finally:
+        events = save_run_log(params, started)
+        record_history(params, contents, params.input_folder, history.stage_times(events), ok,
+                       time.perf_counter() - begin, datetime_folder)
+
+
+def required(value, message):
+    """Stages report failures by printing and returning None, the scheduler needs an exception"""
+    if value is None or value is False:
+        raise RuntimeError(message)
+    return value
+
+
+def plan_job(scheduler: Scheduler, job: str, params: PipelineParams) -> None:
+    """Add the stages of one input folder with their real dependencies:
+    depth only needs the stills, the voiceover and its transcription only need the voiceover,
+    the audio mix only needs the voiceover and the timeline, and the encode runs next to all of them.
+    """
+    check_params(params)
+    input_folder = os.path.join(params.input_folder, job)
+    outro_duration = probe_outro_duration(params.template_folder, params.video_orientation)
+    folder_params = slideshow_params(params, outro_duration, input_folder)
+    # Subtitles are a task of their own, the voiceover task only delays it
+    voiceover_params = replace(audio_params('', folder_params), generate_srt=False)
+    actions = artifacts.policy(params.artifact_policy)
+
+    def task(stage, run, *deps):
+        cpu, memory = STAGE_COSTS[stage]
+        scheduler.add(Task(
+            name=f"{job}/{stage}",
+            run=run,
+            deps=[f"{job}/{dep}" for dep in deps],
+            cpu=max(1, round(cpu * scheduler.cpu)),
+            memory=memory,
+            group=job,
+        ))
+
+    def folder(results: Dict) -> str:
+        return results[f"{job}/sort"]
+
+    def recorded(stage, run):
+        """Record what a folder stage wrote in the folder's manifest, a failure keeps the stage's inputs"""
+        def call(results: Dict):
+            try:
+                result = run(results)
+            except Exception:
+                artifacts.record(folder(results), stage, actions, ok=False)
+                raise
+            artifacts.record(folder(results), stage, actions)
+            return result
+        return call
+
+    task('cut', lambda results: cut(CutterParams(
+        input_folder=input_folder,
+        template_folder=params.template_folder,
+        segment_duration=params.segment_duration,
+        video_orientation=params.video_orientation,
+    )))
+    task('clean', lambda results: clean(CleanerParams(
+        input_folder=results[f"{job}/cut"][0], minimum_duration=params.segment_duration
+    )), 'cut')
+    def sort(results: Dict) -> str:
+        datetime_folder = sort_files(SorterParams(*results[f"{job}/cut"]))
+        artifacts.record(datetime_folder, 'sort', actions)
+        return datetime_folder
+
+    task('sort', sort, 'clean')
+
+    timeline_deps = ['sort']
+    if params.depthflow:
+        # Torch and DepthFlow are only imported when parallax clips are rendered
+        from depth import DepthParams, estimate_depth, render_parallax
+
+        def depth_params(results: Dict) -> DepthParams:
+            result_folder, datetime_str = results[f"{job}/cut"]
+            return DepthParams(
+                path=result_folder,
+                datetime_str=datetime_str,
+                segment_duration=params.segment_duration,
+                time_limit=int(params.time_limit - outro_duration),
+                workers=params.depth_workers,
+                render_scale=params.depth_render_scale,
+                engine=params.depth_engine,
+            )
+
+        task('depth_estimate', lambda results: estimate_depth(depth_params(results)), 'sort')
+        task('depth_render', recorded('depth', lambda results: render_parallax(
+            depth_params(results), results[f"{job}/depth_estimate"]
+        )), 'depth_estimate')
+        timeline_deps.append('depth_render')
+
+    task('voiceover', recorded('voiceover', lambda results: required(
+        delay_voiceover(replace(voiceover_params, path=folder(results))), "voiceover not delayed"
+    )), 'sort')
+    subscribe_deps = ['mux']
+    if params.generate_srt:
+        def transcribe(results: Dict) -> None:
+            # Imported here: only runs that want subtitles pay for WhisperX setup
+            from srt_generator import generate_srt
+            generate_srt(folder(results), True, params.subtitle_max_width,
+                         model_name=params.whisper_model, compute_type=params.whisper_compute_type)
+
+        task('transcribe', recorded('transcribe', transcribe), 'voiceover')
+        subscribe_deps.append('transcribe')
+
+    task('timeline', lambda results: required(
+        slideshow_timeline(folder(results), folder_params), "no outro video"
+    ), *timeline_deps)
+    task('slideshow', recorded('slideshow', lambda results: render_slideshow(
+        folder(results), folder_params, *results[f"{job}/timeline"]
+    )), 'timeline')
+    task('audio', recorded('audio', lambda results: required(mix_audio(
+        replace(voiceover_params, path=folder(results)),
+        results[f"{job}/timeline"][1],
+        results[f"{job}/voiceover"],
+    ), "audio mix failed")), 'timeline', 'voiceover')
+    task('mux', recorded('mux', lambda results: required(process_audio(
+        replace(voiceover_params, path=folder(results), step='mux')
+    ), "audio mux failed")), 'slideshow', 'audio')
+    def subscribe(results: Dict) -> List[str]:
+        outputs = add_overlay(subscribe_params(folder(results), folder_params))
+        # Intermediates are only dropped once every final video is written
+        finished = all(os.path.isfile(output) for output in outputs)
+        if finished:
+            scratch.release(folder(results))
+        artifacts.record(folder(results), 'subscribe', actions, outputs, ok=finished)
+        return outputs
+
+    task('subscribe', subscribe, *subscribe_deps)
+
+
+def run_batch(params: PipelineParams, jobs: List[str], cpu: Optional[float] = None, memory: Optional[int] = None,
+              job_params: Optional[Dict[str, PipelineParams]] = None, pin: bool = governor.PIN) -> Scheduler:
+    """Run several input folders (subfolders of params.input_folder) through one stage DAG,
+    so one folder's cut overlaps another folder's encode. Reports each folder's critical path.
+    job_params replaces params for single folders (their own title, template, ...).
+    Each running stage gets its CPU share as a thread budget, pinned to its cores with `pin`.
+    """
+    job_params = job_params or {}
+    if params.scratch_folder:
+        scratch.configure(params.scratch_folder)
+    scheduler = Scheduler(cpu=cpu, memory=memory, pin=pin)
+    for job in jobs:
+        plan_job(scheduler, job, job_params.get(job, params))
+
+    print(f"##### Scheduling {len(scheduler.tasks)} stages of {len(jobs)} folders on {scheduler.cpu:g} CPUs, {scheduler.memory} MB")
+    started = datetime.now().strftime("batch_%Y-%m-%d_%H-%M-%S")
+    contents = {job: survey(job_params.get(job, params), os.path.join(params.input_folder, job)) for job in jobs}
+    start_run_log(params, started)
+    try:
+        scheduler.run()
+    finally:
+        events = save_run_log(params, started)
+    scheduler.report()
+    record_batch(scheduler, params, job_params, contents, events, started)
+    return scheduler
+
+
+def record_batch(scheduler: Scheduler, params: PipelineParams, job_params: Dict[str, PipelineParams],
+                 contents: Dict[str, Optional[Dict]], events: Optional[List[Dict]], name: str) -> None:
+    """One run history row per folder, timed from its first to its last stage, and the batch's overlap"""
+    for job, job_contents in contents.items():
+        tasks = [task for task in scheduler.tasks.values() if task.group == job]
+        finished = [task for task in tasks if task.end]
+        ok = all(task.end and task.error is None for task in tasks)
+        wall_s = max(task.end for task in finished) - min(task.start for task in finished) if finished else 0
+        record_history(job_params.get(job, params), job_contents, os.path.join(params.input_folder, job),
+                       history.stage_times(events, job), ok, wall_s, scheduler.results.get(f"{job}/sort"), name)
+    if params.history_file and scheduler.end:
+        busy = sum(task.duration for task in scheduler.tasks.values() if task.end)
+        try:
+            history.record_batch(params.history_file, name, len(contents), scheduler.end - scheduler.start, busy)
+        except (sqlite3.Error, OSError) as error:
+            print(f"***** Could not record the batch in {params.history_file}: {error}")
@@ -0,0 +1,186 @@
+"""Live progress of ffmpeg children from `-progress pipe:N`: frames, fps, speed and ETA.
+
+tracing.Popen adds the pipe to the long encodes (report_progress=True: the slideshow, cutting,
+the overlay renders, subtitles, compression) and hands the read end to a Reporter.
+Updates are printed as `>>>>> ` lines (gui.py shows the latest one), appended to the run log
+when one is open, and recorded as counters in the trace. The pipe is passed with pass_fds and
+read with select(), so there is no progress on Windows.
+"""
+import os
+import select
+import subprocess
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+PREFIX = '>>>>> '
+# Seconds between printed updates, and without any update before a child is reported as stalled
+INTERVAL = float(os.getenv('PROGRESS_INTERVAL', 5))
+STALL_AFTER = float(os.getenv('PROGRESS_STALL', 60))
+# pass_fds and select() on pipes are POSIX-only
+SUPPORTED = os.name == 'posix'
+
+_log_lock = threading.Lock()
+_log_path: Optional[str] = None
+
+
+def open_log(path: str) -> None:
+    """Append progress lines to `path` until close_log()"""
+    global _log_path
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    _log_path = path
+
+
+def close_log() -> None:
+    global _log_path
+    _log_path = None
+
+
+def report(line: str) -> None:
+    print(PREFIX + line, flush=True)
+    with _log_lock:
+        if _log_path:
+            with open(_log_path, 'a') as f:
+                f.write(f"{datetime.now().isoformat(timespec='seconds')} {line}\n")
+
+
+def expected_output(args: List[str]) -> Tuple[Optional[float], Optional[int]]:
+    """Output duration (-t) and frame count (-frames:v) of an ffmpeg command, options after the last input"""
+    last_input = max((i for i, arg in enumerate(args) if arg == '-i'), default=0)
+    seconds, frames = None, None
+    for option, value in zip(args[last_input:], args[last_input + 1:]):
+        if option == '-t':
+            try:
+                seconds = float(value)
+            except ValueError:
+                pass
+        elif option in ('-frames:v', '-vframes'):
+            frames = int(value)
+    return seconds, frames
+
+
+def input_duration(args: List[str]) -> Optional[float]:
+    """Duration of the first file input (after its -ss, within its -t), for encodes that set no output length"""
+    previous = 0
+    for index, arg in enumerate(args[:-1]):
+        if arg != '-i':
+            continue
+        options, previous = dict(zip(args[previous:index], args[previous + 1:index])), index + 2
+        path = args[index + 1]
+        # lavfi sources and concat lists are not files ffprobe can time
+        if '-f' in options or not os.path.isfile(path):
+            continue
+        try:
+            seconds = float(subprocess.run(
+                ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path],
+                capture_output=True, text=True, check=True,
+            ).stdout.strip())
+            seconds -= float(options.get('-ss', 0))
+            if '-t' in options:
+                seconds = min(seconds, float(options['-t']))
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+        return max(seconds, 0.0)
+    return None
+
+
+def add_pipe(args: List[str]) -> Tuple[List[str], Optional[int], Optional[int]]:
+    """Insert `-progress pipe:N` into an ffmpeg command, returns (args, read fd, write fd)"""
+    if not SUPPORTED or not args or os.path.basename(args[0]) != 'ffmpeg' or '-progress' in args:
+        return args, None, None
+    read_fd, write_fd = os.pipe()
+    return [args[0], '-progress', f'pipe:{write_fd}', '-nostats'] + args[1:], read_fd, write_fd
+
+
+def duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+
+class Reporter(threading.Thread):
+    """Reads one child's progress pipe until it closes"""
+
+    def __init__(self, fd: int, label: str, args: List[str], counter: Optional[Callable] = None):
+        super().__init__(name=f"progress {label}", daemon=True)
+        self.fd = fd
+        self.label = label
+        self.args = args
+        self.total_seconds, self.total_frames = expected_output(args)
+        self.start_time = time.perf_counter()
+        self.values: Dict[str, str] = {}
+        self.summary: Dict[str, float] = {}
+        # Called with fps and speed on every update (trace counters)
+        self.counter = counter
+
+    def run(self) -> None:
+        if not self.total_seconds and not self.total_frames:
+            # Probed here, so the encode does not wait for it
+            self.total_seconds = input_duration(self.args)
+        buffer = b''
+        last_report, last_update = 0.0, time.perf_counter()
+        stalled = False
+        with os.fdopen(self.fd, 'rb', buffering=0) as pipe:
+            while True:
+                ready, _, _ = select.select([pipe], [], [], INTERVAL)
+                now = time.perf_counter()
+                if not ready:
+                    if now - last_update > STALL_AFTER and not stalled:
+                        stalled = True
+                        report(f"{self.label}: stalled, no progress for {duration(now - last_update)}")
+                    continue
+                chunk = pipe.read(4096)
+                if not chunk:
+                    break
+                buffer += chunk
+                *lines, buffer = buffer.split(b'\n')
+                for line in lines:
+                    key, _, value = line.decode(errors='replace').strip().partition('=')
+                    self.values[key] = value
+                    if key != 'progress':
+                        continue
+                    # A block of key=value lines ends with progress=continue|end
+                    last_update, stalled = now, False
+                    self.update()
+                    if value == 'end' or now - last_report >= INTERVAL:
+                        last_report = now
+                        report(self.line())
+        self.values.setdefault('progress', 'end')
+
+    def update(self) -> None:
+        elapsed = time.perf_counter() - self.start_time
+        frame = int(self.values.get('frame', 0) or 0)
+        fps = float(self.values.get('fps', 0) or 0)
+        try:
+            out_time = int(self.values.get('out_time_us', 0)) / 1e6
+        except ValueError:
+            out_time = 0.0
+        try:
+            speed = float(self.values.get('speed', '').rstrip('x'))
+        except ValueError:
+            # N/A until ffmpeg has output, fall back to our own clock
+            speed = out_time / elapsed if elapsed else 0.0
+
+        eta = None
+        if self.total_frames and fps:
+            eta = max(0.0, (self.total_frames - frame) / fps)
+        elif self.total_seconds and speed:
+            eta = max(0.0, (self.total_seconds - out_time) / speed)
+        self.summary = {'frames': frame, 'fps': fps, 'speed': round(speed, 2), 'out_time_s': round(out_time, 2), 'eta_s': eta}
+        if self.counter:
+            self.counter(f"{self.label} progress", fps=fps, speed=round(speed, 2))
+
+    def line(self) -> str:
+        summary = self.summary
+        # Audio-only encodes have no frames
+        parts = [f"frame {summary['frames']}", f"{summary['fps']:.1f} fps"] if summary['frames'] else []
+        parts.append(f"{summary['speed']:.2f}x")
+        if self.total_seconds:
+            parts.append(f"{summary['out_time_s']:.1f}/{self.total_seconds:g}s")
+        else:
+            parts.append(f"{summary['out_time_s']:.1f}s")
+        if self.values.get('progress') == 'end':
+            parts.append(f"done in {duration(time.perf_counter() - self.start_time)}")
+        elif summary['eta_s'] is not None:
+            parts.append(f"ETA {duration(summary['eta_s'])}")
+        return f"{self.label}: {' | '.join(parts)}"
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import governor
+import tracing
+
+
+@dataclass
+class Task:
+    name: str
+    run: Callable[[Dict[str, Any]], Any]
+    """Called with the results of all finished tasks by name, returns this task's result"""
+    deps: List[str] = field(default_factory=list)
+    cpu: float = 1
+    """Cores the task keeps busy"""
+    memory: int = 256
+    """Peak memory in MB"""
+    group: str = ''
+    """Batch the task belongs to, critical paths are reported per group"""
+
+    start: float = 0
+    end: float = 0
+    error: Optional[BaseException] = None
+    skipped: bool = False
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def cpu_budget() -> int:
+    """CPUs available to this process"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def memory_budget() -> int:
+    """80% of the available memory in MB, 8 GB when /proc/meminfo can't be read"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(int(line.split()[1]) / 1024 * 0.8)
+    except OSError:
+        pass
+    return 8192
+
+
+class Scheduler:
+    """Runs a DAG of tasks on threads as soon as their dependencies are done, within a CPU and memory budget.
+
+    Ready tasks start in the order they were added, so earlier groups keep priority and later
+    groups fill the capacity that is left. A task larger than the budget still runs, alone.
+    """
+
+    def __init__(self, cpu: Optional[float] = None, memory: Optional[int] = None, pin: bool = governor.PIN):
+        self.cpu = cpu or cpu_budget()
+        self.memory = memory or memory_budget()
+        # Pin each task to the cores of its thread budget
+        self.pin = pin
+        self.tasks: Dict[str, Task] = {}
+        self.results: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+
+    def add(self, task: Task) -> Task:
+        if task.name in self.tasks:
+            raise ValueError(f"Duplicate task {task.name}")
+        self.tasks[task.name] = task
+        return task
+
+    def _call(self, task: Task) -> None:
+        task.start = time.perf_counter()
+        try:
+            # The task's ffmpeg and model threads come out of the machine-wide pool
+            with governor.allot(task.cpu, self.pin) as threads, tracing.span(task.name, group=task.group, threads=threads):
+                result = task.run(self.results)
+            with self.lock:
+                self.results[task.name] = result
+        except Exception as error:
+            task.error = error
+        finally:
+            task.end = time.perf_counter()
+
+    def _skip_failed(self, pending: List[Task]) -> None:
+        """Drop the pending tasks downstream of a failure, transitively"""
+        changed = True
+        while changed:
+            changed = False
+            for task in list(pending):
+                deps = [self.tasks[dep] for dep in task.deps]
+                if any(dep.error is not None or dep.skipped for dep in deps):
+                    task.skipped = True
+                    pending.remove(task)
+                    changed = True
+                    print(f"----- Skipping {task.name}: a dependency failed")
+
+    def run(self) -> Dict[str, Any]:
+        """Run every task, returns the results by task name; failed tasks skip their dependents"""
+        for task in self.tasks.values():
+            missing = [dep for dep in task.deps if dep not in self.tasks]
+            if missing:
+                raise ValueError(f"{task.name} depends on unknown tasks {missing}")
+
+        pending = list(self.tasks.values())
+        running = {}
+        cpu_used, memory_used = 0.0, 0
+        self.start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pending)), thread_name_prefix="stage") as pool:
+            while pending or running:
+                self._skip_failed(pending)
+                for task in list(pending):
+                    if not all(dep in self.results for dep in task.deps):
+                        continue
+                    fits = cpu_used + task.cpu <= self.cpu and memory_used + task.memory <= self.memory
+                    if not fits and running:
+                        continue
+                    pending.remove(task)
+                    cpu_used += task.cpu
+                    memory_used += task.memory
+                    print(f"+++++ Starting {task.name} ({cpu_used:g}/{self.cpu:g} CPU, {memory_used}/{self.memory} MB)")
+                    running[pool.submit(self._call, task)] = task
+
+                if not running:
+                    if pending:
+                        # Only reachable with a dependency cycle
+                        raise ValueError(f"Tasks can never start: {[task.name for task in pending]}")
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    cpu_used -= task.cpu
+                    memory_used -= task.memory
+                    if task.error is not None:
+                        print(f"***** {task.name} failed: {task.error}")
+                    else:
+                        print(f"----- {task.name} done: {task.duration:.2f} seconds")
+
+        self.end = time.perf_counter()
+        return self.results
+
+    def critical_path(self, group: Optional[str] = None) -> List[Task]:
+        """Longest chain of finished tasks by measured duration, within one group or the whole DAG"""
+        tasks = {name: task for name, task in self.tasks.items()
+                 if (group is None or task.group == group) and task.end}
+        longest: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def visit(name: str) -> float:
+            if name not in longest:
+                deps = [dep for dep in tasks[name].deps if dep in tasks]
+                best = max(deps, key=visit, default=None)
+                previous[name] = best
+                longest[name] = tasks[name].duration + (longest[best] if best else 0)
+            return longest[name]
+
+        if not tasks:
+            return []
+        name = max(tasks, key=visit)
+        path = []
+        while name:
+            path.append(tasks[name])
+            name = previous[name]
+        return path[::-1]
+
+    def report(self) -> None:
+        groups = list(dict.fromkeys(task.group for task in self.tasks.values()))
+        for group in groups:
+            path = self.critical_path(group)
+            total = sum(task.duration for task in path)
+            chain = ' -> '.join(f"{task.name} {task.duration:.1f}s" for task in path)
+            print(f"##### Critical path {group or 'batch'} ({total:.1f}s): {chain}")
+
+        failed = [task.name for task in self.tasks.values() if task.error is not None]
+        skipped = [task.name for task in self.tasks.values() if task.skipped]
+        busy = sum(task.duration for task in self.tasks.values() if task.end)
+        wall = self.end - self.start
+        print(f"##### Batch: {wall:.1f}s wall, {busy:.1f}s of stage time ({busy / wall if wall else 0:.2f}x overlap)")
+        if failed:
+            print(f"***** Failed: {', '.join(failed)}")
+        if skipped:
+            print(f"***** Skipped: {', '.join(skipped)}")
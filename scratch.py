@@ -0,0 +1,131 @@
+"""Scratch space for intermediates, so only final videos are written to the media volume.
+
+With `$SCRATCH_DIR` (or `--scratch`) set to a fast local folder (tmpfs, NVMe), each result
+folder gets a scratch folder of its own there: slideshow.mp4, slideshow_with_audio.mp4, the
+adjusted_*/compressed_* audio, the parallax `_df.mp4` clips and the overlay pieces. cutter's
+`temp_` files are written there too. A job only gets scratch space when it can hold the job's
+intermediates (JOB_BYTES), otherwise they stay next to the media as before (disk fallback).
+
+The choice is stored in a `.scratch` file in the media folder, so every stage, and the
+stand-alone scripts, find the intermediates where the first stage put them.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+ROOT = os.getenv('SCRATCH_DIR', '')
+# Intermediates of one full-length job: two 595 s slideshows at 2 Mbit/s, the parallax clips and the audio stems
+JOB_BYTES = int(os.getenv('SCRATCH_JOB_MB', 600)) * 1024 * 1024
+MARKER = '.scratch'
+
+_lock = threading.Lock()
+# Media folder -> scratch folder this process handed out and has not released
+_reserved: Dict[str, str] = {}
+
+
+def configure(root: str) -> None:
+    """Use `root` for the scratch folders of the jobs started from now on, '' for none"""
+    global ROOT
+    ROOT = root
+
+
+def _read_marker(media_folder: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(media_folder, MARKER)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_marker(media_folder: str, **values) -> None:
+    with open(os.path.join(media_folder, MARKER), 'w') as f:
+        json.dump(values, f)
+
+
+def _usage(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(folder) for name in names)
+
+
+def _fits(size: int) -> bool:
+    """Free scratch space after the jobs already handed out fill their share, call with _lock held"""
+    try:
+        os.makedirs(ROOT, exist_ok=True)
+        free = shutil.disk_usage(ROOT).free
+    except OSError:
+        return False
+    pending = sum(max(0, JOB_BYTES - _usage(folder)) for folder in _reserved.values())
+    return free - pending >= size
+
+
+def folder(media_folder: str) -> str:
+    """Folder for the intermediates of `media_folder`: its scratch folder, or itself on fallback"""
+    with _lock:
+        marker = _read_marker(media_folder)
+        if marker is None:
+            if not ROOT:
+                return media_folder
+            key = os.path.abspath(media_folder)
+            target = os.path.join(ROOT, f"{os.path.basename(key)}_{hashlib.sha1(key.encode()).hexdigest()[:8]}")
+            if _fits(JOB_BYTES):
+                _reserved[key] = target
+                _write_marker(media_folder, folder=target)
+                print(f"+++++ Intermediates of {media_folder} in {target}")
+            else:
+                print(f"----- Scratch space {ROOT} is full, intermediates of {media_folder} stay on disk")
+                _write_marker(media_folder, folder=None)
+            marker = _read_marker(media_folder)
+        target = marker.get('folder')
+        if not target:
+            return media_folder
+        os.makedirs(target, exist_ok=True)
+        return target
+
+
+def path(media_folder: str, name: str) -> str:
+    """Path of an intermediate file of `media_folder`"""
+    return os.path.join(folder(media_folder), name)
+
+
+def located(media_folder: str) -> Optional[str]:
+    """Scratch folder of `media_folder` when it has one, without claiming scratch space"""
+    return (_read_marker(media_folder) or {}).get('folder')
+
+
+def find(media_folder: str, name: str) -> Optional[str]:
+    """Existing intermediate, in scratch or in the media folder, without claiming scratch space"""
+    for candidate in filter(None, (located(media_folder), media_folder)):
+        if os.path.exists(os.path.join(candidate, name)):
+            return os.path.join(candidate, name)
+    return None
+
+
+def released(media_folder: str) -> bool:
+    """The job finished and its scratch folder was deleted"""
+    return bool((_read_marker(media_folder) or {}).get('released'))
+
+
+def release(media_folder: str) -> None:
+    """Delete the scratch folder of a finished job, the final videos are in the media folder"""
+    with _lock:
+        _reserved.pop(os.path.abspath(media_folder), None)
+        marker = _read_marker(media_folder)
+        if not marker or not marker.get('folder'):
+            return
+        shutil.rmtree(marker['folder'], ignore_errors=True)
+        _write_marker(media_folder, folder=marker['folder'], released=datetime.now().isoformat(timespec='seconds'))
+    print(f"----- Scratch folder {marker['folder']} deleted")
+
+
+def temp(output_path: str, size: int) -> str:
+    """Temporary file for an output of about `size` bytes, moved to `output_path` when done"""
+    with _lock:
+        # _fits reads the reservations other threads' folder() and release() change
+        fits = bool(ROOT) and _fits(2 * size)
+    if fits:
+        return os.path.join(ROOT, f"temp_{uuid.uuid4().hex[:8]}_{os.path.basename(output_path)}")
+    return os.path.join(os.path.dirname(output_path), "temp_" + os.path.basename(output_path))
@@ -2,80 +2,81 @@ import subprocess
 import os
 import argparse
 import random
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from PIL import Image
+import math
 import time
 
-# Start timing the entire process
-start_time = time.time()
-
-
-# Create an ArgumentParser to handle command-line arguments
-parser = argparse.ArgumentParser(description="Create slideshow.")
-parser.add_argument('--sd', type=int, default=5, dest='slide_time', help='Frame duration (in seconds)')
-parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
-parser.add_argument('--od', type=int, default=14, dest='outro_duration', help='Outro duration (in seconds)')
-
-parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
-
-
-parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
-parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Title font size')
-parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file name')
-parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
-parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before title+subscribe overlay appears (in seconds)')
-parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
-parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
-parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
-parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
-
-parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
-
-
-parser.add_argument('--w', type=str, default='Today is a\\n Plus Day', dest='watermark', help='Watermark text')
-parser.add_argument('--wf', type=str, default='Nexa Bold.otf', dest='watermark_font', help='Font file name')
-parser.add_argument('--wt', type=str, default='random', dest='watermark_type', help='Watermark type: ccw, random')
-parser.add_argument('--ws', type=int, default=50, dest='watermark_speed', help='Watermark speed (in frames: 25 = 1s)')
-
-
-parser.add_argument('--z', type=str, default='0', dest='depthflow', help='Use DepthFlow for images? 1/0')
-parser.add_argument('--o', type=str, default='vertical', dest='video_orientation', help='Video orientation (vertical|horizontal)')
-
-parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
-parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
-parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
-
-parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Generate .srt subtitles? 0/1')
-parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
-
-
-# Parse the command-line arguments
-args = parser.parse_args()
-args.watermark = args.watermark.replace('\\n', '\n')
-
-video_orientation = args.video_orientation
-
-slide_time = args.slide_time
-
-template_folder = args.template_folder + '/'
-# Set target height and width
-if video_orientation == 'vertical':
-    target_height = 1920
-    target_width = 1080
-    outro_video_path = template_folder + 'outro_vertical.mp4'
-
-else:
-    target_height = 1080
-    target_width = 1920
-    outro_video_path = template_folder + 'outro_horizontal.mp4'
-
-print(f"******* Using outro video path: {outro_video_path}")  # Print the full path
+import artifacts
+import scratch
+import tracing
+from audio import AudioParams, mix_audio, process_audio
+from cutter import probe_outro_length
+from subscribe import SubscribeParams, add_overlay
+
+
+@dataclass
+class SlideshowParams:
+    slide_time: int = 5
+    time_limit: int = 595
+    outro_duration: int = 14
+    template_folder: str = 'TEMPLATE'
+    title: str = 'Model Name'
+    title_fontsize: int = 90
+    title_fontfile: str = 'Montserrat-SemiBold.otf'
+    title_fontcolor: str = 'random'
+    start_delay: int = 21
+    title_appearance_delay: int = 1
+    title_visible_time: int = 5
+    title_y_offset: int = -35
+    title_x_offset: int = 110
+    vo_delay: int = 5
+    watermark: str = 'Today is a\\n Plus Day'
+    watermark_font: str = 'Nexa Bold.otf'
+    watermark_type: str = 'random'
+    watermark_speed: int = 50
+    depthflow: bool = False
+    video_orientation: str = 'vertical'
+    chromakey_color: str = '65db41'
+    chromakey_similarity: float = 0.18
+    chromakey_blend: float = 0
+    generate_srt: bool = False
+    subtitle_max_width: int = 21
+    whisper_model: str = ''
+    whisper_compute_type: str = ''
+    smart_render: bool = False
+    variants_file: str = ''
+    root_folder: str = 'INPUT/RESULT'
+    artifact_policy: str = ''
+
+
+# Length of each crossfade between slides, in seconds
+XFADE_DURATION = 0.5
+
+
+def slideshow_duration(slides, slide_time, outro_length):
+    """Length of the rendered slideshow: the last crossfade starts at (slides - 1) * slide_time - XFADE_DURATION
+    and the outro (the last of the slides) plays in full from there"""
+    if slides < 2:
+        return outro_length
+    return (slides - 1) * slide_time - XFADE_DURATION + outro_length
+
+
+def output_size(video_orientation, template_folder):
+    """Target width, height and the outro video for an orientation"""
+    template_folder = template_folder + '/'
+    # Set target height and width
+    if video_orientation == 'vertical':
+        return 1080, 1920, template_folder + 'outro_vertical.mp4'
+    else:
+        return 1920, 1080, template_folder + 'outro_horizontal.mp4'
 
-# print os path of current folder
-print(f"******* Current folder path: {os.path.abspath(os.getcwd())}")
 
-
-def create_slideshow(folder_path):
-    # Function to create the slideshow
+def slideshow_timeline(folder_path, params: SlideshowParams):
+    """Media of the slideshow (outro last) and its rendered duration in seconds, None without an outro video"""
+    slide_time = params.slide_time
+    _, _, outro_video_path = output_size(params.video_orientation, params.template_folder)
 
     # Get the list of image and video files in the folder
     print(f"+++++ Processing folder: {folder_path}")
@@ -85,20 +86,24 @@ def create_slideshow(folder_path):
     
     # if depthflow is equal 1 - remove all images from list image_path
     
-    if args.depthflow == '1':
+    if params.depthflow:
         image_paths = []
         print(f"***** Not using JPG files, using DepthFlow. {folder_path}")
 
     
     video_paths = [f for f in os.listdir(folder_path) if f.endswith('.mp4')]
 
+    # Parallax clips are intermediates, rendered into the folder's scratch folder when it has one
+    scratch_folder = scratch.folder(folder_path)
+    if scratch_folder != folder_path:
+        video_paths += [os.path.join(scratch_folder, f) for f in os.listdir(scratch_folder) if f.endswith('_df.mp4')]
 
     # Sort the image and video paths alphabetically
-    merged_paths = sorted(image_paths + video_paths, key=lambda x: x.lower())
+    merged_paths = sorted(image_paths + video_paths, key=lambda x: os.path.basename(x).lower())
     merged_paths_orig = merged_paths
 
     # limit number of values in "merged_paths"
-    limit = int(args.time_limit/args.slide_time - 3)
+    limit = int(params.time_limit/params.slide_time - 3)
     merged_paths = merged_paths[:limit]
 
 
@@ -110,7 +115,7 @@ def create_slideshow(folder_path):
     # Add outro.mp4 to the end of the list
     if not os.path.isfile(outro_video_path):
         print(f"***** Error: Outro video file does not exist at {outro_video_path}. Skipping slideshow creation.")
-        return
+        return None
     else:
         merged_paths.append(os.path.abspath(outro_video_path))
         print(merged_paths)
@@ -120,6 +125,19 @@ def create_slideshow(folder_path):
         print(f"***** No JPG files found in {folder_path}")
         # return
 
+    # The audio mix starts before the render, so the duration comes from the same offsets as the xfade chain
+    outro_length = probe_outro_length(params.template_folder, params.video_orientation)
+    duration = slideshow_duration(len(merged_paths), slide_time, outro_length)
+    print(f"***** Number of values in merged_paths: {len(merged_paths)}, {slide_time} seconds per image, {outro_length} seconds for outro.mp4")
+    print(f"***** Duration: {duration} seconds")
+    return merged_paths, duration
+
+
+def render_slideshow(folder_path, params: SlideshowParams, merged_paths, duration):
+    """Encode slideshow.mp4 from the timeline, raises CalledProcessError when ffmpeg fails"""
+    slide_time = params.slide_time
+    target_width, target_height, _ = output_size(params.video_orientation, params.template_folder)
+
     # Set target height and width
     # target_height = 1920
     # target_width = 1080
@@ -128,15 +146,15 @@ def create_slideshow(folder_path):
     fps = 25
 
     # Set watermark text and opacity
-    watermark_text = args.watermark
-    watermark_type = args.watermark_type
+    watermark_text = params.watermark.replace('\\n', '\n')
+    watermark_type = params.watermark_type
 
     watermark_opacity = 0.7
-    wmTimer = args.watermark_speed # 50 - every half-slide move watermark
+    wmTimer = params.watermark_speed # 50 - every half-slide move watermark
  
     # Set font file and font size
     # Try to find the font in the fonts directory
-    watermark_font_path = os.path.join('fonts', args.watermark_font)
+    watermark_font_path = os.path.join('fonts', params.watermark_font)
     if os.path.exists(watermark_font_path):
         watermark_fontfile = os.path.abspath(watermark_font_path)
     else:
@@ -148,7 +166,7 @@ def create_slideshow(folder_path):
         else:
             # Last resort: try to find Nexa font in the system
             try:
-                watermark_fontfile = subprocess.run(['fc-list', ':family', 'Nexa'], check=True, capture_output=True).stdout.decode().strip().split(':')[0]
+                watermark_fontfile = tracing.run(['fc-list', ':family', 'Nexa'], check=True, capture_output=True).stdout.decode().strip().split(':')[0]
             except:
                 print("***** Error: Could not find any font. Using default system font.")
                 watermark_fontfile = ""
@@ -175,6 +193,9 @@ def create_slideshow(folder_path):
         if media_path.endswith('.mp4'):
             if "outro.mp4" in media_path.lower():
                 filter_arg += f'[{j}]settb=AVTB,setpts=PTS-STARTPTS,fps={fps}/1,setsar=1:1[z{j}];'
+            elif media_path.endswith('_df.mp4'):
+                # Parallax clips may be rendered below output size (depth.py --rs), upscale them with lanczos
+                filter_arg += f'[{j}]settb=AVTB,setpts=PTS-STARTPTS,fps={fps}/1,scale={target_width}:{target_height}:flags=lanczos,setsar=1:1[z{j}];'
             else:
                 filter_arg += f'[{j}]settb=AVTB,setpts=PTS-STARTPTS,fps={fps}/1,scale={target_width}:{target_height},setsar=1:1[z{j}];'
 
@@ -185,26 +206,26 @@ def create_slideshow(folder_path):
         transition_type = random.choice(['hblur', 'smoothup', 'horzopen', 'circleopen', 'diagtr', 'diagbl'])
      
         # Calculate offset for transitions
-        offset = (i+1) * slide_time - 0.5
+        offset = (i+1) * slide_time - XFADE_DURATION
 
         if i == 0:
             # Crossfade effect between the first two images
    
-            filter_arg += f'[z{i}][z{i + 1}]xfade=transition={transition_type}:duration=0.5:offset={offset}[f{i}];'
+            filter_arg += f'[z{i}][z{i + 1}]xfade=transition={transition_type}:duration={XFADE_DURATION}:offset={offset}[f{i}];'
      
         
         elif i == len(merged_paths[:-1]) - 1:
             
             # No chaining for last image in sequence - no semicolon in the end!!!
             
-            filter_arg += f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration=0.5:offset={offset}'
+            filter_arg += f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration={XFADE_DURATION}:offset={offset}'
 
         else:
             # Crossfade effect between intermediate media and watermark
             if watermark_type == 'ccw':
 
                 filter_arg += (
-                    f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration=0.5:offset={offset},'
+                    f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration={XFADE_DURATION}:offset={offset},'
                     f'drawtext=text=\'{watermark_text}\':'
                     f'x=\'if(lt(mod(n/{wmTimer},4),1),15+mod(n/{wmTimer},1)*(w-text_w-30),if(lt(mod(n/{wmTimer},4),2),w-text_w-15,if(lt(mod(n/{wmTimer},4),3),w-text_w-15-(mod(n/{wmTimer},1)*(w-text_w-30)),15)))\':\
                     y=\'if(lt(mod(n/{wmTimer},4),1),15,if(lt(mod(n/{wmTimer},4),2),15+mod(n/{wmTimer},1)*(h-text_h-30),if(lt(mod(n/{wmTimer},4),3),h-text_h-15,h-text_h-15-(mod(n/{wmTimer},1)*(h-text_h-30)))))\':\
@@ -213,7 +234,7 @@ def create_slideshow(folder_path):
             
             elif watermark_type == 'random':
 
-                filter_arg += f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration=0.5:offset={offset},drawtext=text=\'{watermark_text}\':x=if(eq(mod(n\,{wmTimer})\,0)\,random(1)*w\,x):y=if(eq(mod(n\,{wmTimer})\,0)\,random(1)*h\,y):fontfile={watermark_fontfile}:fontsize={watermark_fontsize}:fontcolor_expr=random@{watermark_opacity}[f{i}];'
+                filter_arg += f'[f{i-1}][z{i + 1}]xfade=transition={transition_type}:duration={XFADE_DURATION}:offset={offset},drawtext=text=\'{watermark_text}\':x=if(eq(mod(n\,{wmTimer})\,0)\,random(1)*w\,x):y=if(eq(mod(n\,{wmTimer})\,0)\,random(1)*h\,y):fontfile={watermark_fontfile}:fontsize={watermark_fontsize}:fontcolor_expr=random@{watermark_opacity}[f{i}];'
 
             
 
@@ -251,87 +272,222 @@ def create_slideshow(folder_path):
             else:
                 print(f"Skipping file {file_path} with unsupported extension")
 
+    max_frames = math.ceil(duration * fps)  #  25 frames per second, limits the last image looping infinitely
+
+    command.extend(['-filter_complex', filter_arg, '-pix_fmt', 'yuv420p', '-color_range', 'jpeg', '-vcodec', 'libx264', '-frames:v', str(max_frames), '-b:v', '2000k', scratch.path(folder_path, 'slideshow.mp4')])
+
+    print(f"##### Creating slideshow")
+    tracing.run(command, check=True, report_progress=True)
+    # print("FFMPEG: ", command, "\n\n")
+
+    print(f"+++++ Slideshow saved: {scratch.path(folder_path, 'slideshow.mp4')}")
+
+
+def audio_params(folder_path, params: SlideshowParams) -> AudioParams:
+    return AudioParams(
+        path=folder_path,
+        outro_duration=params.outro_duration,
+        vo_delay=params.vo_delay,
+        generate_srt=params.generate_srt,
+        subtitle_max_width=params.subtitle_max_width,
+        whisper_model=params.whisper_model,
+        whisper_compute_type=params.whisper_compute_type,
+    )
+
+
+def subscribe_params(folder_path, params: SlideshowParams) -> SubscribeParams:
+    return SubscribeParams(
+        input_dir=folder_path,
+        template_folder=params.template_folder,
+        title=params.title,
+        title_fontfile=params.title_fontfile,
+        title_fontcolor=params.title_fontcolor,
+        title_fontsize=params.title_fontsize,
+        start_delay=params.start_delay,
+        title_appearance_delay=params.title_appearance_delay,
+        title_visible_time=params.title_visible_time,
+        title_x_offset=params.title_x_offset,
+        title_y_offset=params.title_y_offset,
+        orientation=params.video_orientation,
+        chromakey_color=params.chromakey_color,
+        chromakey_similarity=params.chromakey_similarity,
+        chromakey_blend=params.chromakey_blend,
+        generate_srt=params.generate_srt,
+        smart_render=params.smart_render,
+        variants_file=params.variants_file,
+    )
+
+
+def traced_mix_audio(params: AudioParams, duration):
+    with tracing.span('audio mix', folder=params.path):
+        return mix_audio(params, duration)
+
+
+def create_slideshow(folder_path, params: SlideshowParams):
+    # Function to create the slideshow
+    timeline = slideshow_timeline(folder_path, params)
+    if timeline is None:
+        return
+    merged_paths, duration = timeline
 
-    max_duration = len(merged_paths) * slide_time + (args.outro_duration - slide_time) # 5 seconds for every image: maximum duration in seconds to limit infinite loop adding last image infinitely; +(14 - slide_time) is for outro.mp4, it's 14 seconds long
-    print(f"***** Number of values in merged_paths: {len(merged_paths)}, {slide_time} seconds per image, {args.outro_duration} seconds for outro.mp4")
-    print(f"***** Max duration: {max_duration} seconds")
-
-    max_frames = max_duration * fps  #  25 frames per second
-
-    command.extend(['-filter_complex', filter_arg, '-pix_fmt', 'yuv420p', '-color_range', 'jpeg', '-vcodec', 'libx264', '-frames:v', str(max_frames), '-b:v', '2000k', os.path.join(folder_path, 'slideshow.mp4')])
+    folder_audio = audio_params(folder_path, params)
+    actions = artifacts.policy(params.artifact_policy)
 
     try:
-        print(f"##### Creating slideshow")
-
-        subprocess.run(command, check=True)
-        # print("FFMPEG: ", command, "\n\n")
-
-        print(f"+++++ Slideshow saved: {folder_path}/slideshow.mp4")
-
+        # Mix audio in parallel with the video render: the duration is already known from the timeline
+        print(f"##### Mixing audio ({duration} seconds) while rendering slideshow")
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio") as audio_executor:
+            audio_mix = audio_executor.submit(traced_mix_audio, folder_audio, duration)
+
+            # Leaving the with block waits for the audio mix, it never runs on its own
+            with tracing.span('slideshow encode', folder=folder_path):
+                render_slideshow(folder_path, params, merged_paths, duration)
+        artifacts.record(folder_path, 'slideshow', actions)
+
+        if audio_mix.result() is None:
+            print("***** Error mixing audio")
+            artifacts.record(folder_path, 'audio', actions, ok=False)
+            return
+        artifacts.record(folder_path, 'audio', actions)
 
         # Add audio
         print(f"##### Adding audio")
-        
-        audio_script = 'audio.py' 
-        audio_args = [
-            '--i', folder_path, 
-            '--od', str(args.outro_duration),
-            '--vd', str(args.vo_delay),
-            '--srt', args.generate_srt,
-            '--smaxw', str(args.subtitle_max_width),
-        ]
-        audio_command = ['python3', audio_script]  + audio_args
-        subprocess.run(audio_command, check=True)
+
+        folder_audio.step = 'mux'
+        with tracing.span('audio mux', folder=folder_path):
+            muxed = process_audio(folder_audio)
+        artifacts.record(folder_path, 'mux', actions, ok=muxed)
+        if not muxed:
+            return
 
         
         # Add subscribe overlay
         print(f"##### Adding name, watermark, subscribe overlay")
 
-        
-        subscribe_script = 'subscribe.py' 
-        subscribe_args = [
-            '--i', folder_path, 
-            '--tpl', args.template_folder,
-            
-            '--t', f'"{args.title}"', 
-            '--tf', args.title_fontfile,
-            '--tfc', args.title_fontcolor, 
-            '--tfs', str(args.title_fontsize), 
-            '--osd', str(args.start_delay),
-            '--tad', str(args.title_appearance_delay),
-            '--tvt', str(args.title_visible_time),
-            '--txo', str(args.title_x_offset),
-            '--tyo', str(args.title_y_offset),
-
-            '--o', str(args.video_orientation),
-            '--chr', args.chromakey_color,
-            '--cs', str(args.chromakey_similarity),
-            '--cb', str(args.chromakey_blend),
-
-            '--srt', args.generate_srt,
-
-        ]
-        
-        subscribe_command = ['python3', subscribe_script]  + subscribe_args
-        subprocess.run(subscribe_command, check=True)
+        with tracing.span('subscribe', folder=folder_path):
+            outputs = add_overlay(subscribe_params(folder_path, params))
 
         print(f"+++++ Subscribe overlay added.")
+        # Intermediates are only dropped once every final video is written
+        finished = all(os.path.isfile(output) for output in outputs)
+        if finished:
+            scratch.release(folder_path)
+        artifacts.record(folder_path, 'subscribe', actions, outputs, ok=finished)
 
     except subprocess.CalledProcessError as error:
         # print("***** Error executing FFmpeg command:", error) 
         print("***** Error executing FFmpeg command")
-
-# Traverse all inner folders
-root_folder = 'INPUT/RESULT'
-
-for folder_name in os.listdir(root_folder):
-    folder_path = os.path.join(root_folder, folder_name)
-
-    # if there is slideshow.mp4 file, skip it
-    if os.path.isfile(os.path.join(folder_path, 'slideshow.mp4')):
-        print(f"----- Slideshow already exists in {folder_path}")
-        continue
-    elif os.path.isdir(folder_path):
-        create_slideshow(folder_path)
-
-print(f"Slideshow creation complete: {time.time() - start_time:.2f} seconds.")
+        artifacts.record(folder_path, 'slideshow', actions, ok=False)
+
+def create_slideshows(params: SlideshowParams):
+    """Slideshow, audio and overlay for every RESULT folder that is not finished yet"""
+    # Start timing the entire process
+    start_time = time.time()
+
+    _, _, outro_video_path = output_size(params.video_orientation, params.template_folder)
+    print(f"******* Using outro video path: {outro_video_path}")  # Print the full path
+
+    # print os path of current folder
+    print(f"******* Current folder path: {os.path.abspath(os.getcwd())}")
+
+    # Traverse all inner folders
+    root_folder = params.root_folder
+
+    for folder_name in os.listdir(root_folder):
+        folder_path = os.path.join(root_folder, folder_name)
+
+        # if there is slideshow.mp4 file, skip it (a released scratch folder held one,
+        # the artifact policy may have deleted it after the mux or the finished folder)
+        if os.path.isdir(folder_path) and (
+            scratch.find(folder_path, 'slideshow.mp4') or scratch.find(folder_path, 'slideshow_with_audio.mp4')
+            or scratch.released(folder_path) or artifacts.finished(folder_path)
+        ):
+            print(f"----- Slideshow already exists in {folder_path}")
+            continue
+        elif os.path.isdir(folder_path):
+            with tracing.span('slideshow', folder=folder_path):
+                create_slideshow(folder_path, params)
+
+    print(f"Slideshow creation complete: {time.time() - start_time:.2f} seconds.")
+
+
+if __name__ == "__main__":
+    # Create an ArgumentParser to handle command-line arguments
+    parser = argparse.ArgumentParser(description="Create slideshow.")
+    parser.add_argument('--sd', type=int, default=5, dest='slide_time', help='Frame duration (in seconds)')
+    parser.add_argument('--tl', type=int, default=595, dest='time_limit', help='Duration of clip')
+    parser.add_argument('--od', type=int, default=14, dest='outro_duration', help='Outro duration (in seconds)')
+
+    parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
+
+
+    parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
+    parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Title font size')
+    parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file name')
+    parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
+    parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before title+subscribe overlay appears (in seconds)')
+    parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
+    parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
+    parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
+    parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
+
+    parser.add_argument('--vd', type=int, default=5, dest='vo_delay', help='Voiceover start delay (in seconds)')
+
+
+    parser.add_argument('--w', type=str, default='Today is a\\n Plus Day', dest='watermark', help='Watermark text')
+    parser.add_argument('--wf', type=str, default='Nexa Bold.otf', dest='watermark_font', help='Font file name')
+    parser.add_argument('--wt', type=str, default='random', dest='watermark_type', help='Watermark type: ccw, random')
+    parser.add_argument('--ws', type=int, default=50, dest='watermark_speed', help='Watermark speed (in frames: 25 = 1s)')
+
+
+    parser.add_argument('--z', type=str, default='0', dest='depthflow', help='Use DepthFlow for images? 1/0')
+    parser.add_argument('--o', type=str, default='vertical', dest='video_orientation', help='Video orientation (vertical|horizontal)')
+
+    parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
+    parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
+    parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
+
+    parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Generate .srt subtitles? 0/1')
+    parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
+    parser.add_argument('--model', type=str, default='', dest='whisper_model', help='Whisper model size for subtitles (default: $WHISPER_MODEL, base)')
+    parser.add_argument('--ct', type=str, default='', dest='whisper_compute_type', help='Whisper CPU compute type: int8, int8_float32, float32 (default: $WHISPER_COMPUTE_TYPE, float32)')
+    parser.add_argument('--smart', type=str, default='0', dest='smart_render', help='Smart-render the subscribe overlay window only? 0/1')
+    parser.add_argument('--variants', type=str, default='', dest='variants_file', help='JSON list of title variants rendered from one base video')
+    parser.add_argument('--artifacts', type=str, default=os.getenv('ARTIFACT_POLICY', ''), dest='artifact_policy', help='Intermediates to delete or compress once used, e.g. "mixed=compress,source=delete" ("keep" for none, see artifacts.py)')
+
+
+    # Parse the command-line arguments
+    args = parser.parse_args()
+
+    create_slideshows(SlideshowParams(
+        slide_time=args.slide_time,
+        time_limit=args.time_limit,
+        outro_duration=args.outro_duration,
+        template_folder=args.template_folder,
+        title=args.title,
+        title_fontsize=args.title_fontsize,
+        title_fontfile=args.title_fontfile,
+        title_fontcolor=args.title_fontcolor,
+        start_delay=args.start_delay,
+        title_appearance_delay=args.title_appearance_delay,
+        title_visible_time=args.title_visible_time,
+        title_y_offset=args.title_y_offset,
+        title_x_offset=args.title_x_offset,
+        vo_delay=args.vo_delay,
+        watermark=args.watermark,
+        watermark_font=args.watermark_font,
+        watermark_type=args.watermark_type,
+        watermark_speed=args.watermark_speed,
+        depthflow=args.depthflow == '1',
+        video_orientation=args.video_orientation,
+        chromakey_color=args.chromakey_color,
+        chromakey_similarity=args.chromakey_similarity,
+        chromakey_blend=args.chromakey_blend,
+        generate_srt=args.generate_srt == '1',
+        subtitle_max_width=args.subtitle_max_width,
+        whisper_model=args.whisper_model,
+        whisper_compute_type=args.whisper_compute_type,
+        smart_render=args.smart_render == '1',
+        variants_file=args.variants_file,
+        artifact_policy=args.artifact_policy,
+    ))
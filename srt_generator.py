@@ -1,14 +1,38 @@
 import os
+import json
+import time
 import argparse
-import whisperx
 import certifi
 from mutagen.mp3 import MP3
 
+import governor
+import scratch
+from cache_utils import cache_path, file_hash, params_hash, partial_path, publish
+from model_service import request
+
 # Set up SSL for HTTPS requests
 os.environ["SSL_CERT_FILE"] = certifi.where()
-# Set number of threads for math libraries
-os.environ["OMP_NUM_THREADS"] = "6"
-os.environ["MKL_NUM_THREADS"] = "6"
+def default_threads():
+    """CPUs this process may run on (respects taskset/cgroup affinity), overridable with WHISPER_THREADS."""
+    if os.getenv("WHISPER_THREADS"):
+        return int(os.getenv("WHISPER_THREADS"))
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def set_threads(threads):
+    """Set the math library thread counts of this process, before whisperx/torch are imported to take full effect.
+
+    Only for processes that transcribe on their own (the CLI, the benchmark): the environment and
+    torch's pool are process-wide, a pipeline run sizes each model through governor.threads() instead.
+    """
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    global THREADS
+    THREADS = threads
+
+# Default number of threads for math libraries, applied by the command line with set_threads()
+THREADS = default_threads()
 
 def get_audio_duration(file_path):
     """Determine the duration of an MP3 file using mutagen."""
@@ -27,15 +51,89 @@ def format_time(seconds):
     millis = int((secs - int(secs)) * 1000)
     return f"{hours:02}:{minutes:02}:{int(secs):02},{millis:03}"
 
-def transcribe_with_whisperx(audio_path, language="en", model_name="base", device="cpu"):
-    """Transcribe and perform forced alignment with WhisperX."""
-    print(f"Running WhisperX for file: {audio_path}")
-    # Load Whisper model with float32 compute type for stability
-    model = whisperx.load_model(model_name, device=device, language=language, compute_type="float32")
+# CTranslate2 compute types for CPU: float32 is the most stable, int8 variants are faster
+COMPUTE_TYPES = ("int8", "int8_float32", "float32")
+# Per-deployment defaults, also settable with --model / --ct
+MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "float32")
+
+
+def whisper_settings(model_name=None, compute_type=None):
+    """(model, compute type) with the defaults filled in, raises ValueError for a compute type CTranslate2 can't run on CPU"""
+    model_name, compute_type = model_name or MODEL_NAME, compute_type or COMPUTE_TYPE
+    if compute_type not in COMPUTE_TYPES:
+        raise ValueError(f"Unknown Whisper compute type {compute_type!r}, use one of {', '.join(COMPUTE_TYPES)}")
+    return model_name, compute_type
+
+# Loaded models, kept for the life of the process (one run here, many in model_service.py)
+_asr_models = {}
+_align_models = {}
+
+def load_models(language="en", model_name=MODEL_NAME, device="cpu", compute_type=COMPUTE_TYPE):
+    """Load (once) the WhisperX ASR model and the alignment model for a language."""
+    import torch
+    import whisperx
+
+    # A scheduled transcribe task gets its share of the CPUs, a run of its own all of them.
+    # torch's pool is process-wide: concurrent model stages share the size the last of them set
+    threads = governor.threads() or THREADS
+    torch.set_num_threads(threads)
+
+    # CTranslate2 fixes its threads when the model loads, so a different budget gets its own model
+    asr_key = (model_name, device, language, compute_type, threads)
+    if asr_key not in _asr_models:
+        print(f"Loading WhisperX model: {model_name} ({device}, {compute_type})")
+        _asr_models[asr_key] = whisperx.load_model(model_name, device=device, language=language, compute_type=compute_type, threads=threads)
+    align_key = (language, device)
+    if align_key not in _align_models:
+        print(f"Loading alignment model: {language} ({device})")
+        _align_models[align_key] = whisperx.load_align_model(language_code=language, device=device)
+    return _asr_models[asr_key], _align_models[align_key]
+
+def transcribe_in_process(audio_path, language="en", model_name=MODEL_NAME, device="cpu", compute_type=COMPUTE_TYPE):
+    """Transcribe and perform forced alignment with models loaded in this process."""
+    import whisperx
+
+    model, (alignment_model, metadata) = load_models(language, model_name, device, compute_type)
     result = model.transcribe(audio_path)
-    # Load model for forced alignment
-    alignment_model, metadata = whisperx.load_align_model(language_code=language, device=device)
-    aligned_result = whisperx.align(result["segments"], alignment_model, metadata, audio_path, device)
+    return whisperx.align(result["segments"], alignment_model, metadata, audio_path, device)
+
+def transcribe_with_whisperx(audio_path, language="en", model_name=MODEL_NAME, device="cpu", compute_type=COMPUTE_TYPE):
+    """Transcribe and perform forced alignment with WhisperX, on the model service when it is running."""
+    print(f"Running WhisperX for file: {audio_path} ({model_name}, {compute_type})")
+    aligned_result = request('transcribe', audio_path=os.path.abspath(audio_path), language=language, model_name=model_name, device=device, compute_type=compute_type)
+    if aligned_result is not None:
+        print("Transcribed by the model service")
+        return aligned_result
+    return transcribe_in_process(audio_path, language, model_name, device, compute_type)
+
+def transcript_cache_path(audio_path, cache_folder, language="en", model_name=MODEL_NAME, compute_type=COMPUTE_TYPE):
+    """Cached aligned result of a voiceover, keyed by its content and the transcription settings."""
+    key = params_hash(
+        audio=file_hash(audio_path),
+        model=model_name,
+        language=language,
+        compute_type=compute_type,
+    )
+    return cache_path(cache_folder, 'transcript', key, '.json')
+
+def transcribe_cached(audio_path, cache_folder="CACHE", language="en", model_name=MODEL_NAME, device="cpu", compute_type=COMPUTE_TYPE):
+    """Word-level aligned result from the transcript cache, transcribed and stored on a miss."""
+    cached_path = transcript_cache_path(audio_path, cache_folder, language, model_name, compute_type)
+    if os.path.exists(cached_path):
+        print(f"Using cached transcript: {cached_path}")
+        with open(cached_path, encoding="utf-8") as f_in:
+            return json.load(f_in)
+
+    aligned_result = transcribe_with_whisperx(audio_path, language, model_name, device, compute_type)
+
+    # Only the words are needed to rebuild the SRT at any width
+    words = {"segments": [{"words": seg["words"]} for seg in aligned_result["segments"]]}
+    # A concurrent transcription of the same voiceover writes its own temp file
+    partial = partial_path(cached_path)
+    with open(partial, "w", encoding="utf-8") as f_out:
+        json.dump(words, f_out, default=float)
+    publish(partial, cached_path)
     return aligned_result
 
 def whisperx_result_to_srt(aligned_result, max_width=21):
@@ -82,15 +180,34 @@ def whisperx_result_to_srt(aligned_result, max_width=21):
     
     return "\n".join(srt_lines)
 
-def generate_srt(directory, generate_srt=False, max_width=21):
+def write_srt(voiceover_path, srt_output_path, max_width=21, cache_folder="CACHE", model_name=None, compute_type=None):
+    """Transcribe one voiceover and save its SRT file, returns the seconds spent."""
+    start = time.perf_counter()
+    print(f"Transcribing audio file: {voiceover_path}")
+    model_name, compute_type = whisper_settings(model_name, compute_type)
+
+    # Transcribe the audio (or reuse the cached transcript of the same voiceover)
+    aligned_result = transcribe_cached(voiceover_path, cache_folder, model_name=model_name, compute_type=compute_type)
+
+    # Convert to SRT format
+    srt_text = whisperx_result_to_srt(aligned_result, max_width)
+
+    # Save the SRT file
+    with open(srt_output_path, "w", encoding="utf-8") as f_out:
+        f_out.write(srt_text)
+
+    print(f"Subtitles saved to: {srt_output_path}")
+    return time.perf_counter() - start
+
+def generate_srt(directory, generate_srt=False, max_width=21, cache_folder="CACHE", model_name=None, compute_type=None):
     """Generate SRT subtitles for the adjusted_voiceover.mp3 file."""
     if not generate_srt:
         return
     
     print("###### GENERATING SUBTITLES ######")
     
-    # Find the adjusted_voiceover.mp3 file in the directory
-    voiceover_path = os.path.join(directory, 'adjusted_voiceover.mp3')
+    # Find the adjusted_voiceover.mp3 file in the directory (or its scratch folder)
+    voiceover_path = scratch.find(directory, 'adjusted_voiceover.mp3') or os.path.join(directory, 'adjusted_voiceover.mp3')
     
     if os.path.exists(voiceover_path):
         try:
@@ -106,30 +223,71 @@ def generate_srt(directory, generate_srt=False, max_width=21):
                 print(f"Subtitles already exist at {srt_output_path}. Skipping.")
                 return
             
-            print(f"Transcribing audio file: {voiceover_path}")
-            
-            # Transcribe the audio
-            aligned_result = transcribe_with_whisperx(voiceover_path)
-            
-            # Convert to SRT format
-            srt_text = whisperx_result_to_srt(aligned_result, max_width)
-            
-            # Save the SRT file
-            with open(srt_output_path, "w", encoding="utf-8") as f_out:
-                f_out.write(srt_text)
-            
-            print(f"Subtitles saved to: {srt_output_path}")
+            write_srt(voiceover_path, srt_output_path, max_width, cache_folder, model_name, compute_type)
         except Exception as e:
             print(f"Error generating subtitles: {e}")
     else:
         print(f"Voiceover file not found at {voiceover_path}")
 
+def pending_folders(root):
+    """RESULT folders with an adjusted voiceover and no subtitles yet."""
+    folders = []
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        voiceover_path = scratch.find(entry.path, 'adjusted_voiceover.mp3')
+        srt_output_path = os.path.join(entry.path, 'subs', 'voiceover.srt')
+        if voiceover_path and not os.path.exists(srt_output_path):
+            folders.append(entry.path)
+    return folders
+
+def generate_srt_batch(root, max_width=21, cache_folder="CACHE"):
+    """Transcribe every pending folder under root in one model session, with per-file timings."""
+    folders = pending_folders(root)
+    print(f"###### GENERATING SUBTITLES FOR {len(folders)} FOLDERS ({THREADS} threads) ######")
+
+    timings = []
+    for directory in folders:
+        voiceover_path = scratch.find(directory, 'adjusted_voiceover.mp3')
+        subs_dir = os.path.join(directory, 'subs')
+        os.makedirs(subs_dir, exist_ok=True)
+        try:
+            elapsed = write_srt(voiceover_path, os.path.join(subs_dir, 'voiceover.srt'), max_width, cache_folder)
+        except Exception as e:
+            print(f"Error generating subtitles for {directory}: {e}")
+            continue
+        duration = get_audio_duration(voiceover_path)
+        timings.append((directory, duration, elapsed))
+        print(f"----- {os.path.basename(directory)}: {elapsed:.2f}s for {duration:.1f}s of audio")
+
+    # The first file also pays for loading the models, the rest only for inference
+    for directory, duration, elapsed in timings:
+        rtf = elapsed / duration if duration else 0
+        print(f"{os.path.basename(directory):<24}{duration:>8.1f}s audio{elapsed:>8.2f}s  RTF {rtf:.3f}")
+    print(f"+++++ Subtitles: {len(timings)} done, {len(folders) - len(timings)} failed")
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Generate SRT subtitles from an audio file.")
-    parser.add_argument('--i', type=str, required=True, dest='directory', help='Directory containing the adjusted_voiceover.mp3 file')
+    parser.add_argument('--i', type=str, dest='directory', help='Directory containing the adjusted_voiceover.mp3 file')
+    parser.add_argument('--batch', type=str, default=None, dest='batch_root', help='Transcribe every RESULT folder under this root that has no subtitles yet')
+    parser.add_argument('--threads', type=int, default=THREADS, dest='threads', help='CPU threads for WhisperX and math libraries (default: available CPUs)')
     parser.add_argument('--srt', type=str, default='1', dest='generate_srt', help='Generate SRT subtitles? 0/1')
     parser.add_argument('--smaxw', type=int, default=21, dest='subtitle_max_width', help='Maximum characters in one line of subtitles')
+    parser.add_argument('--cache', type=str, default='CACHE', dest='cache_folder', help='Cache folder for word-level transcripts')
+    parser.add_argument('--model', type=str, default=MODEL_NAME, dest='model_name', help='Whisper model size: tiny, base, small, medium, large-v3 (env WHISPER_MODEL)')
+    parser.add_argument('--ct', type=str, default=COMPUTE_TYPE, dest='compute_type', help=f"CPU compute type: {', '.join(COMPUTE_TYPES)} (env WHISPER_COMPUTE_TYPE)")
     
     args = parser.parse_args()
-    
-    generate_srt(args.directory, args.generate_srt == '1', args.subtitle_max_width)
+    set_threads(args.threads)
+    try:
+        # The default comes from the environment, argparse choices would not check it
+        MODEL_NAME, COMPUTE_TYPE = whisper_settings(args.model_name, args.compute_type)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if args.batch_root:
+        generate_srt_batch(args.batch_root, args.subtitle_max_width, args.cache_folder)
+    elif args.directory:
+        generate_srt(args.directory, args.generate_srt == '1', args.subtitle_max_width, args.cache_folder)
+    else:
+        parser.error("either --i or --batch is required")
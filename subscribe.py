@@ -1,114 +1,474 @@
 import subprocess
 import os
+import shutil
 import random
 import argparse
 import time
 import json
+from dataclasses import dataclass
+from typing import List
 
-# Start timing the entire process
-start_time = time.time()
-
-# Argument parsing
-parser = argparse.ArgumentParser(description="Create slideshow with overlay.")
-
-parser.add_argument('--i', dest='input_dir', required=True, help='Path to the directory containing input files')
-parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
-
-
-parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
-parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file for title text')
-parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Title font size')
-parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
-parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before overlay appears (in seconds)')
-parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
-parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
-parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
-parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
-
-
-
-parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
-parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
-parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
-
-parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Add SRT subtitles? 0/1')
-
-parser.add_argument('--o', type=str, default='vertical', dest='orientation', help='Orientation (vertical or horizontal).')
-
-args = parser.parse_args()
-
-video_orientation = args.orientation
-input_dir = args.input_dir
-input_video = os.path.join(input_dir, 'slideshow_with_audio.mp4')
-template_folder = args.template_folder + '/'
-
-if video_orientation == 'vertical':
-    overlay_video = template_folder + 'name_subscribe_like.mp4'
-else:
-    overlay_video = template_folder + 'name_subscribe_like_horizontal.mp4'
-
-title = args.title.strip('"')
-output_video = os.path.join(input_dir, f"{title.replace(' ', '_')}.mp4")
-chromakey_color = args.chromakey_color
-chromakey_similarity = args.chromakey_similarity
-chromakey_blend = args.chromakey_blend
-delay = args.start_delay  # Start time for the overlay (in seconds)
-print(f"Start delay: {delay} seconds")
-
-# Handle font color selection
-if args.title_fontcolor == 'random':
-    fontcolor = random.choice(['FF00B4', 'ff6600', '0b4178'])
-else:
-    fontcolor = args.title_fontcolor
-
-fontsize = args.title_fontsize
-
-# Get font file path
-# fonts_dir = os.path.join(os.path.dirname(__file__), 'fonts')
-fontfile = os.path.join('fonts', args.title_fontfile) if os.path.exists(os.path.join('fonts', args.title_fontfile)) else '/Users/a/Library/Fonts/Montserrat-SemiBold.otf'
-
-# Get overlay video duration using ffprobe
-try:
-    cmd = f"ffprobe -v error -show_entries format=duration -of json {overlay_video}"
-    result = subprocess.run(cmd, shell=True, capture_output=True, text=True, check=True)
-    json_data = json.loads(result.stdout)
-    overlay_duration = float(json_data['format']['duration'])
-    print(f"Overlay video duration: {overlay_duration} seconds")
-except Exception as e:
-    print(f"Error getting overlay video duration: {e}")
-    overlay_duration = 23  # Fallback to default duration if ffprobe fails
-
-print("Overlaying videos...")
-step_start = time.time()
-
-# Apply overlay and chromakey to the first part
-# Get title appearance parameters
-title_appearance_delay = args.title_appearance_delay
-title_visible_time = args.title_visible_time
-
-# Calculate when title should appear and disappear
-title_start = delay + title_appearance_delay
-title_end = title_start + title_visible_time
-
-# Calculate x and y offset
-title_x_offset = args.title_x_offset
-title_y_offset = args.title_y_offset
-
-overlay_command = [
-    'ffmpeg',
-    '-loglevel', 'error',
-    '-i', input_video,
-    '-i', overlay_video,
-    '-filter_complex', f"[1:a]adelay={delay*1000}|{delay*1000},volume=0.5[a1];[0:a]volume=1.0[a0];[a0][a1]amix=inputs=2:normalize=0[aout];[0:v]setpts=PTS-STARTPTS[v0];[1:v]setpts=PTS-STARTPTS+{delay}/TB,chromakey=color=0x{chromakey_color}:similarity={chromakey_similarity}:blend={chromakey_blend}[ckout];[v0][ckout]overlay=enable='between(t\,{delay},{delay+overlay_duration})',drawtext=text='{title}':x=((w-tw)/2+{title_x_offset}):y=((h/2)+{title_y_offset}):enable='between(t\,{title_start},{title_end})':fontfile={fontfile}:fontsize={fontsize}:fontcolor=0x{fontcolor}:shadowcolor=black:shadowx=4:shadowy=2:alpha=0.8[out]",
-    '-map', '[out]', '-map', '[aout]',
-    '-c:v', 'libx264', '-c:a', 'aac', '-y', output_video
-]
-print(overlay_command)
-subprocess.run(overlay_command)
-
-print(f"Name + Subscribe: {time.time() - step_start:.2f} seconds.")
-
-if args.generate_srt == '1':
+import scratch
+import tracing
+from cache_utils import cache_path, file_hash, params_hash, partial_path, publish
+from title_card import render_title_card
+
+# Frame rate and bitrate of slideshow.mp4, re-used so smart-rendered pieces match the copied ones
+fps = 25
+video_bitrate = '2000k'
+# ffprobe H.264 profile -> libx264 -profile:v
+X264_PROFILES = {'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main', 'High': 'high'}
+
+
+@dataclass
+class SubscribeParams:
+    input_dir: str
+    template_folder: str = 'TEMPLATE'
+    title: str = 'Model Name'
+    title_fontfile: str = 'Montserrat-SemiBold.otf'
+    title_fontsize: int = 90
+    title_fontcolor: str = 'random'
+    start_delay: int = 21
+    title_appearance_delay: int = 1
+    title_visible_time: int = 5
+    title_y_offset: int = -35
+    title_x_offset: int = 110
+    chromakey_color: str = '65db41'
+    chromakey_similarity: float = 0.18
+    chromakey_blend: float = 0
+    prekeyed_overlay: bool = True
+    title_card: bool = True
+    cache_folder: str = 'CACHE'
+    generate_srt: bool = False
+    smart_render: bool = False
+    orientation: str = 'vertical'
+    variants_file: str = ''
+
+
+@dataclass
+class OverlayJob:
+    """One folder's overlay render: the parameters plus the inputs resolved from them"""
+    params: SubscribeParams
+    input_video: str
+    overlay_input: str
+    overlay_keying: str
+    """'' for the pre-keyed overlay, else a chromakey filter prefix"""
+    overlay_duration: float
+    fontfile: str
+
+
+def prekey_overlay(overlay_video, cache_folder, color, similarity, blend):
+    """Render the chromakeyed overlay once into an alpha-capable MOV, cached by template hash and key parameters."""
+    key = params_hash(
+        template=file_hash(overlay_video),
+        color=color.lower(),
+        similarity=similarity,
+        blend=blend,
+    )
+    keyed_video = cache_path(cache_folder, 'overlay', key, '.mov')
+    if os.path.isfile(keyed_video):
+        print(f"+++++ Using cached pre-keyed overlay: {keyed_video}")
+        return keyed_video
+
+    print(f"##### Pre-keying overlay: {overlay_video}")
+    partial_video = partial_path(keyed_video)
+    prekey_command = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', overlay_video,
+        '-vf', f"chromakey=color=0x{color}:similarity={similarity}:blend={blend},format=argb",
+        '-c:v', 'qtrle',  # Lossless RLE keeps the alpha channel
+        '-c:a', 'copy',
+        partial_video
+    ]
+    try:
+        tracing.run(prekey_command, check=True)
+        # Publish atomically so an interrupted render never leaves a broken cache entry,
+        # a job with the same overlay settings may have published it meanwhile
+        publish(partial_video, keyed_video)
+        print(f"+++++ Pre-keyed overlay cached: {keyed_video}")
+        return keyed_video
+    except subprocess.CalledProcessError as error:
+        if os.path.exists(partial_video):
+            os.remove(partial_video)
+        if os.path.isfile(keyed_video):
+            return keyed_video
+        print(f"***** Error pre-keying overlay, falling back to chromakey: {error}")
+        return None
+
+def prepare_job(params: SubscribeParams) -> OverlayJob:
+    """Resolve the template overlay (pre-keyed when enabled), its duration and the title font"""
+    template_folder = params.template_folder + '/'
+
+    if params.orientation == 'vertical':
+        overlay_video = template_folder + 'name_subscribe_like.mp4'
+    else:
+        overlay_video = template_folder + 'name_subscribe_like_horizontal.mp4'
+
+    chromakey_color = params.chromakey_color
+    chromakey_similarity = params.chromakey_similarity
+    chromakey_blend = params.chromakey_blend
+
+    # Get font file path
+    # fonts_dir = os.path.join(os.path.dirname(__file__), 'fonts')
+    fontfile = os.path.join('fonts', params.title_fontfile) if os.path.exists(os.path.join('fonts', params.title_fontfile)) else '/Users/a/Library/Fonts/Montserrat-SemiBold.otf'
+
+    # Get overlay video duration using ffprobe
+    try:
+        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'json', overlay_video]
+        result = tracing.run(cmd, capture_output=True, text=True, check=True)
+        json_data = json.loads(result.stdout)
+        overlay_duration = float(json_data['format']['duration'])
+        print(f"Overlay video duration: {overlay_duration} seconds")
+    except Exception as e:
+        print(f"Error getting overlay video duration: {e}")
+        overlay_duration = 23  # Fallback to default duration if ffprobe fails
+
+    keyed_overlay_video = None
+    if params.prekeyed_overlay:
+        keyed_overlay_video = prekey_overlay(overlay_video, params.cache_folder, chromakey_color, chromakey_similarity, chromakey_blend)
+
+    if keyed_overlay_video:
+        overlay_input = keyed_overlay_video
+        overlay_keying = ''
+    else:
+        overlay_input = overlay_video
+        overlay_keying = f"chromakey=color=0x{chromakey_color}:similarity={chromakey_similarity}:blend={chromakey_blend},"
+
+    return OverlayJob(
+        params=params,
+        input_video=scratch.path(params.input_dir, 'slideshow_with_audio.mp4'),
+        overlay_input=overlay_input,
+        overlay_keying=overlay_keying,
+        overlay_duration=overlay_duration,
+        fontfile=fontfile,
+    )
+
+
+def make_variant(job, title, fontcolor, fontsize, start_delay, title_appearance_delay, title_visible_time, title_x_offset, title_y_offset):
+    """Resolve one title variant: colors, timing window, title card and output path."""
+    # Handle font color selection
+    if fontcolor == 'random':
+        fontcolor = random.choice(['FF00B4', 'ff6600', '0b4178'])
+
+    # Calculate when title should appear and disappear
+    title_start = start_delay + title_appearance_delay
+    title_end = title_start + title_visible_time
+
+    # Rasterize the title once with Pillow; drawtext stays as the fallback
+    title_card = None
+    if job.params.title_card:
+        title_card = render_title_card(title, job.fontfile, fontsize, fontcolor, job.params.cache_folder)
+
+    return {
+        'title': title,
+        'fontcolor': fontcolor,
+        'fontsize': fontsize,
+        'delay': start_delay,
+        'title_start': title_start,
+        'title_end': title_end,
+        'title_x_offset': title_x_offset,
+        'title_y_offset': title_y_offset,
+        'title_card': title_card,
+        'window': (min(start_delay, title_start), max(start_delay + job.overlay_duration, title_end)),
+        'output_video': os.path.join(job.params.input_dir, f"{title.replace(' ', '_')}.mp4"),
+    }
+
+
+def load_variants(job, variants_file):
+    # Each entry is {"title": ..., "fontcolor": ..., <overrides>} or [title, fontcolor, {overrides}]
+    with open(variants_file, 'r') as f:
+        entries = json.load(f)
+
+    variants = []
+    for entry in entries:
+        if isinstance(entry, (list, tuple)):
+            settings = dict(entry[2]) if len(entry) > 2 else {}
+            settings['title'] = entry[0]
+            if len(entry) > 1:
+                settings['fontcolor'] = entry[1]
+        else:
+            settings = dict(entry)
+
+        variant = make_variant(
+            job,
+            settings['title'],
+            settings.get('fontcolor', job.params.title_fontcolor),
+            int(settings.get('fontsize', job.params.title_fontsize)),
+            int(settings.get('start_delay', job.params.start_delay)),
+            int(settings.get('title_appearance_delay', job.params.title_appearance_delay)),
+            int(settings.get('title_visible_time', job.params.title_visible_time)),
+            int(settings.get('title_x_offset', job.params.title_x_offset)),
+            int(settings.get('title_y_offset', job.params.title_y_offset)),
+        )
+        # Same title in several colors: keep every output
+        if any(v['output_video'] == variant['output_video'] for v in variants):
+            variant['output_video'] = variant['output_video'].replace('.mp4', f"_{variant['fontcolor']}.mp4")
+        variants.append(variant)
+    return variants
+
+
+def audio_filter(variant, main_input=0, overlay_input_index=1):
+    # Mix the overlay's sound (delayed to the overlay start) into the slideshow audio
+    delay = variant['delay']
+    return (
+        f"[{overlay_input_index}:a]adelay={delay*1000}|{delay*1000},volume=0.5[a1];"
+        f"[{main_input}:a]volume=1.0[a0];[a0][a1]amix=inputs=2:normalize=0[aout]"
+    )
+
+
+def video_filter(job, variants, offset=0):
+    # One graph for all variants of a window: the base video and the overlay are decoded
+    # (and keyed) once, then split. Times are shifted by `offset` when the input is seeked.
+    # Title cards are inputs 2.. in variant order; outputs are [out0], [out1], ...
+    count = len(variants)
+    main_labels = ''.join(f'[m{i}]' for i in range(count))
+    overlay_labels = ''.join(f'[o{i}]' for i in range(count))
+    graph = [
+        f"[0:v]setpts=PTS-STARTPTS,split={count}{main_labels}",
+        f"[1:v]{job.overlay_keying}split={count}{overlay_labels}",
+    ]
+
+    card_input = 2
+    for i, variant in enumerate(variants):
+        overlay_start = variant['delay'] - offset
+        overlay_end = variant['delay'] + job.overlay_duration - offset
+        title_from = variant['title_start'] - offset
+        title_to = variant['title_end'] - offset
+
+        graph.append(f"[o{i}]setpts=PTS-STARTPTS+{overlay_start}/TB[ck{i}]")
+        overlay_chain = f"[m{i}][ck{i}]overlay=enable='between(t\\,{overlay_start},{overlay_end})'"
+
+        if variant['title_card']:
+            # Time-gated overlay of the title PNG; a single still frame is repeated by overlay
+            _, _, pad_y = variant['title_card']
+            graph.append(f"{overlay_chain}[t{i}]")
+            graph.append(
+                f"[t{i}][{card_input}:v]overlay=x=(main_w-overlay_w)/2+{variant['title_x_offset']}:y=main_h/2+{variant['title_y_offset']}-{pad_y}:enable='between(t\\,{title_from},{title_to})'[out{i}]"
+            )
+            card_input += 1
+        else:
+            graph.append(
+                f"{overlay_chain},"
+                f"drawtext=text='{variant['title']}':x=((w-tw)/2+{variant['title_x_offset']}):y=((h/2)+{variant['title_y_offset']}):enable='between(t\\,{title_from},{title_to})':fontfile={job.fontfile}:fontsize={variant['fontsize']}:fontcolor=0x{variant['fontcolor']}:shadowcolor=black:shadowx=4:shadowy=2:alpha=0.8[out{i}]"
+            )
+    return ';'.join(graph)
+
+
+def probe_duration(video_path):
+    try:
+        cmd = ['ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', video_path]
+        return float(tracing.check_output(cmd, text=True))
+    except (subprocess.CalledProcessError, ValueError) as error:
+        print(f"***** Error getting duration of {video_path}: {error}")
+        return None
+
+
+def probe_keyframes(video_path):
+    # Keyframe timestamps from the packet index only, nothing is decoded
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', video_path
+    ]
+    try:
+        output = tracing.check_output(cmd, text=True)
+    except subprocess.CalledProcessError as error:
+        print(f"***** Error reading keyframes of {video_path}: {error}")
+        return []
+
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+
+def probe_stream(video_path):
+    """Codec parameters of the first video stream, {} when ffprobe fails"""
+    cmd = [
+        'ffprobe', '-v', 'error', '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_name,profile,level,pix_fmt,color_range,color_space,color_primaries,color_transfer,'
+                         'sample_aspect_ratio,r_frame_rate,time_base',
+        '-of', 'json', video_path
+    ]
+    try:
+        return (json.loads(tracing.check_output(cmd, text=True)).get('streams') or [{}])[0]
+    except (subprocess.CalledProcessError, ValueError) as error:
+        print(f"***** Error probing {video_path}: {error}")
+        return {}
+
+
+def matching_encode(stream):
+    """libx264 options that reproduce a stream's SPS/VUI (profile, level, pixel format, color, SAR, frame rate),
+    so a re-encoded piece splices between pieces copied from it; None when the stream can't be matched"""
+    profile = X264_PROFILES.get(stream.get('profile'))
+    if stream.get('codec_name') != 'h264' or profile is None or not stream.get('pix_fmt') or stream.get('level', 0) <= 0:
+        return None
+    args = [
+        '-r', stream.get('r_frame_rate', str(fps)), '-pix_fmt', stream['pix_fmt'], '-c:v', 'libx264',
+        '-profile:v', profile, '-level:v', f"{stream['level'] / 10:.1f}", '-b:v', video_bitrate,
+    ]
+    for key, option in (('color_range', '-color_range'), ('color_space', '-colorspace'),
+                        ('color_primaries', '-color_primaries'), ('color_transfer', '-color_trc')):
+        if stream.get(key, 'unknown') != 'unknown':
+            args += [option, stream[key]]
+    sar = stream.get('sample_aspect_ratio', 'N/A')
+    if sar not in ('N/A', '0:1'):
+        args += ['-bsf:v', f"h264_metadata=sample_aspect_ratio={sar.replace(':', '/')}"]
+    return args
+
+
+def plan_windows(job, variants, smart):
+    # Group variants by the section that has to be re-encoded: (cut_start, cut_end or None)
+    if not smart:
+        return {(0.0, None): variants}
+
+    keyframes = probe_keyframes(job.input_video)
+    video_duration = probe_duration(job.input_video)
+    if not keyframes or video_duration is None:
+        print("***** Smart render unavailable, re-encoding the whole video")
+        return {(0.0, None): variants}
+
+    groups = {}
+    for variant in variants:
+        window_start, window_end = variant['window']
+        cut_start = max([k for k in keyframes if k <= window_start], default=0.0)
+        cut_end = min([k for k in keyframes if k >= window_end], default=None)
+        if cut_end is not None and cut_end >= video_duration:
+            cut_end = None
+        print(f"Smart render window for '{variant['title']}': {cut_start:.2f}s - {cut_end if cut_end is not None else video_duration:.2f}s of {video_duration:.2f}s")
+        groups.setdefault((cut_start, cut_end), []).append(variant)
+    return groups
+
+
+def render_window(job, variants, cut_start, cut_end, work_dir, encode_args=None):
+    # Render the head/tail copies once and every variant's re-encoded section in a single ffmpeg run.
+    # Returns one list of (path, duration) MPEG-TS pieces per variant; MPEG-TS keeps SPS/PPS
+    # in-band, and encode_args (from matching_encode) make the re-encoded SPS match the copied one.
+    shared_head = []
+    shared_tail = []
+
+    if cut_start > 0:
+        head_path = os.path.join(work_dir, f'head_{cut_start}.ts')
+        tracing.run([
+            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+            '-i', job.input_video, '-t', str(cut_start),
+            '-map', '0:v', '-c', 'copy', '-f', 'mpegts', head_path
+        ], check=True)
+        shared_head.append((head_path, cut_start))
+
+    if cut_end is not None:
+        tail_path = os.path.join(work_dir, f'tail_{cut_end}.ts')
+        tracing.run([
+            'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+            '-ss', str(cut_end), '-i', job.input_video,
+            '-map', '0:v', '-c', 'copy', '-f', 'mpegts', tail_path
+        ], check=True)
+        shared_tail.append((tail_path, None))
+
+    window_command = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-ss', str(cut_start), '-i', job.input_video,
+        '-i', job.overlay_input,
+    ]
+    for variant in variants:
+        if variant['title_card']:
+            window_command.extend(['-i', variant['title_card'][0]])
+    window_command.extend(['-filter_complex', video_filter(job, variants, cut_start)])
+
+    # Copied neighbours force the source's encoding; a full re-encode keeps x264 defaults
+    if encode_args is None:
+        encode_args = ['-r', str(fps), '-pix_fmt', 'yuv420p', '-c:v', 'libx264']
+    middle_duration = (cut_end - cut_start) if cut_end is not None else None
+    pieces = []
+    for i, variant in enumerate(variants):
+        middle_path = os.path.join(work_dir, f'middle_{cut_start}_{i}.ts')
+        window_command.extend(['-map', f'[out{i}]'])
+        if middle_duration is not None:
+            window_command.extend(['-t', str(middle_duration)])
+        window_command.extend([*encode_args, '-f', 'mpegts', middle_path])
+        pieces.append(shared_head + [(middle_path, middle_duration)] + shared_tail)
+
+    print(window_command)
+    tracing.run(window_command, check=True, report_progress=True)
+    return pieces
+
+
+def finalize_variant(job, variant, pieces, work_dir, index, timescale=None):
+    # Join the video pieces and mix the overlay sound over the full-length audio (audio is cheap to re-encode),
+    # spliced pieces keep the source's track timescale
+    concat_list = os.path.join(work_dir, f'concat_{index}.txt')
+    with open(concat_list, 'w') as f:
+        for piece_path, piece_duration in pieces:
+            f.write(f"file '{os.path.abspath(piece_path)}'\n")
+            if piece_duration is not None:
+                f.write(f"duration {piece_duration}\n")
+
+    tracing.run([
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-f', 'concat', '-safe', '0', '-i', concat_list,
+        '-i', job.input_video,
+        '-i', job.overlay_input,
+        '-filter_complex', audio_filter(variant, 1, 2),
+        '-map', '0:v', '-map', '[aout]',
+        '-c:v', 'copy', '-c:a', 'aac',
+        *(['-video_track_timescale', timescale] if timescale else []),
+        variant['output_video']
+    ], check=True)
+    print(f"+++++ Rendered: {variant['output_video']}")
+
+
+def render_full(job, variant):
+    # One full-length piece: encode straight to the output with the overlay audio mix, a single ffmpeg run
+    command = [
+        'ffmpeg', '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', job.input_video,
+        '-i', job.overlay_input,
+    ]
+    if variant['title_card']:
+        command.extend(['-i', variant['title_card'][0]])
+    command.extend([
+        '-filter_complex', audio_filter(variant) + ';' + video_filter(job, [variant]),
+        '-map', '[out0]', '-map', '[aout]',
+        '-c:v', 'libx264', '-c:a', 'aac', variant['output_video']
+    ])
+    print(command)
+    tracing.run(command, check=True, report_progress=True)
+    print(f"+++++ Rendered: {variant['output_video']}")
+
+
+def render_variants(job, variants, smart):
+    encode_args, timescale = None, None
+    if smart:
+        # Copied and re-encoded pieces only concat cleanly with identical stream parameters
+        stream = probe_stream(job.input_video)
+        encode_args = matching_encode(stream)
+        timescale = stream.get('time_base', '').partition('/')[2] or None
+        if encode_args is None:
+            print(f"***** Can't match the encoding of {job.input_video}, re-encoding the whole video")
+            smart = False
+
+    windows = plan_windows(job, variants, smart)
+    if list(windows) == [(0.0, None)]:
+        # Nothing is copied, so nothing has to match
+        encode_args, timescale = None, None
+        if len(variants) == 1:
+            render_full(job, variants[0])
+            return
+
+    work_dir = scratch.path(job.params.input_dir, '_overlay')
+    os.makedirs(work_dir, exist_ok=True)
+    index = 0
+    try:
+        for (cut_start, cut_end), group in windows.items():
+            for variant, pieces in zip(group, render_window(job, group, cut_start, cut_end, work_dir, encode_args)):
+                finalize_variant(job, variant, pieces, work_dir, index, timescale)
+                index += 1
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def add_subtitles(input_dir, output_video):
     print("Adding subtitles...")
     step_start = time.time()
     srt_file = os.path.join(input_dir, 'subs/voiceover.srt')
@@ -123,7 +483,107 @@ if args.generate_srt == '1':
         '-y', srt_styled_output
     ]
 
-    subprocess.run(srt_command)
+    tracing.run(srt_command, report_progress=True)
     print(f"Subtitles: {time.time() - step_start:.2f} seconds.")
 
-print(f"Finished processing. Output video: {output_video}")
+
+def add_overlay(params: SubscribeParams) -> List[str]:
+    """Title + subscribe overlay (and subtitles) for every variant of one folder, returns the output videos"""
+    job = prepare_job(params)
+
+    if params.variants_file:
+        variants = load_variants(job, params.variants_file)
+        print(f"Rendering {len(variants)} title variants from {job.input_video}")
+    else:
+        variants = [make_variant(
+            job, params.title, params.title_fontcolor, params.title_fontsize, params.start_delay,
+            params.title_appearance_delay, params.title_visible_time, params.title_x_offset, params.title_y_offset,
+        )]
+    print(f"Start delay: {', '.join(str(v['delay']) for v in variants)} seconds")
+
+    print("Overlaying videos...")
+    step_start = time.time()
+
+    # Variants re-encode only their overlay window by default, a single title only with --smart 1
+    smart = params.smart_render or bool(params.variants_file)
+    try:
+        render_variants(job, variants, smart)
+    except subprocess.CalledProcessError as error:
+        if not smart:
+            print(f"***** Error executing FFmpeg command: {error}")
+        else:
+            print(f"***** Error in smart render, re-encoding the whole video: {error}")
+            try:
+                render_variants(job, variants, False)
+            except subprocess.CalledProcessError as error:
+                print(f"***** Error executing FFmpeg command: {error}")
+
+    print(f"Name + Subscribe: {time.time() - step_start:.2f} seconds.")
+
+    for variant in variants:
+        if params.generate_srt:
+            add_subtitles(params.input_dir, variant['output_video'])
+
+        print(f"Finished processing. Output video: {variant['output_video']}")
+    return [variant['output_video'] for variant in variants]
+
+
+if __name__ == "__main__":
+    # Argument parsing
+    parser = argparse.ArgumentParser(description="Create slideshow with overlay.")
+
+    parser.add_argument('--i', dest='input_dir', required=True, help='Path to the directory containing input files')
+    parser.add_argument('--tpl', type=str, default='TEMPLATE', dest='template_folder', help='Template folder')
+
+
+    parser.add_argument('--t', type=str, default='Model Name', dest='title', help='Video title')
+    parser.add_argument('--tf', type=str, default='Montserrat-SemiBold.otf', dest='title_fontfile', help='Font file for title text')
+    parser.add_argument('--tfs', type=int, default=90, dest='title_fontsize', help='Title font size')
+    parser.add_argument('--tfc', type=str, default='random', dest='title_fontcolor', help='Font color (hex code without #, or "random")')
+    parser.add_argument('--osd', type=int, default=21, dest='start_delay', help='Delay before overlay appears (in seconds)')
+    parser.add_argument('--tad', type=int, default=1, dest='title_appearance_delay', help='Delay before title appears (in seconds)')
+    parser.add_argument('--tvt', type=int, default=5, dest='title_visible_time', help='Duration title remains visible (in seconds)')
+    parser.add_argument('--tyo', type=int, default=-35, dest='title_y_offset', help='Title y offset')
+    parser.add_argument('--txo', type=int, default=110, dest='title_x_offset', help='Title x offset')
+
+
+
+    parser.add_argument('--chr', type=str, default='65db41', dest='chromakey_color', help='Chromakey color (hex code without #)')
+    parser.add_argument('--cs', type=float, default=0.18, dest='chromakey_similarity', help='Chromakey similarity (0-1)')
+    parser.add_argument('--cb', type=float, default=0, dest='chromakey_blend', help='Chromakey blend (0-1)')
+    parser.add_argument('--pk', type=str, default='1', dest='prekeyed_overlay', help='Use cached pre-keyed overlay instead of chromakey on every render? 0/1')
+    parser.add_argument('--tcard', type=str, default='1', dest='title_card', help='Composite a cached pre-rendered title PNG instead of drawtext? 0/1')
+    parser.add_argument('--cache', type=str, default='CACHE', dest='cache_folder', help='Cache folder for pre-rendered assets')
+
+    parser.add_argument('--srt', type=str, default='0', dest='generate_srt', help='Add SRT subtitles? 0/1')
+    parser.add_argument('--smart', type=str, default='0', dest='smart_render', help='Re-encode only the overlay window and stream-copy the rest? 0/1')
+
+    parser.add_argument('--o', type=str, default='vertical', dest='orientation', help='Orientation (vertical or horizontal).')
+    parser.add_argument('--variants', type=str, default='', dest='variants_file', help='JSON list of title variants to render from the same base video')
+
+    args = parser.parse_args()
+
+    add_overlay(SubscribeParams(
+        input_dir=args.input_dir,
+        template_folder=args.template_folder,
+        # Older callers quoted the title by hand
+        title=args.title.strip('"'),
+        title_fontfile=args.title_fontfile,
+        title_fontsize=args.title_fontsize,
+        title_fontcolor=args.title_fontcolor,
+        start_delay=args.start_delay,
+        title_appearance_delay=args.title_appearance_delay,
+        title_visible_time=args.title_visible_time,
+        title_y_offset=args.title_y_offset,
+        title_x_offset=args.title_x_offset,
+        chromakey_color=args.chromakey_color,
+        chromakey_similarity=args.chromakey_similarity,
+        chromakey_blend=args.chromakey_blend,
+        prekeyed_overlay=args.prekeyed_overlay == '1',
+        title_card=args.title_card == '1',
+        cache_folder=args.cache_folder,
+        generate_srt=args.generate_srt == '1',
+        smart_render=args.smart_render == '1',
+        orientation=args.orientation,
+        variants_file=args.variants_file,
+    ))
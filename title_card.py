@@ -0,0 +1,63 @@
+import math
+import os
+
+from PIL import Image, ImageDraw, ImageFont
+
+from cache_utils import cache_path, file_hash, params_hash, partial_path, publish
+
+# Same look as the drawtext title: black shadow shifted 4px right / 2px down, 80% opacity
+SHADOW_OFFSET = (4, 2)
+SHADOW_COLOR = (0, 0, 0)
+TITLE_ALPHA = 0.8
+
+
+def hex_to_rgb(color):
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def render_title_card(title, fontfile, fontsize, fontcolor, cache_folder):
+    """Rasterize the title with its shadow once to an RGBA PNG, cached by font, size, color and text.
+
+    The card is padded by the shadow offset on every side, so centering it with
+    (main_w-overlay_w)/2 lines the text up exactly where drawtext's (w-tw)/2 put it.
+    Returns (png_path, pad_x, pad_y), or None when the font cannot be loaded.
+    """
+    try:
+        font = ImageFont.truetype(fontfile, fontsize)
+    except OSError as error:
+        print(f"***** Could not load title font {fontfile}: {error}")
+        return None
+
+    pad_x, pad_y = SHADOW_OFFSET
+    key = params_hash(
+        title=title,
+        font=file_hash(fontfile),
+        fontsize=fontsize,
+        fontcolor=fontcolor.lower(),
+        shadow=SHADOW_OFFSET,
+        alpha=TITLE_ALPHA,
+    )
+    card_path = cache_path(cache_folder, 'title', key, '.png')
+    if os.path.isfile(card_path):
+        print(f"+++++ Using cached title card: {card_path}")
+        return card_path, pad_x, pad_y
+
+    ascent, descent = font.getmetrics()
+    text_width = math.ceil(font.getlength(title))
+    card = Image.new('RGBA', (text_width + 2 * pad_x, ascent + descent + 2 * pad_y), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(card)
+
+    # drawtext positions the top of the line box (the ascender line), hence anchor "la"
+    draw.text((pad_x + SHADOW_OFFSET[0], pad_y + SHADOW_OFFSET[1]), title, font=font, fill=SHADOW_COLOR + (255,), anchor='la')
+    draw.text((pad_x, pad_y), title, font=font, fill=hex_to_rgb(fontcolor) + (255,), anchor='la')
+
+    alpha = card.getchannel('A').point(lambda value: round(value * TITLE_ALPHA))
+    card.putalpha(alpha)
+
+    # Concurrent subscribe tasks may render the same title, each writes its own temp file
+    partial = partial_path(card_path)
+    card.save(partial)
+    publish(partial, card_path)
+    print(f"+++++ Title card cached: {card_path}")
+    return card_path, pad_x, pad_y
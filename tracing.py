@@ -0,0 +1,262 @@
+"""Chrome trace-event timeline of the pipeline stages and every ffmpeg/ffprobe child.
+
+Open the written JSON in chrome://tracing or https://ui.perfetto.dev. Stages are spans on the
+thread that ran them, children are nested under them with wall time, CPU time and peak RSS
+from wait4, whether they are reaped by wait() or poll(). Nothing is recorded until start(),
+save() writes the file and stops recording.
+Without wait4 and resource (Windows) children are recorded with their wall time only.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import governor
+import progress
+
+_lock = threading.Lock()
+_events: Optional[List[Dict]] = None
+_origin = 0.0
+_threads = set()
+# Thread id -> CPU seconds of the children it waited for, so a stage span includes its children
+_child_cpu: Dict[int, float] = {}
+
+
+def start() -> None:
+    """Begin a new trace, events of a previous one are dropped"""
+    global _events, _origin
+    with _lock:
+        _events = []
+        _origin = time.perf_counter()
+        _threads.clear()
+        _child_cpu.clear()
+
+
+def active() -> bool:
+    return _events is not None
+
+
+def _us(seconds: float) -> float:
+    return round((seconds - _origin) * 1e6, 1)
+
+
+def _record(name: str, cat: str, begin: float, end: float, tid: int, thread_name: str, args: Dict) -> None:
+    with _lock:
+        if _events is None:
+            return
+        if tid not in _threads:
+            _threads.add(tid)
+            _events.append({'ph': 'M', 'name': 'thread_name', 'pid': os.getpid(), 'tid': tid, 'args': {'name': thread_name}})
+        _events.append({
+            'ph': 'X', 'name': name, 'cat': cat, 'pid': os.getpid(), 'tid': tid,
+            'ts': _us(begin), 'dur': round((end - begin) * 1e6, 1), 'args': args,
+        })
+
+
+@contextmanager
+def span(name: str, cat: str = 'stage', **args):
+    """Record the block as one event: wall time, CPU time of this thread and of the children it ran"""
+    thread = threading.current_thread()
+    tid = threading.get_ident()
+    begin, cpu = time.perf_counter(), time.thread_time()
+    child_cpu = _child_cpu.get(tid, 0.0)
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        args = dict(
+            args,
+            wall_s=round(end - begin, 3),
+            cpu_s=round(time.thread_time() - cpu, 3),
+            children_cpu_s=round(_child_cpu.get(tid, 0.0) - child_cpu, 3),
+        )
+        if resource is not None:
+            # Process-wide high-water mark, ru_maxrss is in KB on Linux
+            args['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        _record(name, cat, begin, end, tid, thread.name, args)
+
+
+def counter(name: str, **values) -> None:
+    """Counter event, e.g. the fps and speed of an encode over time"""
+    with _lock:
+        if _events is None:
+            return
+        _events.append({'ph': 'C', 'name': name, 'pid': os.getpid(), 'ts': _us(time.perf_counter()), 'args': values})
+
+
+def _label(args) -> str:
+    """ffmpeg/ffprobe plus the file it writes (or reads), enough to tell the children apart"""
+    if isinstance(args, (str, bytes)):
+        return os.fsdecode(args).split()[0]
+    args = [os.fsdecode(arg) for arg in args]
+    program = os.path.basename(args[0])
+    files = [arg for arg in args[1:] if os.path.splitext(arg)[1] and not arg.startswith('-')]
+    return f"{program} {os.path.basename(files[-1])}" if files else program
+
+
+class Popen(subprocess.Popen):
+    """subprocess.Popen that reaps its child with wait4 (in wait() and poll()) and records it in the running trace"""
+
+    def __init__(self, args, *popenargs, report_progress: bool = False, **kwargs):
+        self.trace_begin = time.perf_counter()
+        self.trace_tid = threading.get_ident()
+        self.trace_thread = threading.current_thread().name
+        self.rusage = None
+        self.reporter = None
+        self.traced = False
+        self.reap_lock = threading.Lock()
+
+        # Children of a scheduled task stay within its thread budget
+        kwargs['env'] = governor.child_env(kwargs.get('env'))
+        # Long encodes (report_progress) report their progress on an extra pipe, stdout and stderr stay as the caller set them
+        read_fd = None
+        if not isinstance(args, (str, bytes)):
+            args = governor.ffmpeg_args([os.fsdecode(arg) for arg in args])
+            if report_progress:
+                args, read_fd, write_fd = progress.add_pipe(args)
+        if read_fd is None:
+            super().__init__(args, *popenargs, **kwargs)
+            return
+        kwargs['pass_fds'] = tuple(kwargs.get('pass_fds', ())) + (write_fd,)
+        try:
+            super().__init__(args, *popenargs, **kwargs)
+        except BaseException:
+            os.close(read_fd)
+            raise
+        finally:
+            os.close(write_fd)
+        self.reporter = progress.Reporter(read_fd, _label(args), args, counter=counter)
+        self.reporter.start()
+
+    def _reap(self, flags: int) -> None:
+        """wait4 the child, sets returncode and rusage once it has exited"""
+        try:
+            pid, status, rusage = os.wait4(self.pid, flags)
+        except ChildProcessError:
+            # Reaped elsewhere, the exit status is lost (subprocess reports 0 as well)
+            pid, status, rusage = self.pid, 0, None
+        if pid == self.pid:
+            self.rusage = rusage
+            self.returncode = os.waitstatus_to_exitcode(status)
+
+    def poll(self):
+        if not hasattr(os, 'wait4'):
+            # No rusage (Windows), the child is recorded with its wall time
+            return self._exited(super().poll())
+        # A thread blocked in wait() holds the lock, the child is still running then
+        if self.returncode is None and self.reap_lock.acquire(blocking=False):
+            try:
+                if self.returncode is None:
+                    self._reap(os.WNOHANG)
+            finally:
+                self.reap_lock.release()
+        return self._exited(self.returncode)
+
+    def wait(self, timeout=None):
+        # communicate() and the context manager wait through here too
+        if not hasattr(os, 'wait4'):
+            return self._exited(super().wait(timeout))
+        if timeout is None:
+            with self.reap_lock:
+                if self.returncode is None:
+                    self._reap(0)
+            return self._exited(self.returncode)
+        deadline = time.monotonic() + timeout
+        delay = 0.0005
+        while self.poll() is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+        return self.returncode
+
+    def _exited(self, returncode: Optional[int]) -> Optional[int]:
+        """Record the child the first time it is seen exited"""
+        if returncode is None:
+            return None
+        with _lock:
+            first, self.traced = not self.traced, True
+        if first:
+            self._trace(returncode)
+        return returncode
+
+    def _trace(self, exit_code: int) -> None:
+        end = time.perf_counter()
+        command = self.args if isinstance(self.args, (str, bytes)) else ' '.join(os.fsdecode(arg) for arg in self.args)
+        args = {
+            'command': os.fsdecode(command),
+            'exit': exit_code,
+            'wall_s': round(end - self.trace_begin, 3),
+        }
+        if self.rusage is not None:
+            with _lock:
+                _child_cpu[self.trace_tid] = _child_cpu.get(self.trace_tid, 0.0) + self.rusage.ru_utime + self.rusage.ru_stime
+            args.update(
+                user_s=round(self.rusage.ru_utime, 3),
+                sys_s=round(self.rusage.ru_stime, 3),
+                max_rss_mb=round(self.rusage.ru_maxrss / 1024, 1),
+            )
+        if self.reporter is not None:
+            # The pipe closes with the child, the last update follows right away
+            self.reporter.join(timeout=1)
+            args.update(self.reporter.summary)
+        _record(_label(self.args), 'child', self.trace_begin, end, self.trace_tid, self.trace_thread, args)
+
+
+def run(args, *, input=None, capture_output=False, timeout=None, check=False, **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run through the tracing Popen, report_progress=True for long encodes"""
+    if input is not None:
+        kwargs['stdin'] = subprocess.PIPE
+    if capture_output:
+        kwargs['stdout'] = subprocess.PIPE
+        kwargs['stderr'] = subprocess.PIPE
+
+    with Popen(args, **kwargs) as process:
+        try:
+            stdout, stderr = process.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+        except BaseException:
+            process.kill()
+            raise
+        returncode = process.poll()
+    if check and returncode:
+        raise subprocess.CalledProcessError(returncode, process.args, output=stdout, stderr=stderr)
+    return subprocess.CompletedProcess(process.args, returncode, stdout, stderr)
+
+
+def check_output(args, **kwargs):
+    """subprocess.check_output through the tracing Popen"""
+    return run(args, stdout=subprocess.PIPE, check=True, **kwargs).stdout
+
+
+def stop() -> Optional[List[Dict]]:
+    """Stop recording, returns the events (None when no trace was started)"""
+    global _events
+    with _lock:
+        events, _events = _events, None
+    return events
+
+
+def save(path: str, events: Optional[List[Dict]] = None) -> Optional[str]:
+    """Write the trace and stop recording (or write the `events` stop() returned), returns the path (None when no trace was started)"""
+    if events is None:
+        events = stop()
+    if events is None:
+        return None
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    print(f"+++++ Trace saved: {path} ({sum(1 for event in events if event['ph'] == 'X')} events)")
+    return path
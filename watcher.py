@@ -0,0 +1,253 @@
+import itertools
+import json
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field, fields, replace
+from datetime import datetime
+from queue import Empty, PriorityQueue
+from typing import Dict, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+from watchdog.observers.polling import PollingObserver
+
+from cutter import build_parser, pipeline_params
+from pipeline import PipelineParams, run_batch
+
+MEDIA = ('.mp4', '.jpg', '.jpeg', '.png', '.mp3')
+# Written by the pipeline inside a job folder, never a new upload
+OUTPUT_FOLDERS = ('RESULT', 'SOURCE')
+DONE_MARKER = '.done'
+# Per-job PipelineParams overrides, e.g. {"title": "Model Name"}
+JOB_FILE = 'job.json'
+DEFAULT_PRIORITY = 10
+
+
+@dataclass(order=True)
+class Job:
+    priority: int
+    seq: int
+    name: str = field(compare=False)
+
+
+class DropHandler(FileSystemEventHandler):
+    def __init__(self, watcher: 'Watcher'):
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # Directory mtime changes follow every file event, they carry no information
+        if event.is_directory and event.event_type == 'modified':
+            return
+        self.watcher.touch(event.src_path)
+        if getattr(event, 'dest_path', None):
+            self.watcher.touch(event.dest_path)
+
+
+class Watcher:
+    """Turns uploads into pipeline jobs.
+
+    Each subfolder of the input folder is a job, ready once its files stop changing for `settle`
+    seconds, or after a single stable check when the drop marker is in it. Files dropped directly
+    into the input folder wait for the marker there, then are moved into a new job folder.
+    The marker may hold a priority number, lower runs first.
+    """
+
+    def __init__(self, params: PipelineParams, marker: str = '.ready', settle: float = 10, batch: int = 2,
+                 cpu: Optional[float] = None, memory: Optional[int] = None, pin: bool = False):
+        self.params = params
+        self.root = params.input_folder
+        self.marker = marker
+        self.settle = settle
+        self.batch = batch
+        self.cpu = cpu
+        self.memory = memory
+        self.pin = pin
+
+        self.lock = threading.Lock()
+        # job -> time of its last file event, '' is the loose files in the input folder
+        self.changed: Dict[str, float] = {}
+        self.snapshots: Dict[str, Tuple] = {}
+        self.queued: Set[str] = set()
+        self.queue: 'PriorityQueue[Job]' = PriorityQueue()
+        self.seq = itertools.count()
+
+    def job_of(self, path: str) -> Optional[str]:
+        parts = os.path.relpath(path, self.root).split(os.sep)
+        if parts[0] in ('.', '..') or parts[0] in OUTPUT_FOLDERS:
+            return None
+        if len(parts) == 1:
+            return parts[0] if os.path.isdir(path) else ''
+        if parts[1] in OUTPUT_FOLDERS:
+            return None
+        return parts[0]
+
+    def touch(self, path: str) -> None:
+        job = self.job_of(path)
+        if job is None:
+            return
+        with self.lock:
+            if job in self.queued or (job and os.path.exists(os.path.join(self.root, job, DONE_MARKER))):
+                return
+            self.changed[job] = time.monotonic()
+
+    def snapshot(self, job: str) -> Tuple:
+        """Name, size and mtime of the media in a job folder: equal twice in a row means the upload is done"""
+        folder = os.path.join(self.root, job)
+        entries = []
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            if name.lower().endswith(MEDIA) and os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((name, stat.st_size, stat.st_mtime))
+        return tuple(entries)
+
+    def priority(self, folder: str) -> int:
+        try:
+            with open(os.path.join(folder, self.marker)) as f:
+                return int(f.read().strip() or DEFAULT_PRIORITY)
+        except (OSError, ValueError):
+            return DEFAULT_PRIORITY
+
+    def poll(self) -> None:
+        """Queue the jobs whose uploads are complete"""
+        now = time.monotonic()
+        with self.lock:
+            waiting = [job for job, changed in self.changed.items() if now - changed >= self.settle]
+
+        for job in waiting:
+            folder = os.path.join(self.root, job)
+            if not os.path.isdir(folder):
+                with self.lock:
+                    self.changed.pop(job, None)
+                continue
+            has_marker = os.path.exists(os.path.join(folder, self.marker))
+            snapshot = self.snapshot(job)
+            if not snapshot:
+                # Nothing to process yet, the next upload event brings the job back
+                with self.lock:
+                    self.changed.pop(job, None)
+                continue
+            stable = snapshot == self.snapshots.get(job) or (has_marker and job != '')
+            self.snapshots[job] = snapshot
+            with self.lock:
+                # Check again after another settle period, unless new events came in meanwhile
+                self.changed[job] = max(self.changed.get(job, now), now)
+
+            if not stable or (job == '' and not has_marker):
+                continue
+            if job == '':
+                job = self.adopt_loose_files()
+            self.enqueue(job, self.priority(os.path.join(self.root, job)))
+
+    def adopt_loose_files(self) -> str:
+        """Move the files dropped into the input folder into a job folder of their own"""
+        job = datetime.now().strftime("DROP_%Y-%m-%d_%H-%M-%S")
+        folder = os.path.join(self.root, job)
+        with self.lock:
+            # Claimed before the moves, so their events are not a new upload
+            self.queued.add(job)
+            self.changed.pop('', None)
+        self.snapshots.pop('', None)
+        os.makedirs(folder, exist_ok=True)
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isfile(path) and (name.lower().endswith(MEDIA) or name in (self.marker, JOB_FILE)):
+                shutil.move(path, os.path.join(folder, name))
+        return job
+
+    def enqueue(self, job: str, priority: int) -> None:
+        with self.lock:
+            self.queued.add(job)
+            self.changed.pop(job, None)
+        self.snapshots.pop(job, None)
+        print(f"+++++ Queued {job} (priority {priority})")
+        self.queue.put(Job(priority, next(self.seq), job))
+
+    def job_params(self, job: str) -> PipelineParams:
+        path = os.path.join(self.root, job, JOB_FILE)
+        if not os.path.exists(path):
+            return self.params
+        with open(path) as f:
+            overrides = json.load(f)
+        # The input folder is the watched one for every job
+        known = {f.name for f in fields(PipelineParams)} - {'input_folder'}
+        unknown = set(overrides) - known
+        if unknown:
+            print(f"***** {job}: ignoring unknown {JOB_FILE} keys {sorted(unknown)}")
+        return replace(self.params, **{key: value for key, value in overrides.items() if key in known})
+
+    def work(self) -> None:
+        """Run the queued jobs, several ready jobs share one scheduled batch"""
+        while True:
+            jobs = [self.queue.get()]
+            while len(jobs) < self.batch:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            names = [job.name for job in jobs]
+            print(f"##### Processing {', '.join(names)}")
+
+            try:
+                scheduler = run_batch(self.params, names, self.cpu, self.memory,
+                                      job_params={name: self.job_params(name) for name in names}, pin=self.pin)
+                tasks = list(scheduler.tasks.values())
+            except Exception as error:
+                print(f"***** Batch failed: {error}")
+                tasks = None
+
+            for name in names:
+                if tasks is None:
+                    failed = ['batch']
+                else:
+                    failed = [task.name for task in tasks if task.group == name and (task.error is not None or task.skipped)]
+                # A finished job folder is never picked up again, delete the marker to re-run it
+                with open(os.path.join(self.root, name, DONE_MARKER), 'w') as f:
+                    json.dump({'finished': datetime.now().isoformat(timespec='seconds'), 'failed': failed}, f)
+                with self.lock:
+                    self.queued.discard(name)
+                print(f"##### {name} {'failed: ' + ', '.join(failed) if failed else 'done'}")
+
+    def serve(self, polling: bool = False) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        # Uploads that arrived while the daemon was down
+        for name in os.listdir(self.root):
+            self.touch(os.path.join(self.root, name))
+
+        observer = PollingObserver() if polling else Observer()
+        observer.schedule(DropHandler(self), self.root, recursive=True)
+        observer.start()
+        threading.Thread(target=self.work, name="jobs", daemon=True).start()
+        print(f"##### Watching {os.path.abspath(self.root)} (settle {self.settle}s, marker {self.marker})")
+
+        try:
+            while True:
+                self.poll()
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observer.stop()
+            observer.join()
+
+
+if __name__ == "__main__":
+    parser = build_parser()
+    parser.description = "Watch the input folder and run the pipeline for every completed upload"
+    parser.add_argument('--settle', type=float, default=10, dest='settle', help='Seconds without file changes before a job is ready')
+    parser.add_argument('--marker', type=str, default='.ready', dest='marker', help='Drop marker file that completes an upload (may contain a priority, lower runs first)')
+    parser.add_argument('--batch', type=int, default=2, dest='batch', help='Ready jobs scheduled together')
+    parser.add_argument('--poll', action='store_true', dest='polling', help='Poll the folder instead of inotify (network shares)')
+    args = parser.parse_args()
+
+    Watcher(
+        pipeline_params(args),
+        marker=args.marker,
+        settle=args.settle,
+        batch=args.batch,
+        cpu=args.cpu_budget,
+        memory=args.memory_budget,
+        pin=args.pin_threads == '1',
+    ).serve(args.polling)